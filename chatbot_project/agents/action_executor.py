@@ -1,8 +1,14 @@
 """Action Execution Agent for performing actions based on intent."""
 
 import re
+import time
 import asyncio
-from typing import Dict, Any, List
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
+from types import MappingProxyType
+from typing import Dict, Any, AsyncIterator, Final, List, Optional
 from datetime import datetime
 
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -10,10 +16,537 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from config import (
     get_logger, LoggerMixin, IntentType, 
     ERROR_RESPONSES,
-    HIGH_CONFIDENCE_THRESHOLD, MEDIUM_CONFIDENCE_THRESHOLD, settings
+    HIGH_CONFIDENCE_THRESHOLD, MEDIUM_CONFIDENCE_THRESHOLD, settings,
+    RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    DOCUMENT_RESPONSE_CACHE_TTL, WEATHER_RESPONSE_CACHE_TTL,
+    WEATHER_CACHE_MAX_ENTRIES, WEATHER_CACHE_TTL,
+    LOCATION_CACHE_MAX_ENTRIES, LOCATION_CACHE_TTL
 )
 from tools import SearchTools
 from tools.agriculture_weather_advisor import AgricultureWeatherAdvisor, AgricultureAdvice, WeatherCondition
+from utils import ResponseCache, TextUtils
+
+# Knowledge base results fetched for document search intents
+_DOCUMENT_SEARCH_LIMIT: Final[int] = 15
+
+# Vietnamese location spellings by regex group name: (spellings, canonical name)
+_LOCATION_ALTERNATIVES = {
+    "ha_noi": ("hà nội|hanoi", "Hà Nội"),
+    "ho_chi_minh": ("hồ chí minh|sài gòn|saigon|tp hcm", "Hồ Chí Minh"),
+    "da_nang": ("đà nẵng", "Đà Nẵng"),
+    "dak_lak": ("đăk lăk|đắk lắk|buôn ma thuột", "Buôn Ma Thuột"),
+    "gia_lai": ("gia lai|pleiku", "Pleiku"),
+    "lam_dong": ("lâm đồng|đà lạt", "Đà Lạt"),
+    "kon_tum": ("kon tum", "Kon Tum"),
+    "nghe_an": ("nghệ an|vinh", "Vinh"),
+}
+
+# Crop alternatives by regex group name: (alternatives, canonical name)
+_CROP_ALTERNATIVES = {
+    "ca_phe": ("cà phê|cafe|coffee", "cà phê"),
+    "lua": ("lúa|rice|gạo", "lúa"),
+    "khoai_tay": ("khoai tây|potato", "khoai tây"),
+    "ho_tieu": ("hồ tiêu|pepper|tiêu", "hồ tiêu"),
+    "ngo": ("ngô|corn|bắp", "ngô"),
+    "dau": ("đậu|bean", "đậu"),
+}
+
+
+def _compile_fused_pattern(alternatives: Dict[str, tuple]) -> "re.Pattern":
+    """Compile named-group alternatives into a single case-insensitive regex."""
+    return re.compile(
+        "|".join(rf"\b(?P<{name}>{alts})\b" for name, (alts, _) in alternatives.items()),
+        re.IGNORECASE
+    )
+
+
+def _build_trie_regex(words) -> str:
+    """
+    Build a prefix-merged regex matching any of the words, longest first.
+    
+    Shared prefixes such as "quan " or "huyen " are matched once instead of
+    once per alternative.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # End of word
+    
+    def serialize(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + serialize(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            # Greedy optional suffix keeps the longest word ending here
+            return f"(?:{pattern})?" if len(branches) == 1 else f"{pattern}?"
+        return pattern
+    
+    return serialize(trie)
+
+
+def _fold_spellings(spellings: str) -> tuple:
+    """Fold '|'-separated spellings to unique ASCII keywords, preserving order."""
+    return tuple(dict.fromkeys(TextUtils.remove_diacritics(spelling) for spelling in spellings.split("|")))
+
+
+# Locations are matched on diacritic-folded text against ASCII-only alternatives
+_LOCATION_PATTERN = re.compile(
+    "|".join(
+        rf"\b(?P<{name}>{'|'.join(_fold_spellings(spellings))})\b"
+        for name, (spellings, _) in _LOCATION_ALTERNATIVES.items()
+    )
+)
+_LOCATION_NAMES = {name: canonical for name, (_, canonical) in _LOCATION_ALTERNATIVES.items()}
+_LOCATION_SPELLINGS = {
+    name: frozenset(spellings.split("|")) for name, (spellings, _) in _LOCATION_ALTERNATIVES.items()
+}
+_CROP_PATTERN = _compile_fused_pattern(_CROP_ALTERNATIVES)
+_CROP_NAMES = {name: canonical for name, (_, canonical) in _CROP_ALTERNATIVES.items()}
+
+@lru_cache(maxsize=1024)
+def _normalize_query(query: str) -> str:
+    """Normalize a query to NFC, case-folded and single spaces for cached matching."""
+    # Memoized so the extractors run within one turn share a single normalization
+    return " ".join(unicodedata.normalize("NFC", query).casefold().split())
+
+
+@lru_cache(maxsize=4096)
+def _match_location_and_crop(query_lower: str) -> tuple:
+    """Match location and crop in a normalized query, with defaults."""
+    # Single scan per table, dispatched on the matched group name
+    location = "Hà Nội"
+    for location_match in _LOCATION_PATTERN.finditer(TextUtils.remove_diacritics(query_lower)):
+        typed = query_lower[location_match.start():location_match.end()]
+        if typed.isascii() or typed in _LOCATION_SPELLINGS[location_match.lastgroup]:
+            location = _LOCATION_NAMES[location_match.lastgroup]
+            break
+    
+    crop_match = _CROP_PATTERN.search(query_lower)
+    crop = _CROP_NAMES[crop_match.lastgroup] if crop_match else "cà phê"
+    
+    return location, crop
+
+
+# Intents whose answers can be followed up without repeating the location
+_WEATHER_INTENTS = frozenset({"weather_query", "weather_agriculture"})
+
+# Phrases marking a query as a follow-up to the previous weather answer
+_FOLLOWUP_INDICATORS = (
+    "với thời tiết này", "trong điều kiện này", "theo thông tin trên",
+    "dựa vào thời tiết", "nên làm gì", "có phù hợp", "thì sao",
+    "làm gì tiếp", "có nên", "tương tự", "như vậy"
+)
+_FOLLOWUP_PATTERN = re.compile(_build_trie_regex(_FOLLOWUP_INDICATORS))
+
+
+# Queries naming the weather are answered from weather data, never the knowledge base search
+_WEATHER_QUERY_PATTERN = re.compile(_build_trie_regex(("thời tiết", "weather", "dự báo")))
+
+
+@lru_cache(maxsize=4096)
+def _has_followup_indicator(query_lower: str) -> bool:
+    """Check a normalized query for follow-up phrases."""
+    return _FOLLOWUP_PATTERN.search(query_lower) is not None
+
+
+def _bucket_weather(weather: WeatherCondition) -> Dict[str, Any]:
+    """Quantize weather readings into bins within which the agronomic advice does not change."""
+    return {
+        "temperature": round(weather.temperature / 2) * 2,
+        "feels_like": round(weather.feels_like / 2) * 2,
+        "humidity": round(weather.humidity / 10) * 10,
+        "wind_speed": round(weather.wind_speed / 2) * 2,
+        "uv_index": round(weather.uv_index),
+        "pressure": round(weather.pressure / 5) * 5,
+        "clouds": round(weather.clouds / 10) * 10,
+    }
+
+
+def _join_source_names(sources: list) -> str:
+    """Join source filenames for display, without the .pdf suffix."""
+    return ", ".join(s.get('filename', 'tài liệu chuyên ngành').removesuffix('.pdf') for s in sources)
+
+
+# Detailed administrative structure: xã/phường + huyện/quận + tỉnh/thành phố
+_DETAILED_LOCATION_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    # Full structure: xã/phường + huyện + tỉnh
+    r'(?:xã|phường|thị trấn)\s+([^,]+),?\s*(?:huyện|quận|thành phố|tp)\s+([^,]+),?\s*(?:tỉnh|thành phố|tp)?\s*([^,\.]+)',
+    # Huyện + tỉnh
+    r'(?:huyện|quận|thành phố|tp)\s+([^,]+),?\s*(?:tỉnh|thành phố|tp)?\s*([^,\.]+)',
+    # Just tỉnh/thành phố
+    r'(?:tỉnh|thành phố|tp)\s+([^,\.]+)',
+))
+
+# Administrative unit indicators used as the final pattern fallback
+_ADMIN_INDICATOR_PATTERNS = tuple((re.compile(pattern), admin_type) for pattern, admin_type in (
+    (r'xã\s+(\w+(?:\s+\w+)?)', 'commune'),
+    (r'phường\s+(\w+(?:\s+\w+)?)', 'ward'),
+    (r'huyện\s+(\w+(?:\s+\w+)?)', 'district'), 
+    (r'quận\s+(\w+(?:\s+\w+)?)', 'district'),
+    (r'thị xã\s+(\w+(?:\s+\w+)?)', 'town'),
+    (r'thành phố\s+(\w+(?:\s+\w+)?)', 'city')
+))
+
+# Main city of each province, used as its weather API location
+_PROVINCE_CAPITALS = MappingProxyType({
+    'Gia Lai': 'Pleiku',
+    'Lam Dong': 'Da Lat', 
+    'Dak Lak': 'Buon Ma Thuot',
+    'Khanh Hoa': 'Nha Trang',
+    'Binh Dinh': 'Quy Nhon',
+    'Phu Yen': 'Tuy Hoa',
+    'Quang Nam': 'Hoi An',
+    'Nghe An': 'Vinh',
+    'Thai Nguyen': 'Thai Nguyen',
+    'Cao Bang': 'Cao Bang',
+    'Ha Giang': 'Ha Giang',
+    'An Giang': 'Long Xuyen',
+    'Ca Mau': 'Ca Mau',
+    'Soc Trang': 'Soc Trang',
+    'Vinh Long': 'Vinh Long',
+    'Ben Tre': 'Ben Tre',
+    'Kon Tum': 'Kon Tum'
+})
+
+# Common Vietnamese crop names and their spellings, checked in order
+_CROP_KEYWORDS = MappingProxyType({
+    'cà phê': ('cà phê', 'cafe', 'coffee'),
+    'lúa': ('lúa', 'lúa gạo', 'gạo', 'rice'),
+    'tiêu': ('tiêu', 'hạt tiêu', 'pepper'),
+    'cao su': ('cao su', 'rubber'),
+    'điều': ('điều', 'hạt điều', 'cashew'),
+    'dừa': ('dừa', 'coconut'),
+    'chuối': ('chuối', 'banana'),
+    'xoài': ('xoài', 'mango'),
+    'bưởi': ('bưởi', 'pomelo'),
+    'cam': ('cam', 'orange'),
+    'chanh': ('chanh', 'lemon'),
+    'khoai lang': ('khoai lang', 'sweet potato'),
+    'khoai tây': ('khoai tây', 'potato'),
+    'ngô': ('ngô', 'bắp', 'corn', 'maize'),
+    'đậu': ('đậu', 'bean'),
+    'rau': ('rau', 'vegetable'),
+    'hoa': ('hoa', 'flower')
+})
+# Crop spelling -> (priority, crop); earlier crops in _CROP_KEYWORDS win
+_CROP_BY_KEYWORD = {
+    keyword: (priority, crop)
+    for priority, (crop, keywords) in reversed(list(enumerate(_CROP_KEYWORDS.items())))
+    for keyword in keywords
+}
+_CROP_KEYWORD_PATTERN = re.compile(r"(?<!\w)(?:" + _build_trie_regex(_CROP_BY_KEYWORD) + r")(?!\w)")
+
+
+@lru_cache(maxsize=4096)
+def _match_crop(query_lower: str) -> Optional[str]:
+    """Find the highest-priority crop mentioned in a normalized query, in a single scan."""
+    best_match = min(
+        (_CROP_BY_KEYWORD[match.group()] for match in _CROP_KEYWORD_PATTERN.finditer(query_lower)),
+        key=itemgetter(0),
+        default=None
+    )
+    return best_match[1] if best_match else None
+
+
+@lru_cache(maxsize=4096)
+def _match_all_crops(query_lower: str) -> tuple:
+    """All crops mentioned in a normalized query, in _CROP_KEYWORDS order."""
+    matched = {_CROP_BY_KEYWORD[match.group()] for match in _CROP_KEYWORD_PATTERN.finditer(query_lower)}
+    return tuple(crop for _, crop in sorted(matched))
+
+# Extended Vietnamese locations with district/commune level: spellings -> API location
+_LOCATION_MAPPINGS = {
+    # Ho Chi Minh City districts
+    'quận 1|district 1': 'District 1, Ho Chi Minh City',
+    'quận 3|district 3': 'District 3, Ho Chi Minh City', 
+    'quận 7|district 7': 'District 7, Ho Chi Minh City',
+    'quận bình thạnh|binh thanh': 'Binh Thanh District, Ho Chi Minh City',
+    'quận thủ đức|thu duc': 'Thu Duc District, Ho Chi Minh City',
+    'quận gò vấp|go vap': 'Go Vap District, Ho Chi Minh City',
+    
+    # Hanoi districts
+    'quận ba đình|ba dinh': 'Ba Dinh District, Hanoi',
+    'quận hoàn kiếm|hoan kiem': 'Hoan Kiem District, Hanoi',
+    'quận đống đa|dong da': 'Dong Da District, Hanoi',
+    'quận cầu giấy|cau giay': 'Cau Giay District, Hanoi',
+    
+    # Gia Lai detailed
+    'huyện đắk pơ|dak po': 'Dak Po, Gia Lai',
+    'huyện chư prông|chu prong': 'Chu Prong, Gia Lai',
+    'huyện ia grai': 'Ia Grai, Gia Lai',
+    'thị xã an khê|an khe': 'An Khe, Gia Lai',
+    'huyện kong chro': 'Kong Chro, Gia Lai',
+    
+    # Đắk Lắk detailed
+    'huyện ea hleo': 'Ea H Leo, Dak Lak',
+    'huyện krông búk|krong buk': 'Krong Buk, Dak Lak',
+    'huyện m đrắk|m drak': 'M Drak, Dak Lak',
+    'thị xã buôn hồ|buon ho': 'Buon Ho, Dak Lak',
+    
+    # Lâm Đồng detailed
+    'huyện đức trọng|duc trong': 'Duc Trong, Lam Dong',
+    'huyện lạc dương|lac duong': 'Lac Duong, Lam Dong',
+    'huyện đơn dương|don duong': 'Don Duong, Lam Dong',
+    'thị xã bảo lộc|bao loc': 'Bao Loc, Lam Dong',
+    
+    # Major provinces with main cities
+    'hồ chí minh|sài gòn|tp hcm|thành phố hồ chí minh': 'Ho Chi Minh City',
+    'hà nội|hanoi|thủ đô': 'Hanoi',
+    'đà nẵng|da nang': 'Da Nang',
+    'cần thơ|can tho': 'Can Tho',
+    'hải phòng|hai phong': 'Hai Phong',
+    
+    # Central Vietnam
+    'đà lạt|da lat|lâm đồng|lam dong': 'Da Lat',
+    'gia lai|pleiku': 'Pleiku',
+    'đắk lắk|dak lak|buôn ma thuột|buon ma thuot': 'Buon Ma Thuot',
+    'khánh hòa|khanh hoa|nha trang': 'Nha Trang',
+    'huế|hue|thừa thiên huế': 'Hue',
+    'quảng nam|quang nam|hội an|hoi an': 'Hoi An',
+    'bình định|binh dinh|quy nhon': 'Quy Nhon',
+    'phú yên|phu yen|tuy hoa': 'Tuy Hoa',
+    
+    # Northern Vietnam  
+    'nghệ an|nghe an|vinh': 'Vinh',
+    'thái nguyên|thai nguyen': 'Thai Nguyen',
+    'lạng sơn|lang son': 'Lang Son',
+    'hạ long|ha long|quảng ninh': 'Ha Long',
+    'sapa|sa pa|lào cai': 'Sapa',
+    'cao bằng|cao bang': 'Cao Bang',
+    'hà giang|ha giang': 'Ha Giang',
+    'điện biên|dien bien': 'Dien Bien Phu',
+    
+    # Southern Vietnam
+    'vũng tàu|vung tau|bà rịa|ba ria': 'Vung Tau',
+    'biên hòa|bien hoa|đồng nai|dong nai': 'Bien Hoa',
+    'bình dương|binh duong|thủ dầu một': 'Thu Dau Mot',
+    'tây ninh|tay ninh': 'Tay Ninh',
+    'phú quốc|phu quoc': 'Phu Quoc',
+    'cà mau|ca mau': 'Ca Mau',
+    
+    # Mekong Delta
+    'an giang|long xuyên|long xuyen': 'Long Xuyen',
+    'sóc trăng|soc trang': 'Soc Trang',
+    'vĩnh long|vinh long': 'Vinh Long',
+    'bến tre|ben tre': 'Ben Tre',
+    'trà vinh|tra vinh': 'Tra Vinh',
+    'hậu giang|hau giang|vị thanh': 'Vi Thanh',
+    'kiên giang|kien giang|rạch giá': 'Rach Gia',
+    
+    # Central Highlands
+    'kon tum': 'Kon Tum',
+    'đắk nông|dak nong': 'Gia Nghia',
+}
+
+# ASCII keyword -> (location, accepted spellings, specificity) derived from _LOCATION_MAPPINGS
+_LOCATION_KEYWORDS = {
+    keyword: (location, frozenset(spellings.split("|")), len(spellings.split("|")))
+    for spellings, location in _LOCATION_MAPPINGS.items()
+    for keyword in _fold_spellings(spellings)
+}
+# All keywords in one pass: the lookahead reports a match at every offset (so overlapping
+# keywords are all seen) and the greedy trie picks the longest whole-word one per offset,
+# so e.g. "quan 10" does not match "quan 1" and "thue" does not match "hue"
+_LOCATION_KEYWORD_PATTERN = re.compile(r"(?=(?<!\w)(" + _build_trie_regex(_LOCATION_KEYWORDS) + r")(?!\w))")
+
+# Static blocks of the weather advice report
+_ADVICE_GRID_HEADER = "CHI TIẾT | NHIỆT ĐỘ | TỐC ĐỘ GIÓ (km/h)"
+_ADVICE_GRID_LABELS = (
+    "Nhiệt độ        | Cảm giác ...     | Độ ẩm",
+    "Gió             | Khả năng ...     | Áp suất kh...",
+    "Tầm nhìn        | Chỉ số UV       | Độ che mây",
+    "Điểm sương      | Bình minh       | Hoàng hôn",
+)
+_ADVICE_GRID_FALLBACK = (
+    "Nhiệt độ        | Cảm giác như    | Độ ẩm",
+    "25.0°C            | 27.0°C          | 65%",
+)
+_ADVICE_SECTIONS = (
+    ("KHUYẾN NGHỊ:", "recommendations"),
+    ("NÊN THỰC HIỆN:", "optimal_activities"),
+    ("NÊN TRÁNH:", "avoid_activities"),
+    ("CẢNH BÁO:", "warnings"),
+)
+
+# User-facing weather error messages
+_WEATHER_LOCATION_MISSING: Final[str] = (
+    "🗺️ **Cần thông tin địa điểm**\n\n"
+    "Để xem thông tin thời tiết, vui lòng cho biết bạn muốn biết thời tiết ở đâu:\n"
+    "• Tỉnh/thành phố (ví dụ: Hồ Chí Minh, Hà Nội)\n"
+    "• Huyện/quận cụ thể (ví dụ: Buôn Ma Thuột, Quận 1)\n"
+    "• Xã/phường chi tiết (ví dụ: xã Ea Kao)\n\n"
+    "💡 *Ví dụ: 'thời tiết hôm nay ở Đắk Lắk'*"
+)
+_AGRICULTURE_LOCATION_MISSING: Final[str] = (
+    "🗺️ **Cần thông tin địa điểm**\n\n"
+    "Để đưa ra tư vấn chính xác, vui lòng cho biết bạn đang ở:\n"
+    "• Tỉnh/thành phố (ví dụ: Đắk Lắk, Lâm Đồng)\n"
+    "• Hoặc huyện/quận cụ thể (ví dụ: Buôn Ma Thuột)\n"
+    "• Hoặc xã/phường chi tiết (ví dụ: xã Ea Kao)\n\n"
+    "💡 *Bạn có thể hỏi: 'thời tiết ở Đắk Lắk như thế nào cho cà phê?'*"
+)
+_WEATHER_UNAVAILABLE: Final[str] = (
+    "❌ **Không thể lấy dữ liệu thời tiết cho '{location}'**\n\n"
+    "Vui lòng kiểm tra lại tên địa điểm hoặc thử với:\n"
+    "• Tên tỉnh/thành phố chính xác\n"
+    "• Tên huyện/quận lớn trong khu vực\n"
+    "• Tên tiếng Việt không dấu\n\n"
+    "💡 *Ví dụ: thay vì 'Krông Năng' hãy thử 'Dak Lak'*"
+)
+_WEATHER_ERROR: Final[str] = (
+    "⚠️ **Lỗi lấy thông tin thời tiết**\n\n"
+    "Xin lỗi, tôi gặp sự cố khi lấy thông tin thời tiết. "
+    "Vui lòng thử lại sau ít phút.\n\n"
+    "💡 *Có thể thử với tên địa điểm khác hoặc liên hệ hỗ trợ.*"
+)
+_AGRICULTURE_DEBUG_ERROR: Final[str] = (
+    "⚠️ **Debug: Lỗi xử lý yêu cầu**\n\n"
+    "Error: {error}\n\n"
+    "Query: {query}\n"
+    "Conversation history length: {history_length}\n"
+    "Last weather data: {has_weather_data}\n"
+    "Last location: {last_location}\n\n"
+    "Vui lòng thử lại hoặc liên hệ hỗ trợ kỹ thuật."
+)
+
+# Banner between the weather display and the expert consultation
+_EXPERT_ADVICE_BANNER: Final[str] = f"{'=' * 60}\n🧑‍🌾 **TƯ VẤN CHUYÊN SÂU TỪ CHUYÊN GIA**\n{'=' * 60}"
+
+# Prompt for answering with retrieved knowledge base context
+_CONTEXTUAL_PROMPT = """
+Bạn là một chuyên gia nông nghiệp giàu kinh nghiệm, chuyên tư vấn về canh tác cà phê, lúa, hồ tiêu, ngô, khoai tây và các cây trồng khác. Hãy trả lời câu hỏi một cách tự nhiên, thân thiện và chi tiết như đang tư vấn trực tiếp cho nông dân.
+
+Câu hỏi: "{query}"
+
+Kiến thức tham khảo:
+{context}
+
+Hãy trả lời một cách:
+• **Tự nhiên**: Như đang nói chuyện với nông dân, không cần nhắc đến "tài liệu" hay "theo thông tin"
+• **Thực tế**: Đưa ra lời khuyên cụ thể, có thể áp dụng được ngay
+• **Toàn diện**: Bao gồm nguyên nhân, triệu chứng, cách phòng trừ, thời điểm thích hợp
+• **Có cấu trúc**: Sử dụng tiêu đề và bullet points để dễ đọc
+• **Chi tiết**: Viết đầy đủ 400-600 từ với thông tin hữu ích
+
+Viết như một chuyên gia đang chia sẻ kinh nghiệm thực tế, không phải đang trích dẫn tài liệu.
+"""
+
+# Prompt for questions without usable context
+_GENERAL_PROMPT = """
+Người dùng hỏi: "{query}"
+
+Bạn là một chuyên gia nông nghiệp thân thiện. Hãy trả lời một cách lịch sự rằng bạn chuyên 
+tư vấn về canh tác các loại cây trồng như cà phê, lúa, hồ tiêu, ngô, khoai tây dựa trên 
+kiến thức chuyên môn có sẵn.
+
+Gợi ý họ hỏi những câu hỏi cụ thể hơn về:
+- Kỹ thuật canh tác
+- Phòng trừ sâu bệnh  
+- Chăm sóc cây trồng
+- Biện pháp tăng năng suất
+
+Trả lời ngắn gọn, thân thiện và hướng dẫn cụ thể.
+"""
+
+# Prompt for extracting a weather API location from the query
+_LOCATION_EXTRACTION_PROMPT = """
+Hãy trích xuất địa điểm chính xác nhất từ câu hỏi sau.
+Ưu tiên trích xuất đến cấp xã/phường/thị trấn nếu có, sau đó đến huyện/quận, rồi tỉnh/thành phố.
+Trả về tên địa điểm bằng tiếng Anh để sử dụng với API thời tiết.
+
+Câu hỏi: "{query}"
+
+Quy tắc trích xuất theo thứ tự ưu tiên:
+1. **Xã/Phường/Thị trấn**: Nếu có đề cập xã/phường cụ thể
+2. **Huyện/Quận**: Nếu có đề cập huyện/quận cụ thể  
+3. **Tỉnh/Thành phố**: Nếu chỉ có tỉnh/thành phố
+4. **Thành phố lớn**: Ưu tiên thành phố chính của tỉnh
+
+Ví dụ chi tiết:
+- "xã Tân Phú, huyện Châu Thành, An Giang" → "Tan Phu, Chau Thanh, An Giang"
+- "phường 1, quận 1, TP HCM" → "Ward 1, District 1, Ho Chi Minh City"  
+- "huyện Đắk Pơ, Gia Lai" → "Dak Po, Gia Lai"
+- "thị trấn Pleiku, Gia Lai" → "Pleiku, Gia Lai"
+- "Gia Lai" → "Pleiku" (thành phố chính)
+- "Lâm Đồng" → "Da Lat" (thành phố chính)
+- "Đắk Lắk" → "Buon Ma Thuot" (thành phố chính)
+- "Khánh Hòa" → "Nha Trang" (thành phố chính)
+
+Đặc biệt lưu ý:
+- Với các tỉnh miền núi/nông thôn: trả về tên huyện hoặc thị trấn chính
+- Với thành phố lớn: có thể trả về quận/huyện cụ thể
+- Nếu không rõ địa điểm: trả về "Ho Chi Minh City"
+
+Format trả về:
+- Nếu có đầy đủ thông tin: "Tên cụ thể, Huyện/Quận, Tỉnh/Thành"
+- Nếu chỉ có huyện: "Tên huyện, Tỉnh" 
+- Nếu chỉ có tỉnh: "Thành phố chính của tỉnh"
+
+Chỉ trả về tên địa điểm, không giải thích:
+"""
+
+# Prompt for the comprehensive weather + agriculture consultation
+_WEATHER_AGRICULTURE_PROMPT = """
+Bạn là chuyên gia nông nghiệp hàng đầu với 20+ năm kinh nghiệm tư vấn cà phê và cây trồng.
+Hãy tạo ra lời tư vấn chi tiết, toàn diện dựa trên thông tin thời tiết thực tế và kiến thức chuyên môn.
+
+THÔNG TIN THỜI TIẾT HIỆN TẠI:
+📍 Địa điểm: {location_name}
+🌡️ Nhiệt độ: {temperature}°C (cảm giác {feels_like}°C)
+💧 Độ ẩm: {humidity}%
+💨 Gió: {wind_speed:.1f} km/h {wind_direction_text}
+☀️ UV: {uv_index} 
+🔆 Áp suất: {pressure} hPa
+☁️ Mây: {clouds}%
+📝 Tình trạng: {description}
+
+CÂU HỎI HIỆN TẠI: "{user_query}"
+
+NGỮ CẢNH HỘI THOẠI TRƯỚC:
+{conversation_context}
+
+KIẾN THỨC CHUYÊN MÔN THAM KHẢO:
+{context}
+
+NHIỆM VỤ:
+1. Phân tích chi tiết tác động của thời tiết lên {crop_type}
+2. Đưa ra khuyến nghị cụ thể, có thể thực hiện ngay
+3. Giải thích lý do khoa học đằng sau mỗi khuyến nghị
+4. Bao gồm lưu ý về thời điểm, cách thức thực hiện
+5. Cảnh báo rủi ro và cách phòng tránh
+
+YÊU CẦU TRÌNH BÀY:
+• **Tự nhiên**: Như đang tư vấn trực tiếp cho nông dân
+• **Chi tiết**: 500-800 từ với thông tin hữu ích
+• **Có cấu trúc**: Sử dụng heading và bullet points rõ ràng
+• **Thực tế**: Khuyến nghị có thể áp dụng ngay với điều kiện hiện tại
+• **Khoa học**: Giải thích cơ sở khoa học khi cần thiết
+
+FORMAT RESPONSE:
+
+## 🌤️ PHÂN TÍCH THỜI TIẾT & TÁC ĐỘNG
+
+## 💡 KHUYẾN NGHỊ CHI TIẾT
+
+## ⚠️ LƯU Ý QUAN TRỌNG
+
+## 📅 KẾ HOẠCH THỰC HIỆN
+
+Hãy viết như một chuyên gia đang chia sẻ kinh nghiệm thực tế, không phải trích dẫn tài liệu.
+"""
+
+
+@dataclass
+class WeatherContext:
+    """Location and weather resolved for a weather request."""
+    location: Optional[str]
+    weather: Optional[WeatherCondition]
+    is_followup: bool
+    resolved_at: float
+    error_response: Optional[Dict[str, Any]] = None
 
 
 class ActionExecutor(LoggerMixin):
@@ -27,18 +560,61 @@ class ActionExecutor(LoggerMixin):
             max_output_tokens=settings.max_output_tokens,  # Increased for longer responses
             google_api_key=settings.google_api_key
         )
+        # Bound in-flight Gemini calls to stay under the API rate limits
+        self._llm_semaphore = asyncio.Semaphore(settings.max_llm_concurrency)
         self.search_tools = SearchTools()
         self.weather_advisor = AgricultureWeatherAdvisor()
         
-    async def execute_action(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        # Exact + semantic cache for generated responses, reusing the retrieval embeddings
+        self._response_cache = ResponseCache(
+            embed_fn=self.search_tools.document_retriever.vector_store.embeddings.embed_query,
+            max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+            similarity_threshold=RESPONSE_CACHE_SIMILARITY_THRESHOLD
+        )
+        
+        # Weather cache shared across sessions, keyed by normalized location
+        self._weather_cache = ResponseCache(max_entries=WEATHER_CACHE_MAX_ENTRIES)
+        # Upstream fetches in flight by location key, awaited by every concurrent miss
+        self._inflight_weather: Dict[str, asyncio.Task] = {}
+        
+        # Extracted locations keyed by normalized query, so repeated queries skip extraction
+        self._location_cache = ResponseCache(max_entries=LOCATION_CACHE_MAX_ENTRIES)
+        
+        # Speculative knowledge base searches started during intent analysis, by query
+        self._prefetched_searches: Dict[str, asyncio.Task] = {}
+        
+    def prefetch_document_search(self, query: str) -> None:
+        """
+        Start the document search for a query in the background.
+        
+        Called while the intent is still being analyzed so retrieval overlaps
+        the intent LLM call; the result lands in the search cache and is
+        simply unused when the intent turns out not to be a document search.
+        Queries that name the weather are skipped.
+        """
+        if not query or query in self._prefetched_searches:
+            return
+        if _WEATHER_QUERY_PATTERN.search(_normalize_query(query)):
+            return
+        
+        task = asyncio.create_task(asyncio.to_thread(
+            self.search_tools.search_knowledge_base,
+            query=query,
+            limit=_DOCUMENT_SEARCH_LIMIT
+        ))
+        self._prefetched_searches[query] = task
+        task.add_done_callback(lambda _: self._prefetched_searches.pop(query, None))
+        
+    async def execute_action(self, state: Dict[str, Any], stream: bool = False) -> Dict[str, Any]:
         """
         Execute action based on intent analysis results.
         
         Args:
             state: Current state containing intent analysis results
+            stream: Return document answers as an async token iterator in "response_stream"
             
         Returns:
-            Updated state with response and results
+            State updates with response and results (merged by the graph node)
         """
         intent = state.get("intent")
         confidence = state.get("confidence", 0.0)
@@ -54,9 +630,9 @@ class ActionExecutor(LoggerMixin):
         try:
             # Route to appropriate action based on intent
             if intent == IntentType.SEARCH_DOCUMENT:
-                result = self._handle_document_search(state)
+                result = await self._handle_document_search(state, stream=stream)
             elif intent == IntentType.GENERAL_QUESTION:
-                result = self._handle_general_question(state)
+                result = await self._handle_general_question(state)
             elif intent == IntentType.WEATHER_QUERY:
                 result = await self._handle_weather_query(state)
             elif intent == IntentType.WEATHER_AGRICULTURE:
@@ -82,30 +658,53 @@ class ActionExecutor(LoggerMixin):
             self.logger.error("Action execution failed", error=str(e))
             return self._create_error_response(state, str(e))
     
-    def _handle_document_search(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _handle_document_search(self, state: Dict[str, Any], stream: bool = False) -> Dict[str, Any]:
         """Handle document search intent."""
         user_query = state.get("user_query", "")
         confidence = state.get("confidence", 0.0)
         
-        # Perform knowledge base search
-        search_result = self.search_tools.search_knowledge_base(
+        # Wait for a speculative search still in flight; it fills the search cache
+        prefetch = self._prefetched_searches.get(user_query)
+        if prefetch is not None:
+            await prefetch
+        
+        # Perform knowledge base search off the event loop; it embeds and scans
+        # the index unless the prefetch (or an earlier turn) already cached it
+        search_result = await asyncio.to_thread(
+            self.search_tools.search_knowledge_base,
             query=user_query,
-            limit=15,  # Further increased for maximum comprehensiveness
+            limit=_DOCUMENT_SEARCH_LIMIT,  # Further increased for maximum comprehensiveness
             min_score=0.3 if confidence >= HIGH_CONFIDENCE_THRESHOLD else 0.2  # Even lower threshold
         )
         
+        if search_result["has_results"] and stream:
+            # Caller consumes tokens as they are generated
+            return {
+                "response": "",
+                "response_stream": self._stream_contextual_response(
+                    query=user_query,
+                    context=search_result["context"],
+                    sources=search_result["sources"],
+                    cache_namespace=self._get_cache_namespace(state)
+                ),
+                "response_type": "document_search",
+                "search_results": search_result,
+                "sources": search_result["sources"],
+                "context_used": search_result.get("context", "")
+            }
+        
         if search_result["has_results"]:
             # Generate response using LLM with context
-            response = self._generate_contextual_response(
+            response = await self._generate_contextual_response(
                 query=user_query,
                 context=search_result["context"],
-                sources=search_result["sources"]
+                sources=search_result["sources"],
+                cache_namespace=self._get_cache_namespace(state)
             )
         else:
             response = ERROR_RESPONSES["no_results"]
         
         return {
-            **state,
             "response": response,
             "response_type": "document_search",
             "search_results": search_result,
@@ -113,13 +712,17 @@ class ActionExecutor(LoggerMixin):
             "context_used": search_result.get("context", "")
         }
     
-    def _handle_general_question(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _handle_general_question(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Handle general question intent."""
         user_query = state.get("user_query", "")
         confidence = state.get("confidence", 0.0)
         
-        # Try document search first
-        search_result = self.search_tools.search_knowledge_base(
+        cache_namespace = self._get_cache_namespace(state)
+        
+        # Search off the event loop; the general answer is only generated once the
+        # search turns out weak, so no LLM call or semaphore slot is spent speculatively
+        search_result = await asyncio.to_thread(
+            self.search_tools.search_knowledge_base,
             query=user_query,
             limit=3,
             min_score=0.5
@@ -127,19 +730,19 @@ class ActionExecutor(LoggerMixin):
         
         if search_result["has_results"] and search_result["max_confidence"] > 0.6:
             # Use document-based response
-            response = self._generate_contextual_response(
+            response = await self._generate_contextual_response(
                 query=user_query,
                 context=search_result["context"],
-                sources=search_result["sources"]
+                sources=search_result["sources"],
+                cache_namespace=cache_namespace
             )
             response_type = "general_with_context"
         else:
             # Generate general response
-            response = self._generate_general_response(user_query)
+            response = await self._generate_general_response(user_query, cache_namespace=cache_namespace)
             response_type = "general_without_context"
         
         return {
-            **state,
             "response": response,
             "response_type": response_type,
             "search_results": search_result,
@@ -147,90 +750,124 @@ class ActionExecutor(LoggerMixin):
             "context_used": search_result.get("context", "")
         }
     
-    async def _handle_weather_query(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle pure weather query with conversation context."""
-        try:
-            query = state.get("user_query", "")
-            conversation_history = state.get("conversation_history", [])
-            last_weather_data = state.get("last_weather_data")
-            last_location = state.get("last_location")
-            
-            self.logger.info(f"Processing weather query: {query}")
-            
-            # Check if this is a follow-up question
-            is_followup = self._is_weather_followup_question(query, conversation_history)
-            
-            # Extract location - use last location for follow-up questions
-            if is_followup and last_location:
-                location = last_location
-                self.logger.info(f"Using previous location for follow-up: {location}")
-            else:
-                location = self._extract_location_from_query(query)
+    async def _resolve_weather_context(
+        self,
+        state: Dict[str, Any],
+        response_type: str,
+        location_missing_response: str,
+        use_demo_fallback: bool = False
+    ) -> WeatherContext:
+        """
+        Resolve location and weather shared by the weather handlers.
+        
+        Args:
+            state: Current state
+            response_type: Response type used for early error responses
+            location_missing_response: Response when no location can be extracted
+            use_demo_fallback: Fall back to demo weather data if the API fails
             
-            if not location:
-                return {
-                    **state,
-                    "response": (
-                        "🗺️ **Cần thông tin địa điểm**\n\n"
-                        "Để xem thông tin thời tiết, vui lòng cho biết bạn muốn biết thời tiết ở đâu:\n"
-                        "• Tỉnh/thành phố (ví dụ: Hồ Chí Minh, Hà Nội)\n"
-                        "• Huyện/quận cụ thể (ví dụ: Buôn Ma Thuột, Quận 1)\n"
-                        "• Xã/phường chi tiết (ví dụ: xã Ea Kao)\n\n"
-                        "💡 *Ví dụ: 'thời tiết hôm nay ở Đắk Lắk'*"
-                    ),
-                    "response_type": "weather_query",
+        Returns:
+            Weather context, with error_response set if the handler should stop
+        """
+        now = time.monotonic()
+        query = state.get("user_query", "")
+        conversation_history = state.get("conversation_history", [])
+        last_weather_data = state.get("last_weather_data")
+        last_location = state.get("last_location")
+        
+        # Check if this is a follow-up question
+        is_followup = self._is_weather_followup_question(query, conversation_history)
+        
+        # Extract location - use last location for follow-up questions
+        if is_followup and last_location:
+            location = last_location
+            self.logger.debug("Using previous location for follow-up", location=location)
+        else:
+            location = await self._extract_location_from_query(query)
+        
+        if not location:
+            return WeatherContext(
+                location=None,
+                weather=None,
+                is_followup=is_followup,
+                resolved_at=now,
+                error_response={
+                    "response": location_missing_response,
+                    "response_type": response_type,
                     "search_results": None
                 }
-            
-            # Get weather data - use cached data for recent follow-ups
-            if (is_followup and last_weather_data and 
-                last_weather_data.get('location') == location and
-                datetime.now().timestamp() - last_weather_data.get('timestamp', 0) < 1800):  # 30 minutes
-                weather = last_weather_data['weather']
-                self.logger.info("Using cached weather data for follow-up")
-            else:
-                weather = await self.weather_advisor.get_current_weather(location)
-            
-            if not weather:
-                return {
-                    **state,
-                    "response": (
-                        f"❌ **Không thể lấy dữ liệu thời tiết cho '{location}'**\n\n"
-                        "Vui lòng kiểm tra lại tên địa điểm hoặc thử với:\n"
-                        "• Tên tỉnh/thành phố chính xác\n"
-                        "• Tên huyện/quận lớn trong khu vực\n"
-                        "• Tên tiếng Việt không dấu\n\n"
-                        "💡 *Ví dụ: thay vì 'Krông Năng' hãy thử 'Dak Lak'*"
-                    ),
-                    "response_type": "weather_query",
+            )
+        
+        # Get weather data - use cached data for recent follow-ups
+        if (is_followup and last_weather_data and 
+            last_weather_data.get('location') == location and
+            now - last_weather_data.get('monotonic_ts', float('-inf')) < 1800):  # 30 minutes
+            weather = last_weather_data['weather']
+            self.logger.debug("Using cached weather data for follow-up", location=location)
+        else:
+            weather = await self._get_current_weather(location)
+            if not weather and use_demo_fallback:
+                self.logger.warning(f"Weather API failed for {location}, using demo data")
+                weather = self.weather_advisor._get_demo_weather_data(location)
+        
+        if not weather:
+            self.logger.error(f"No weather data available for {location}")
+            return WeatherContext(
+                location=location,
+                weather=None,
+                is_followup=is_followup,
+                resolved_at=now,
+                error_response={
+                    "response": _WEATHER_UNAVAILABLE.format(location=location),
+                    "response_type": response_type,
                     "search_results": None
                 }
+            )
+        
+        return WeatherContext(location=location, weather=weather, is_followup=is_followup, resolved_at=now)
+    
+    def _weather_state_updates(self, context: WeatherContext) -> Dict[str, Any]:
+        """Build the weather follow-up state shared by the weather handlers."""
+        return {
+            "last_weather_data": {
+                'weather': context.weather,
+                'location': context.location,
+                'monotonic_ts': context.resolved_at
+            },
+            "last_location": context.location
+        }
+    
+    def _weather_source(self, weather: WeatherCondition) -> Dict[str, Any]:
+        """Build the weather API source entry."""
+        return {
+            "type": "weather_api",
+            "location": weather.location_name,
+            "weather_summary": f"{weather.temperature}°C, {weather.description}",
+            "confidence": "95%"
+        }
+    
+    async def _handle_weather_query(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle pure weather query with conversation context."""
+        try:
+            self.logger.debug("Processing weather query", query=state.get("user_query", "")[:100])
             
-            # Format pure weather response (without agriculture advice)
-            response = self._format_pure_weather_response(weather)
+            context = await self._resolve_weather_context(
+                state, "weather_query", _WEATHER_LOCATION_MISSING
+            )
+            if context.error_response:
+                return context.error_response
             
-            # Update state with weather data
-            weather_data_update = {
-                'weather': weather,
-                'location': location,
-                'timestamp': datetime.now().timestamp()
-            }
+            # Format pure weather response (without agriculture advice)
+            response = self._format_pure_weather_response(context.weather)
             
             return {
-                **state,
                 "response": response,
                 "response_type": "weather_query",
-                "last_weather_data": weather_data_update,
-                "last_location": location,
+                **self._weather_state_updates(context),
                 "search_results": {
                     "has_results": True,
                     "context": response,
-                    "sources": [{
-                        "type": "weather_api",
-                        "location": weather.location_name,
-                        "weather_summary": f"{weather.temperature}°C, {weather.description}",
-                        "confidence": "95%"
-                    }],
+                    "sources": [self._weather_source(context.weather)],
                     "max_confidence": 0.95
                 }
             }
@@ -238,13 +875,7 @@ class ActionExecutor(LoggerMixin):
         except Exception as e:
             self.logger.error(f"Error in weather query handling: {e}")
             return {
-                **state,
-                "response": (
-                    "⚠️ **Lỗi lấy thông tin thời tiết**\n\n"
-                    "Xin lỗi, tôi gặp sự cố khi lấy thông tin thời tiết. "
-                    "Vui lòng thử lại sau ít phút.\n\n"
-                    "💡 *Có thể thử với tên địa điểm khác hoặc liên hệ hỗ trợ.*"
-                ),
+                "response": _WEATHER_ERROR,
                 "response_type": "weather_error",
                 "search_results": None
             }
@@ -253,118 +884,44 @@ class ActionExecutor(LoggerMixin):
         """Handle weather-agriculture consultation requests with conversation context."""
         try:
             query = state.get("user_query", "")
-            conversation_history = state.get("conversation_history", [])
-            last_weather_data = state.get("last_weather_data")
-            last_location = state.get("last_location")
-            
-            self.logger.info(f"Processing weather-agriculture query: {query}")
-            self.logger.info(f"State keys: {list(state.keys())}")
-            self.logger.info(f"Conversation history: {len(conversation_history) if conversation_history else 0} items")
-            self.logger.info(f"Last weather data: {bool(last_weather_data)}")
-            self.logger.info(f"Last location: {last_location}")
-            
-            # Check if this is a follow-up question
-            is_followup = self._is_weather_followup_question(query, conversation_history)
-            self.logger.info(f"Follow-up detected: {is_followup}")
-            
-            # Extract location - use last location for follow-up questions
-            if is_followup and last_location:
-                location = last_location
-                self.logger.info(f"Using previous location for follow-up: {location}")
-            else:
-                location = self._extract_location_from_query(query)
-                self.logger.info(f"Extracted location from query: {location}")
-            
-            if not location:
-                return {
-                    **state,
-                    "response": (
-                        "🗺️ **Cần thông tin địa điểm**\n\n"
-                        "Để đưa ra tư vấn chính xác, vui lòng cho biết bạn đang ở:\n"
-                        "• Tỉnh/thành phố (ví dụ: Đắk Lắk, Lâm Đồng)\n"
-                        "• Hoặc huyện/quận cụ thể (ví dụ: Buôn Ma Thuột)\n"
-                        "• Hoặc xã/phường chi tiết (ví dụ: xã Ea Kao)\n\n"
-                        "💡 *Bạn có thể hỏi: 'thời tiết ở Đắk Lắk như thế nào cho cà phê?'*"
-                    ),
-                    "response_type": "weather_agriculture",
-                    "search_results": None
-                }
+            self.logger.debug("Processing weather-agriculture query", query=query[:100])
             
-            # Get weather data - use cached data for recent follow-ups
-            if (is_followup and last_weather_data and 
-                last_weather_data.get('location') == location and
-                datetime.now().timestamp() - last_weather_data.get('timestamp', 0) < 1800):  # 30 minutes
-                weather = last_weather_data['weather']
-                self.logger.info("Using cached weather data for follow-up")
-            else:
-                self.logger.info(f"Fetching new weather data for location: {location}")
-                weather = await self.weather_advisor.get_current_weather(location)
-                if not weather:
-                    self.logger.warning(f"Weather API failed for {location}, using demo data")
-                    weather = self.weather_advisor._get_demo_weather_data(location)
-            
-            if not weather:
-                self.logger.error(f"No weather data available for {location}")
-                return {
-                    **state,
-                    "response": (
-                        f"❌ **Không thể lấy dữ liệu thời tiết cho '{location}'**\n\n"
-                        "Vui lòng kiểm tra lại tên địa điểm hoặc thử với:\n"
-                        "• Tên tỉnh/thành phố chính xác\n"
-                        "• Tên huyện/quận lớn trong khu vực\n"
-                        "• Tên tiếng Việt không dấu\n\n"
-                        "💡 *Ví dụ: thay vì 'Krông Năng' hãy thử 'Dak Lak'*"
-                    ),
-                    "response_type": "weather_agriculture",
-                    "search_results": None
-                }
+            context = await self._resolve_weather_context(
+                state, "weather_agriculture", _AGRICULTURE_LOCATION_MISSING, use_demo_fallback=True
+            )
+            if context.error_response:
+                return context.error_response
             
-            # Extract crop type
+            weather = context.weather
             crop_type = self._extract_crop_from_query(query)
             
-            # Get agriculture advice
-            advice = await self.weather_advisor.generate_agriculture_advice(
-                location=location, 
-                crop_type=crop_type
+            # Get agriculture advice and detailed knowledge base context concurrently
+            advice, detailed_context = await asyncio.gather(
+                self.weather_advisor.generate_agriculture_advice(
+                    location=context.location, 
+                    crop_type=crop_type,
+                    weather=weather
+                ),
+                asyncio.to_thread(self._get_detailed_agriculture_context, crop_type, weather, query)
             )
             
-            # Get detailed context from knowledge base
-            detailed_context = self._get_detailed_agriculture_context(crop_type, weather, query)
-            
             # Generate comprehensive response
-            response = self._generate_comprehensive_weather_agriculture_response(
+            response = await self._generate_comprehensive_weather_agriculture_response(
                 weather=weather,
                 advice=advice,
                 detailed_context=detailed_context,
                 user_query=query,
-                conversation_history=conversation_history
+                conversation_history=state.get("conversation_history", []),
+                cache_namespace=self._get_cache_namespace(state, context.location, weather)
             )
             
-            # Update state with new weather data
-            weather_data_update = {
-                'weather': weather,
-                'location': location,
-                'timestamp': datetime.now().timestamp()
-            }
-            
-            # Create sources info
-            sources = [{
-                "type": "weather_api",
-                "location": weather.location_name,
-                "weather_summary": f"{weather.temperature}°C, {weather.description}",
-                "confidence": "95%"
-            }]
-            
-            # Add knowledge base sources
-            if detailed_context.get("sources"):
-                sources.extend(detailed_context["sources"])
+            # Weather source plus knowledge base sources
+            sources = [self._weather_source(weather)] + detailed_context.get("sources", [])
             
             return {
-                **state,
                 "response": response,
                 "response_type": "weather_agriculture_detailed",
-                "last_weather_data": weather_data_update,
-                "last_location": location,
+                **self._weather_state_updates(context),
                 "search_results": {
                     "has_results": True,
                     "context": response,
@@ -375,19 +932,15 @@ class ActionExecutor(LoggerMixin):
             }
             
         except Exception as e:
-            self.logger.error(f"Error in weather-agriculture handling: {e}")
-            import traceback
-            self.logger.error(f"Full traceback: {traceback.format_exc()}")
+            # exception() attaches the traceback, formatted only if the record is emitted
+            self.logger.exception("Error in weather-agriculture handling", error=str(e))
             return {
-                **state,
-                "response": (
-                    f"⚠️ **Debug: Lỗi xử lý yêu cầu**\n\n"
-                    f"Error: {str(e)}\n\n"
-                    f"Query: {state.get('user_query', 'N/A')}\n"
-                    f"Conversation history length: {len(state.get('conversation_history', []))}\n"
-                    f"Last weather data: {bool(state.get('last_weather_data'))}\n"
-                    f"Last location: {state.get('last_location', 'N/A')}\n\n"
-                    "Vui lòng thử lại hoặc liên hệ hỗ trợ kỹ thuật."
+                "response": _AGRICULTURE_DEBUG_ERROR.format(
+                    error=str(e),
+                    query=state.get('user_query', 'N/A'),
+                    history_length=len(state.get('conversation_history', [])),
+                    has_weather_data=bool(state.get('last_weather_data')),
+                    last_location=state.get('last_location', 'N/A')
                 ),
                 "response_type": "weather_agriculture_error",
                 "search_results": None
@@ -395,153 +948,61 @@ class ActionExecutor(LoggerMixin):
     
     def _extract_location_and_crop(self, query: str) -> tuple[str, str]:
         """Extract location and crop type from query."""
-        # Default location (Vietnam)
-        location = "Hà Nội"
-        crop = "cà phê"
-        
-        # Extract Vietnamese locations
-        location_patterns = [
-            r'\b(Hà Nội|hà nội|hanoi)\b',
-            r'\b(Hồ Chí Minh|hồ chí minh|sài gòn|saigon|tp hcm)\b',
-            r'\b(Đà Nẵng|đà nẵng|da nang)\b',
-            r'\b(Đăk Lăk|đăk lăk|dak lak|buôn ma thuột)\b',
-            r'\b(Gia Lai|gia lai|pleiku)\b',
-            r'\b(Lâm Đồng|lâm đồng|đà lạt)\b',
-            r'\b(Kon Tum|kon tum)\b',
-            r'\b(Nghệ An|nghệ an|vinh)\b'
-        ]
-        
-        for pattern in location_patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                location_text = match.group(1).lower()
-                if "hà nội" in location_text or "hanoi" in location_text:
-                    location = "Hà Nội"
-                elif "hồ chí minh" in location_text or "sài gòn" in location_text or "saigon" in location_text:
-                    location = "Hồ Chí Minh"
-                elif "đà nẵng" in location_text:
-                    location = "Đà Nẵng"
-                elif "đăk lăk" in location_text or "buôn ma thuột" in location_text:
-                    location = "Buôn Ma Thuột"
-                elif "gia lai" in location_text or "pleiku" in location_text:
-                    location = "Pleiku"
-                elif "lâm đồng" in location_text or "đà lạt" in location_text:
-                    location = "Đà Lạt"
-                break
-        
-        # Extract crop type
-        crop_patterns = [
-            r'\b(cà phê|cafe|coffee)\b',
-            r'\b(lúa|rice|gạo)\b',
-            r'\b(khoai tây|potato)\b',
-            r'\b(hồ tiêu|pepper|tiêu)\b',
-            r'\b(ngô|corn|bắp)\b',
-            r'\b(đậu|bean)\b'
-        ]
-        
-        for pattern in crop_patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                crop_text = match.group(1).lower()
-                if "cà phê" in crop_text or "cafe" in crop_text or "coffee" in crop_text:
-                    crop = "cà phê"
-                elif "lúa" in crop_text or "rice" in crop_text:
-                    crop = "lúa"
-                elif "khoai" in crop_text or "potato" in crop_text:
-                    crop = "khoai tây"
-                elif "hồ tiêu" in crop_text or "pepper" in crop_text or "tiêu" in crop_text:
-                    crop = "hồ tiêu"
-                break
-        
-        return location, crop
+        return _match_location_and_crop(_normalize_query(query))
     
     def _format_weather_advice_response(self, advice: 'AgricultureAdvice', weather: 'WeatherCondition' = None) -> str:
         """Format weather advice into readable response with real API data."""
-        response_parts = []
-        
-        # Header with real location and time  
+        # Header with real location and time
         current_time = weather.timestamp if weather else datetime.now()
         location_name = weather.location_name if weather else advice.location
-        response_parts.append(f"THỜI TIẾT (lúc {current_time.strftime('%H:%M')})")
-        response_parts.append(f"{location_name}")
-        response_parts.append(f"CN, {current_time.strftime('%d/%m/%Y')}, {current_time.strftime('%H:%M')}")
-        response_parts.append("")
-        
-        # Main temperature display
-        main_temp = weather.temperature if weather else 25.0
+        clock = current_time.strftime('%H:%M')
         main_desc = weather.description if weather else "Trời quang"
-        response_parts.append(f"{main_temp:.1f}°C")
-        response_parts.append(f"{main_desc}")
-        response_parts.append("")
+        main_temp = f"{weather.temperature:.1f}°C" if weather else "25.0°C"
         
-        # Weather details in grid format using REAL API data
-        response_parts.append("CHI TIẾT | NHIỆT ĐỘ | TỐC ĐỘ GIÓ (km/h)")
-        response_parts.append("")
+        response_parts = [
+            f"THỜI TIẾT (lúc {clock})",
+            location_name,
+            f"CN, {current_time.strftime('%d/%m/%Y')}, {clock}",
+            "",
+            main_temp,
+            main_desc,
+            "",
+            _ADVICE_GRID_HEADER,
+            "",
+        ]
         
         if weather:
-            # Row 1: Temperature, Feels like, Humidity
-            response_parts.append(f"Nhiệt độ        | Cảm giác ...     | Độ ẩm")
-            response_parts.append(f"{weather.temperature:.1f}°C            | {weather.feels_like:.1f}°C          | {weather.humidity}%")
-            response_parts.append("")
-            
-            # Row 2: Wind, Rain probability, Pressure  
-            response_parts.append(f"Gió             | Khả năng ...     | Áp suất kh...")
-            response_parts.append(f"{weather.wind_speed:.1f} km/h       | {weather.rain_probability:.0f}%              | {weather.pressure:.0f} hPa")
-            response_parts.append("")
-            
-            # Row 3: Visibility, UV Index, Cloud cover
-            response_parts.append(f"Tầm nhìn        | Chỉ số UV       | Độ che mây")
-            response_parts.append(f"{weather.visibility:.1f} km         | {weather.uv_index:.2f}            | {weather.clouds}%")
-            response_parts.append("")
-            
-            # Row 4: Dew point, Sunrise, Sunset  
+            # Weather details in grid format using REAL API data, formatted once
             sunrise_time = weather.sunrise.strftime('%H:%M') if weather.sunrise else "06:15"
             sunset_time = weather.sunset.strftime('%H:%M') if weather.sunset else "18:30"
-            response_parts.append(f"Điểm sương      | Bình minh       | Hoàng hôn")
-            response_parts.append(f"{weather.dew_point:.1f}°C          | {sunrise_time}           | {sunset_time}")
-            response_parts.append("")
+            rows = (
+                (_ADVICE_GRID_LABELS[0], f"{main_temp}            | {weather.feels_like:.1f}°C          | {weather.humidity}%"),
+                (_ADVICE_GRID_LABELS[1], f"{weather.wind_speed:.1f} km/h       | {weather.rain_probability:.0f}%              | {weather.pressure:.0f} hPa"),
+                (_ADVICE_GRID_LABELS[2], f"{weather.visibility:.1f} km         | {weather.uv_index:.2f}            | {weather.clouds}%"),
+                (_ADVICE_GRID_LABELS[3], f"{weather.dew_point:.1f}°C          | {sunrise_time}           | {sunset_time}"),
+            )
         else:
             # Fallback if no weather data
-            response_parts.append(f"Nhiệt độ        | Cảm giác như    | Độ ẩm")
-            response_parts.append(f"25.0°C            | 27.0°C          | 65%")
-            response_parts.append("")
-        
-        # Weather description
-        response_parts.append(f"Tình trạng: {main_desc}")
-        response_parts.append("")
-        
-        # Agriculture advice section
-        response_parts.append("=== TƯ VẤN NÔNG NGHIỆP ===")
-        response_parts.append(f"Cây trồng: {advice.crop_type}")
-        response_parts.append("")
-        
-        # Recommendations
-        if advice.recommendations:
-            response_parts.append("KHUYẾN NGHỊ:")
-            for i, rec in enumerate(advice.recommendations, 1):
-                response_parts.append(f"{i}. {rec}")
-            response_parts.append("")
-        
-        # Optimal activities
-        if advice.optimal_activities:
-            response_parts.append("NÊN THỰC HIỆN:")
-            for i, activity in enumerate(advice.optimal_activities, 1):
-                response_parts.append(f"{i}. {activity}")
-            response_parts.append("")
-        
-        # Activities to avoid
-        if advice.avoid_activities:
-            response_parts.append("NÊN TRÁNH:")
-            for i, activity in enumerate(advice.avoid_activities, 1):
-                response_parts.append(f"{i}. {activity}")
-            response_parts.append("")
-        
-        # Warnings
-        if advice.warnings:
-            response_parts.append("CẢNH BÁO:")
-            for i, warning in enumerate(advice.warnings, 1):
-                response_parts.append(f"{i}. {warning}")
-            response_parts.append("")
+            rows = (_ADVICE_GRID_FALLBACK,)
+        
+        for labels, values in rows:
+            response_parts.extend((labels, values, ""))
+        
+        response_parts.extend((
+            f"Tình trạng: {main_desc}",
+            "",
+            "=== TƯ VẤN NÔNG NGHIỆP ===",
+            f"Cây trồng: {advice.crop_type}",
+            "",
+        ))
+        
+        # Numbered advice sections
+        for title, field in _ADVICE_SECTIONS:
+            items = getattr(advice, field)
+            if items:
+                response_parts.append(title)
+                response_parts.extend(f"{i}. {item}" for i, item in enumerate(items, 1))
+                response_parts.append("")
         
         # Confidence score
         response_parts.append(f"Độ tin cậy: {advice.confidence:.1%}")
@@ -558,45 +1019,41 @@ class ActionExecutor(LoggerMixin):
             response = ERROR_RESPONSES["low_confidence"]
         
         return {
-            **state,
             "response": response,
             "response_type": "unknown",
             "search_results": None,
             "sources": []
         }
     
-    def _generate_contextual_response(
+    async def _generate_contextual_response(
         self,
         query: str,
         context: str,
-        sources: list
+        sources: list,
+        cache_namespace: Optional[str] = None
     ) -> str:
         """Generate response using LLM with retrieved context."""
-        prompt = f"""
-        Bạn là một chuyên gia nông nghiệp giàu kinh nghiệm, chuyên tư vấn về canh tác cà phê, lúa, hồ tiêu, ngô, khoai tây và các cây trồng khác. Hãy trả lời câu hỏi một cách tự nhiên, thân thiện và chi tiết như đang tư vấn trực tiếp cho nông dân.
-
-        Câu hỏi: "{query}"
-
-        Kiến thức tham khảo:
-        {context}
-
-        Hãy trả lời một cách:
-        • **Tự nhiên**: Như đang nói chuyện với nông dân, không cần nhắc đến "tài liệu" hay "theo thông tin"
-        • **Thực tế**: Đưa ra lời khuyên cụ thể, có thể áp dụng được ngay
-        • **Toàn diện**: Bao gồm nguyên nhân, triệu chứng, cách phòng trừ, thời điểm thích hợp
-        • **Có cấu trúc**: Sử dụng tiêu đề và bullet points để dễ đọc
-        • **Chi tiết**: Viết đầy đủ 400-600 từ với thông tin hữu ích
-
-        Viết như một chuyên gia đang chia sẻ kinh nghiệm thực tế, không phải đang trích dẫn tài liệu.
-        """
+        if cache_namespace:
+            cache_namespace = f"{cache_namespace}|contextual"
+            cached_response, query_vector = await self._response_cache.aget(cache_namespace, query)
+            if cached_response is not None:
+                return cached_response
+        
+        prompt = self._build_contextual_prompt(query, context)
         
         try:
-            response = self.llm.invoke(prompt)
+            async with self._llm_semaphore:
+                response = await self.llm.ainvoke(prompt)
             content = response.content.strip()
             
             # Add sources in a natural way
-            if sources:
-                content += f"\n\n---\n*Thông tin tham khảo từ: {', '.join([s.get('filename', 'tài liệu chuyên ngành').replace('.pdf', '') for s in sources])}"
+            content += self._format_sources_footer(sources)
+            
+            if cache_namespace:
+                self._response_cache.set(
+                    cache_namespace, query, content,
+                    ttl=DOCUMENT_RESPONSE_CACHE_TTL, query_vector=query_vector
+                )
             
             return content
             
@@ -604,35 +1061,135 @@ class ActionExecutor(LoggerMixin):
             self.logger.error("Failed to generate contextual response", error=str(e))
             return self.search_tools.format_response(context, query, sources)
     
-    def _generate_general_response(self, query: str) -> str:
+    def _build_contextual_prompt(self, query: str, context: str) -> str:
+        """Build the prompt for answering with retrieved context."""
+        return _CONTEXTUAL_PROMPT.format(query=query, context=context)
+    
+    def _format_sources_footer(self, sources: list) -> str:
+        """Format the sources note appended to contextual responses."""
+        if not sources:
+            return ""
+        return f"\n\n---\n*Thông tin tham khảo từ: {_join_source_names(sources)}"
+    
+    async def _stream_contextual_response(
+        self,
+        query: str,
+        context: str,
+        sources: list,
+        cache_namespace: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a contextual response chunk by chunk as the LLM generates it."""
+        if cache_namespace:
+            cache_namespace = f"{cache_namespace}|contextual"
+            cached_response, query_vector = await self._response_cache.aget(cache_namespace, query)
+            if cached_response is not None:
+                yield cached_response
+                return
+        
+        chunks = []
+        try:
+            async with self._llm_semaphore:
+                async for chunk in self.llm.astream(self._build_contextual_prompt(query, context)):
+                    text = chunk.content if chunks else chunk.content.lstrip()
+                    if text:
+                        chunks.append(text)
+                        yield text
+        except Exception as e:
+            self.logger.error("Failed to stream contextual response", error=str(e))
+            if not chunks:
+                yield self.search_tools.format_response(context, query, sources)
+            return
+        
+        footer = self._format_sources_footer(sources)
+        if footer:
+            yield footer
+        
+        # Finalize: cache the complete response as the blocking path would
+        if cache_namespace:
+            content = "".join(chunks).strip() + footer
+            self._response_cache.set(
+                cache_namespace, query, content,
+                ttl=DOCUMENT_RESPONSE_CACHE_TTL, query_vector=query_vector
+            )
+    
+    async def _generate_general_response(self, query: str, cache_namespace: Optional[str] = None) -> str:
         """Generate general response for questions without context."""
-        prompt = f"""
-        Người dùng hỏi: "{query}"
-
-        Bạn là một chuyên gia nông nghiệp thân thiện. Hãy trả lời một cách lịch sự rằng bạn chuyên 
-        tư vấn về canh tác các loại cây trồng như cà phê, lúa, hồ tiêu, ngô, khoai tây dựa trên 
-        kiến thức chuyên môn có sẵn.
-
-        Gợi ý họ hỏi những câu hỏi cụ thể hơn về:
-        - Kỹ thuật canh tác
-        - Phòng trừ sâu bệnh  
-        - Chăm sóc cây trồng
-        - Biện pháp tăng năng suất
-
-        Trả lời ngắn gọn, thân thiện và hướng dẫn cụ thể.
-        """
+        if cache_namespace:
+            cache_namespace = f"{cache_namespace}|general"
+            cached_response, query_vector = await self._response_cache.aget(cache_namespace, query)
+            if cached_response is not None:
+                return cached_response
+        
+        prompt = _GENERAL_PROMPT.format(query=query)
         
         try:
-            response = self.llm.invoke(prompt)
-            return response.content.strip()
+            async with self._llm_semaphore:
+                response = await self.llm.ainvoke(prompt)
+            content = response.content.strip()
+            
+            if cache_namespace:
+                self._response_cache.set(
+                    cache_namespace, query, content,
+                    ttl=DOCUMENT_RESPONSE_CACHE_TTL, query_vector=query_vector
+                )
+            
+            return content
         except Exception as e:
             self.logger.error("Failed to generate general response", error=str(e))
             return ERROR_RESPONSES["no_results"]
     
+    async def _get_current_weather(self, location: str) -> Optional[WeatherCondition]:
+        """Get current weather through the TTL cache, coalescing concurrent misses per location."""
+        key = unicodedata.normalize("NFKC", location).casefold().strip()
+        
+        weather = self._weather_cache.get("weather", key)
+        if weather is not None:
+            return weather
+        
+        # Single flight: the entry lives exactly as long as the fetch, whatever its outcome
+        task = self._inflight_weather.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_weather(location, key))
+            self._inflight_weather[key] = task
+            task.add_done_callback(lambda _: self._inflight_weather.pop(key, None))
+        
+        # Shielded so one cancelled caller does not cancel the fetch others await
+        return await asyncio.shield(task)
+    
+    async def _fetch_weather(self, location: str, key: str) -> Optional[WeatherCondition]:
+        """Fetch weather upstream and cache it under key."""
+        weather = await self.weather_advisor.get_current_weather(location)
+        # Demo fallback data is not cached so the API is retried next time
+        if weather and not weather.is_demo:
+            self._weather_cache.set("weather", key, weather, ttl=WEATHER_CACHE_TTL)
+        return weather
+    
+    def _get_cache_namespace(
+        self,
+        state: Dict[str, Any],
+        location: Optional[str] = None,
+        weather: Optional[WeatherCondition] = None
+    ) -> Optional[str]:
+        """Get response cache namespace for state, or None to bypass the cache."""
+        if state.get("confidence", 0.0) < MEDIUM_CONFIDENCE_THRESHOLD:
+            return None
+        
+        namespace = str(state.get("intent"))
+        # Near-identical questions about different crops must not share a semantic hit
+        crops = _match_all_crops(_normalize_query(state.get("user_query", "")))
+        if crops:
+            namespace += "|crop:" + ",".join(crops)
+        if location:
+            namespace += f"|{location.casefold()}"
+        if weather:
+            # Weather-conditioned answers are only reused within the same weather bins
+            namespace += "|" + "|".join(str(value) for value in _bucket_weather(weather).values())
+            namespace += f"|{weather.description}"
+        return namespace
+    
     def _create_error_response(self, state: Dict[str, Any], error: str) -> Dict[str, Any]:
         """Create error response."""
         return {
-            **state,
             "response": ERROR_RESPONSES["processing_error"],
             "response_type": "error",
             "search_results": None,
@@ -641,64 +1198,40 @@ class ActionExecutor(LoggerMixin):
             "action_completed": False
         }
     
-    def _extract_location_from_query(self, query: str) -> str:
+    async def _extract_location_from_query(self, query: str) -> str:
         """Extract location from weather query using smart detection."""
-        try:
-            # First try LLM-based extraction for better accuracy
-            location = self._extract_location_with_llm(query)
-            if location and location != "Unknown":
-                return location
-        except Exception as e:
-            self.logger.warning(f"LLM location extraction failed: {e}")
+        cached_location = self._location_cache.get("location", query)
+        if cached_location is not None:
+            return cached_location
+        
+        # Cheap pattern-based extraction first, LLM only when no pattern matches
+        location = self._extract_location_with_patterns(query, default=None)
+        if not location:
+            try:
+                location = await self._extract_location_with_llm(query)
+            except Exception as e:
+                self.logger.warning(f"LLM location extraction failed: {e}")
         
-        # Fallback to pattern-based extraction
-        return self._extract_location_with_patterns(query)
+        if not location or location == "Unknown":
+            # Not cached, so a transient LLM failure does not stick
+            self.logger.info("No location detected, using default: Ho Chi Minh City")
+            return 'Ho Chi Minh City'
+        
+        self._location_cache.set("location", query, location, ttl=LOCATION_CACHE_TTL)
+        return location
     
-    def _extract_location_with_llm(self, query: str) -> str:
+    async def _extract_location_with_llm(self, query: str) -> Optional[str]:
         """Use LLM to extract location from query with detailed administrative levels."""
-        prompt = f"""
-        Hãy trích xuất địa điểm chính xác nhất từ câu hỏi sau.
-        Ưu tiên trích xuất đến cấp xã/phường/thị trấn nếu có, sau đó đến huyện/quận, rồi tỉnh/thành phố.
-        Trả về tên địa điểm bằng tiếng Anh để sử dụng với API thời tiết.
-
-        Câu hỏi: "{query}"
-
-        Quy tắc trích xuất theo thứ tự ưu tiên:
-        1. **Xã/Phường/Thị trấn**: Nếu có đề cập xã/phường cụ thể
-        2. **Huyện/Quận**: Nếu có đề cập huyện/quận cụ thể  
-        3. **Tỉnh/Thành phố**: Nếu chỉ có tỉnh/thành phố
-        4. **Thành phố lớn**: Ưu tiên thành phố chính của tỉnh
-
-        Ví dụ chi tiết:
-        - "xã Tân Phú, huyện Châu Thành, An Giang" → "Tan Phu, Chau Thanh, An Giang"
-        - "phường 1, quận 1, TP HCM" → "Ward 1, District 1, Ho Chi Minh City"  
-        - "huyện Đắk Pơ, Gia Lai" → "Dak Po, Gia Lai"
-        - "thị trấn Pleiku, Gia Lai" → "Pleiku, Gia Lai"
-        - "Gia Lai" → "Pleiku" (thành phố chính)
-        - "Lâm Đồng" → "Da Lat" (thành phố chính)
-        - "Đắk Lắk" → "Buon Ma Thuot" (thành phố chính)
-        - "Khánh Hòa" → "Nha Trang" (thành phố chính)
-
-        Đặc biệt lưu ý:
-        - Với các tỉnh miền núi/nông thôn: trả về tên huyện hoặc thị trấn chính
-        - Với thành phố lớn: có thể trả về quận/huyện cụ thể
-        - Nếu không rõ địa điểm: trả về "Ho Chi Minh City"
-
-        Format trả về:
-        - Nếu có đầy đủ thông tin: "Tên cụ thể, Huyện/Quận, Tỉnh/Thành"
-        - Nếu chỉ có huyện: "Tên huyện, Tỉnh" 
-        - Nếu chỉ có tỉnh: "Thành phố chính của tỉnh"
-
-        Chỉ trả về tên địa điểm, không giải thích:
-        """
+        prompt = _LOCATION_EXTRACTION_PROMPT.format(query=query)
         
         try:
-            response = self.llm.invoke(prompt)
+            async with self._llm_semaphore:
+                response = await self.llm.ainvoke(prompt)
             location = response.content.strip().strip('"\'')
             
             # Validate the response
             if location and len(location) > 2 and location != "Unknown":
-                self.logger.info(f"LLM extracted detailed location: {location} from query: {query}")
+                self.logger.info("LLM extracted detailed location", location=location, query=query)
                 return location
             
         except Exception as e:
@@ -706,24 +1239,12 @@ class ActionExecutor(LoggerMixin):
         
         return None
     
-    def _extract_location_with_patterns(self, query: str) -> str:
-        """Extract location using regex patterns with detailed administrative levels."""
-        query_lower = query.lower()
-        
-        # Pattern for detailed administrative structure
-        # Look for: xã/phường + huyện/quận + tỉnh/thành phố
-        detailed_patterns = [
-            # Full structure: xã/phường + huyện + tỉnh
-            r'(?:xã|phường|thị trấn)\s+([^,]+),?\s*(?:huyện|quận|thành phố|tp)\s+([^,]+),?\s*(?:tỉnh|thành phố|tp)?\s*([^,\.]+)',
-            # Huyện + tỉnh
-            r'(?:huyện|quận|thành phố|tp)\s+([^,]+),?\s*(?:tỉnh|thành phố|tp)?\s*([^,\.]+)',
-            # Just tỉnh/thành phố
-            r'(?:tỉnh|thành phố|tp)\s+([^,\.]+)',
-        ]
+    def _extract_location_with_patterns(self, query: str, default: Optional[str] = 'Ho Chi Minh City') -> Optional[str]:
+        """Extract location using regex patterns, returning default when nothing matches."""
+        query_lower = _normalize_query(query)
         
-        for pattern in detailed_patterns:
-            import re
-            match = re.search(pattern, query_lower)
+        for pattern in _DETAILED_LOCATION_PATTERNS:
+            match = pattern.search(query_lower)
             if match:
                 groups = match.groups()
                 if len(groups) == 3:  # xã + huyện + tỉnh
@@ -736,209 +1257,59 @@ class ActionExecutor(LoggerMixin):
                     tinh = groups[0]
                     location = self._get_main_city_of_province(tinh.strip().title())
                 
-                self.logger.info(f"Detailed pattern matched: {location} from query: {query}")
+                self.logger.info("Detailed pattern matched", location=location, query=query)
                 return location
         
-        # Extended Vietnamese locations with district/commune level
-        location_mappings = {
-            # Ho Chi Minh City districts
-            'quận 1|district 1': 'District 1, Ho Chi Minh City',
-            'quận 3|district 3': 'District 3, Ho Chi Minh City', 
-            'quận 7|district 7': 'District 7, Ho Chi Minh City',
-            'quận bình thạnh|binh thanh': 'Binh Thanh District, Ho Chi Minh City',
-            'quận thủ đức|thu duc': 'Thu Duc District, Ho Chi Minh City',
-            'quận gò vấp|go vap': 'Go Vap District, Ho Chi Minh City',
-            
-            # Hanoi districts
-            'quận ba đình|ba dinh': 'Ba Dinh District, Hanoi',
-            'quận hoàn kiếm|hoan kiem': 'Hoan Kiem District, Hanoi',
-            'quận đống đa|dong da': 'Dong Da District, Hanoi',
-            'quận cầu giấy|cau giay': 'Cau Giay District, Hanoi',
-            
-            # Gia Lai detailed
-            'huyện đắk pơ|dak po': 'Dak Po, Gia Lai',
-            'huyện chư prông|chu prong': 'Chu Prong, Gia Lai',
-            'huyện ia grai': 'Ia Grai, Gia Lai',
-            'thị xã an khê|an khe': 'An Khe, Gia Lai',
-            'huyện kong chro': 'Kong Chro, Gia Lai',
-            
-            # Đắk Lắk detailed
-            'huyện ea hleo': 'Ea H Leo, Dak Lak',
-            'huyện krông búk|krong buk': 'Krong Buk, Dak Lak',
-            'huyện m đrắk|m drak': 'M Drak, Dak Lak',
-            'thị xã buôn hồ|buon ho': 'Buon Ho, Dak Lak',
-            
-            # Lâm Đồng detailed
-            'huyện đức trọng|duc trong': 'Duc Trong, Lam Dong',
-            'huyện lạc dương|lac duong': 'Lac Duong, Lam Dong',
-            'huyện đơn dương|don duong': 'Don Duong, Lam Dong',
-            'thị xã bảo lộc|bao loc': 'Bao Loc, Lam Dong',
-            
-            # Major provinces with main cities
-            'hồ chí minh|sài gòn|tp hcm|thành phố hồ chí minh': 'Ho Chi Minh City',
-            'hà nội|hanoi|thủ đô': 'Hanoi',
-            'đà nẵng|da nang': 'Da Nang',
-            'cần thơ|can tho': 'Can Tho',
-            'hải phòng|hai phong': 'Hai Phong',
-            
-            # Central Vietnam
-            'đà lạt|da lat|lâm đồng|lam dong': 'Da Lat',
-            'gia lai|pleiku': 'Pleiku',
-            'đắk lắk|dak lak|buôn ma thuột|buon ma thuot': 'Buon Ma Thuot',
-            'khánh hòa|khanh hoa|nha trang': 'Nha Trang',
-            'huế|hue|thừa thiên huế': 'Hue',
-            'quảng nam|quang nam|hội an|hoi an': 'Hoi An',
-            'bình định|binh dinh|quy nhon': 'Quy Nhon',
-            'phú yên|phu yen|tuy hoa': 'Tuy Hoa',
-            
-            # Northern Vietnam  
-            'nghệ an|nghe an|vinh': 'Vinh',
-            'thái nguyên|thai nguyen': 'Thai Nguyen',
-            'lạng sơn|lang son': 'Lang Son',
-            'hạ long|ha long|quảng ninh': 'Ha Long',
-            'sapa|sa pa|lào cai': 'Sapa',
-            'cao bằng|cao bang': 'Cao Bang',
-            'hà giang|ha giang': 'Ha Giang',
-            'điện biên|dien bien': 'Dien Bien Phu',
-            
-            # Southern Vietnam
-            'vũng tàu|vung tau|bà rịa|ba ria': 'Vung Tau',
-            'biên hòa|bien hoa|đồng nai|dong nai': 'Bien Hoa',
-            'bình dương|binh duong|thủ dầu một': 'Thu Dau Mot',
-            'tây ninh|tay ninh': 'Tay Ninh',
-            'phú quốc|phu quoc': 'Phu Quoc',
-            'cà mau|ca mau': 'Ca Mau',
-            
-            # Mekong Delta
-            'an giang|long xuyên|long xuyen': 'Long Xuyen',
-            'sóc trăng|soc trang': 'Soc Trang',
-            'vĩnh long|vinh long': 'Vinh Long',
-            'bến tre|ben tre': 'Ben Tre',
-            'trà vinh|tra vinh': 'Tra Vinh',
-            'hậu giang|hau giang|vị thanh': 'Vi Thanh',
-            'kiên giang|kien giang|rạch giá': 'Rach Gia',
-            
-            # Central Highlands
-            'kon tum': 'Kon Tum',
-            'đắk nông|dak nong': 'Gia Nghia',
-        }
-        
-        # Try to match patterns with priority for more specific locations
-        matched_locations = []
-        for pattern, location in location_mappings.items():
-            if any(keyword in query_lower for keyword in pattern.split('|')):
-                matched_locations.append((location, len(pattern.split('|'))))
+        # Scan all location keywords at once, keeping the most specific match:
+        # longest keyword, then most spellings
+        best_location, best_rank = None, (0, 0)
+        for match in _LOCATION_KEYWORD_PATTERN.finditer(TextUtils.remove_diacritics(query_lower)):
+            keyword = match.group(1)
+            location, spellings, specificity = _LOCATION_KEYWORDS[keyword]
+            rank = (len(keyword), specificity)
+            if rank <= best_rank:
+                continue
+            # Only count what the user typed without diacritics or as a listed spelling,
+            # so e.g. "làm đồng" does not match "lâm đồng"
+            typed = query_lower[match.start():match.start() + len(keyword)]
+            if typed.isascii() or typed in spellings:
+                best_location, best_rank = location, rank
         
-        # Sort by specificity (more keywords = more specific)
-        if matched_locations:
-            # Return the most specific match
-            best_match = sorted(matched_locations, key=lambda x: x[1], reverse=True)[0]
-            location = best_match[0]
-            self.logger.info(f"Specific pattern matched: {location} from query: {query}")
-            return location
+        if best_location:
+            self.logger.info("Specific pattern matched", location=best_location, query=query)
+            return best_location
         
         # Final fallback: look for any administrative indicators
-        admin_indicators = [
-            (r'xã\s+(\w+(?:\s+\w+)?)', 'commune'),
-            (r'phường\s+(\w+(?:\s+\w+)?)', 'ward'),
-            (r'huyện\s+(\w+(?:\s+\w+)?)', 'district'), 
-            (r'quận\s+(\w+(?:\s+\w+)?)', 'district'),
-            (r'thị xã\s+(\w+(?:\s+\w+)?)', 'town'),
-            (r'thành phố\s+(\w+(?:\s+\w+)?)', 'city')
-        ]
-        
-        for pattern, admin_type in admin_indicators:
-            import re
-            match = re.search(pattern, query_lower)
+        for pattern, admin_type in _ADMIN_INDICATOR_PATTERNS:
+            match = pattern.search(query_lower)
             if match:
                 place_name = match.group(1).title()
-                self.logger.info(f"Administrative unit detected: {place_name} ({admin_type})")
+                self.logger.info("Administrative unit detected", place_name=place_name, admin_type=admin_type)
                 return place_name
         
         # Ultimate fallback
-        self.logger.info("No detailed location detected, using default: Ho Chi Minh City")
-        return 'Ho Chi Minh City'
+        self.logger.info("No detailed location detected, using default", default=default)
+        return default
     
     def _get_main_city_of_province(self, province: str) -> str:
         """Get main city/capital of a province."""
-        province_capitals = {
-            'Gia Lai': 'Pleiku',
-            'Lam Dong': 'Da Lat', 
-            'Dak Lak': 'Buon Ma Thuot',
-            'Khanh Hoa': 'Nha Trang',
-            'Binh Dinh': 'Quy Nhon',
-            'Phu Yen': 'Tuy Hoa',
-            'Quang Nam': 'Hoi An',
-            'Nghe An': 'Vinh',
-            'Thai Nguyen': 'Thai Nguyen',
-            'Cao Bang': 'Cao Bang',
-            'Ha Giang': 'Ha Giang',
-            'An Giang': 'Long Xuyen',
-            'Ca Mau': 'Ca Mau',
-            'Soc Trang': 'Soc Trang',
-            'Vinh Long': 'Vinh Long',
-            'Ben Tre': 'Ben Tre',
-            'Kon Tum': 'Kon Tum'
-        }
-        
-        return province_capitals.get(province, province)
+        return _PROVINCE_CAPITALS.get(province, province)
     
     def _format_pure_weather_response(self, weather: WeatherCondition) -> str:
         """Format pure weather response without agriculture advice."""
-        from datetime import datetime
-        
-        current_time = datetime.now().strftime("%H:%M, %A")
-        
-        response = f"""📍 **{weather.location_name}**
-🕐 {current_time}
-{"-" * 40}
-
-🌡️ **Nhiệt độ hiện tại**
-     {weather.temperature}°C
-     Cảm giác như {weather.feels_like}°C
-     {weather.description}
-
-💧 **Độ ẩm**: {weather.humidity}%
-💨 **Gió**: {weather.wind_speed:.1f} km/h {weather.wind_direction_text}
-🔆 **Áp suất**: {weather.pressure} hPa
-👁️ **Tầm nhìn**: {weather.visibility} km
-☀️ **Chỉ số UV**: {weather.uv_index} ({self.weather_advisor._get_uv_description(weather.uv_index)})
-☁️ **Mây**: {weather.clouds}%
-💧 **Điểm sương**: {weather.dew_point:.1f}°C"""
-
-        if weather.sunrise and weather.sunset:
-            response += f"""
-🌅 **Bình minh**: {weather.sunrise.strftime('%H:%M')}
-🌇 **Hoàng hôn**: {weather.sunset.strftime('%H:%M')}"""
-
-        if weather.rain_probability:
-            response += f"""
-🌧️ **Xác suất mưa**: {weather.rain_probability}%"""
-        
-        return response
+        return self.weather_advisor.format_weather_display(weather)
     
     def _is_weather_followup_question(self, query: str, conversation_history: List[Dict]) -> bool:
         """Check if current query is a follow-up to previous weather question."""
         if not conversation_history:
             return False
         
-        # Check last conversation turn
-        last_turn = conversation_history[-1] if conversation_history else {}
-        last_intent = last_turn.get("intent")
-        
         # Check if last question was about weather
-        if last_intent not in ["weather_query", "weather_agriculture"]:
+        if conversation_history[-1].get("intent") not in _WEATHER_INTENTS:
             return False
         
         # Check if current query is contextual (no explicit location)
-        query_lower = query.lower()
-        followup_indicators = [
-            "với thời tiết này", "trong điều kiện này", "theo thông tin trên",
-            "dựa vào thời tiết", "nên làm gì", "có phù hợp", "thì sao",
-            "làm gì tiếp", "có nên", "tương tự", "như vậy"
-        ]
-        
-        return any(indicator in query_lower for indicator in followup_indicators)
+        return _has_followup_indicator(_normalize_query(query))
     
     def _get_detailed_agriculture_context(self, crop: str, weather: 'WeatherCondition', query: str) -> Dict[str, Any]:
         """Get detailed agriculture context from knowledge base."""
@@ -969,126 +1340,74 @@ class ActionExecutor(LoggerMixin):
             self.logger.error(f"Failed to get detailed agriculture context: {e}")
             return {"context": "", "sources": [], "has_results": False}
     
-    def _generate_comprehensive_weather_agriculture_response(
+    async def _generate_comprehensive_weather_agriculture_response(
         self, 
         weather: 'WeatherCondition',
         advice: 'AgricultureAdvice', 
         detailed_context: Dict[str, Any],
         user_query: str,
-        conversation_history: List[Dict]
+        conversation_history: List[Dict],
+        cache_namespace: Optional[str] = None
     ) -> str:
         """Generate comprehensive response combining weather + detailed knowledge."""
+        # Only the LLM consultation is cached; the weather display is rebuilt from current data
+        comprehensive_response = query_vector = None
+        if cache_namespace:
+            comprehensive_response, query_vector = await self._response_cache.aget(cache_namespace, user_query)
         
-        # Build context from conversation history
-        conversation_context = ""
-        if conversation_history:
-            recent_context = conversation_history[-2:]  # Last 2 turns
-            for turn in recent_context:
-                conversation_context += f"Q: {turn.get('user_query', '')}\nA: {turn.get('response', '')[:200]}...\n\n"
-        
-        # Enhanced prompt for comprehensive response
-        prompt = f"""
-        Bạn là chuyên gia nông nghiệp hàng đầu với 20+ năm kinh nghiệm tư vấn cà phê và cây trồng.
-        Hãy tạo ra lời tư vấn chi tiết, toàn diện dựa trên thông tin thời tiết thực tế và kiến thức chuyên môn.
-
-        THÔNG TIN THỜI TIẾT HIỆN TẠI:
-        📍 Địa điểm: {weather.location_name}
-        🌡️ Nhiệt độ: {weather.temperature}°C (cảm giác {weather.feels_like}°C)
-        💧 Độ ẩm: {weather.humidity}%
-        💨 Gió: {weather.wind_speed:.1f} km/h {weather.wind_direction_text}
-        ☀️ UV: {weather.uv_index} 
-        🔆 Áp suất: {weather.pressure} hPa
-        ☁️ Mây: {weather.clouds}%
-        📝 Tình trạng: {weather.description}
-
-        CÂU HỎI HIỆN TẠI: "{user_query}"
-
-        NGỮ CẢNH HỘI THOẠI TRƯỚC:
-        {conversation_context}
-
-        KIẾN THỨC CHUYÊN MÔN THAM KHẢO:
-        {detailed_context.get('context', 'Không có thông tin bổ sung')}
-
-        NHIỆM VỤ:
-        1. Phân tích chi tiết tác động của thời tiết lên {advice.crop_type}
-        2. Đưa ra khuyến nghị cụ thể, có thể thực hiện ngay
-        3. Giải thích lý do khoa học đằng sau mỗi khuyến nghị
-        4. Bao gồm lưu ý về thời điểm, cách thức thực hiện
-        5. Cảnh báo rủi ro và cách phòng tránh
-
-        YÊU CẦU TRÌNH BÀY:
-        • **Tự nhiên**: Như đang tư vấn trực tiếp cho nông dân
-        • **Chi tiết**: 500-800 từ với thông tin hữu ích
-        • **Có cấu trúc**: Sử dụng heading và bullet points rõ ràng
-        • **Thực tế**: Khuyến nghị có thể áp dụng ngay với điều kiện hiện tại
-        • **Khoa học**: Giải thích cơ sở khoa học khi cần thiết
-
-        FORMAT RESPONSE:
-        
-        ## 🌤️ PHÂN TÍCH THỜI TIẾT & TÁC ĐỘNG
-
-        ## 💡 KHUYẾN NGHỊ CHI TIẾT
-
-        ## ⚠️ LƯU Ý QUAN TRỌNG
-
-        ## 📅 KẾ HOẠCH THỰC HIỆN
-
-        Hãy viết như một chuyên gia đang chia sẻ kinh nghiệm thực tế, không phải trích dẫn tài liệu.
-        """
-        
-        try:
-            response = self.llm.invoke(prompt)
-            comprehensive_response = response.content.strip()
-            
-            # Add weather display header
-            weather_header = self.weather_advisor.format_detailed_weather_response(weather, advice)
-            
-            # Combine weather display + comprehensive advice
-            final_response = f"{weather_header}\n\n{'='*60}\n🧑‍🌾 **TƯ VẤN CHUYÊN SÂU TỪ CHUYÊN GIA**\n{'='*60}\n\n{comprehensive_response}"
+        if comprehensive_response is None:
+            # Build context from the last 2 conversation turns
+            conversation_context = "".join(
+                f"Q: {turn.get('user_query', '')}\nA: {turn.get('response', '')[:200]}...\n\n"
+                for turn in (conversation_history or [])[-2:]
+            )
             
-            # Add sources if available
-            if detailed_context.get("sources"):
-                source_names = [s.get('filename', 'tài liệu chuyên ngành').replace('.pdf', '') for s in detailed_context["sources"][:3]]
-                final_response += f"\n\n---\n*📚 Tham khảo từ: {', '.join(source_names)}*"
+            # Enhanced prompt for comprehensive response, with the same weather bins as the cache key
+            fields = _bucket_weather(weather)
+            fields.update(
+                location_name=weather.location_name,
+                wind_direction_text=weather.wind_direction_text,
+                description=weather.description,
+                user_query=user_query,
+                conversation_context=conversation_context,
+                context=detailed_context.get('context', 'Không có thông tin bổ sung'),
+                crop_type=advice.crop_type
+            )
+            prompt = _WEATHER_AGRICULTURE_PROMPT.format_map(fields)
             
-            return final_response
+            try:
+                async with self._llm_semaphore:
+                    response = await self.llm.ainvoke(prompt)
+                comprehensive_response = response.content.strip()
+            except Exception as e:
+                self.logger.error(f"Failed to generate comprehensive response: {e}")
+                # Fallback to basic weather response
+                return self.weather_advisor.format_detailed_weather_response(weather, advice)
             
-        except Exception as e:
-            self.logger.error(f"Failed to generate comprehensive response: {e}")
-            # Fallback to basic weather response
-            return self.weather_advisor.format_detailed_weather_response(weather, advice)
+            if cache_namespace:
+                self._response_cache.set(
+                    cache_namespace, user_query, comprehensive_response,
+                    ttl=WEATHER_RESPONSE_CACHE_TTL, query_vector=query_vector
+                )
+        
+        # Add weather display header
+        weather_header = self.weather_advisor.format_detailed_weather_response(weather, advice)
+        
+        # Combine weather display + comprehensive advice
+        final_response = f"{weather_header}\n\n{_EXPERT_ADVICE_BANNER}\n\n{comprehensive_response}"
+        
+        # Add sources if available
+        if detailed_context.get("sources"):
+            final_response += f"\n\n---\n*📚 Tham khảo từ: {_join_source_names(detailed_context['sources'][:3])}*"
+        
+        return final_response
     
     def _extract_crop_from_query(self, query: str) -> str:
         """Extract crop type from user query."""
-        query_lower = query.lower()
-        
-        # Common Vietnamese crop names
-        crop_patterns = {
-            'cà phê': ['cà phê', 'cafe', 'coffee'],
-            'lúa': ['lúa', 'lúa gạo', 'gạo', 'rice'],
-            'tiêu': ['tiêu', 'hạt tiêu', 'pepper'],
-            'cao su': ['cao su', 'rubber'],
-            'điều': ['điều', 'hạt điều', 'cashew'],
-            'dừa': ['dừa', 'coconut'],
-            'chuối': ['chuối', 'banana'],
-            'xoài': ['xoài', 'mango'],
-            'bưởi': ['bưởi', 'pomelo'],
-            'cam': ['cam', 'orange'],
-            'chanh': ['chanh', 'lemon'],
-            'khoai lang': ['khoai lang', 'sweet potato'],
-            'khoai tây': ['khoai tây', 'potato'],
-            'ngô': ['ngô', 'bắp', 'corn', 'maize'],
-            'đậu': ['đậu', 'bean'],
-            'rau': ['rau', 'vegetable'],
-            'hoa': ['hoa', 'flower']
-        }
-        
-        # Check for crop mentions in query
-        for crop, patterns in crop_patterns.items():
-            for pattern in patterns:
-                if pattern in query_lower:
-                    self.logger.info(f"Detected crop: {crop}")
-                    return crop
+        crop = _match_crop(_normalize_query(query))
+        if crop:
+            self.logger.info("Detected crop", crop=crop)
+            return crop
         
         # Default to coffee if no specific crop mentioned
         self.logger.info("No specific crop detected, defaulting to 'cà phê'")
@@ -1096,5 +1415,4 @@ class ActionExecutor(LoggerMixin):
     
     def _get_timestamp(self) -> str:
         """Get current timestamp."""
-        from datetime import datetime
         return datetime.utcnow().isoformat()
\ No newline at end of file
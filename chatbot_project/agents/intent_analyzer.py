@@ -1,15 +1,194 @@
 """Intent Analysis Agent for understanding user queries."""
 
+import asyncio
+import json
 import re
-from typing import Dict, Any, List
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set, Tuple
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from config import (
-    get_logger, LoggerMixin, IntentType, 
-    HIGH_CONFIDENCE_THRESHOLD, MEDIUM_CONFIDENCE_THRESHOLD, settings
+    get_logger, LoggerMixin, IntentType, INTENT_BY_VALUE,
+    HIGH_CONFIDENCE_THRESHOLD, MEDIUM_CONFIDENCE_THRESHOLD, settings,
+    INTENT_CACHE_MAX_ENTRIES, INTENT_CACHE_TTL,
+    INTENT_BATCH_WINDOW, INTENT_BATCH_MAX_SIZE
 )
 from tools import SearchTools
+from utils import ResponseCache
+
+
+# The intent patterns stay on the stdlib re engine: they rely on Unicode-aware \b
+# around Vietnamese words (e.g. "\bđất\b"), and RE2's \b is ASCII-only.
+def _compile_any(patterns: tuple) -> re.Pattern:
+    """Compile intent patterns into one alternation that matches if any of them does."""
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+
+
+def _compile_counting(patterns: tuple) -> re.Pattern:
+    """
+    Compile intent patterns into one zero-width scan with a named group per pattern.
+    
+    The distinct ``lastgroup`` names seen by ``finditer`` are the patterns that
+    matched; the alternatives of one category never start on the same word.
+    """
+    alternatives = "|".join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(patterns))
+    return re.compile(f"(?=(?:{alternatives}))", re.IGNORECASE)
+
+
+def _compile_keywords(keywords: tuple) -> re.Pattern:
+    """Compile plain keywords into one alternation that finds any of them as a substring."""
+    return re.compile("|".join(map(re.escape, sorted(keywords, key=len, reverse=True))))
+
+
+def _count_matched(pattern: re.Pattern, text: str, limit: Optional[int] = None) -> int:
+    """Count the distinct patterns of a counting scan that match text, stopping at limit."""
+    matched = set()
+    for match in pattern.finditer(text):
+        matched.add(match.lastgroup)
+        if len(matched) == limit:
+            break
+    return len(matched)
+
+
+# Alternations shared by several intent patterns
+_WEATHER_WORDS = "thời tiết|weather|dự báo"
+_SKY_WORDS = "mưa|nắng|gió"
+_NOW_WORDS = "hôm nay|hiện tại|bây giờ"
+_HOW_WORDS = "ra sao|như thế nào|thế nào"
+_CROPS = "cà phê|lúa|khoai|hồ tiêu"
+
+# Pure Weather Query patterns - Chỉ hỏi thời tiết đơn thuần
+_PURE_WEATHER_PATTERN = _compile_any((
+    rf'^({_WEATHER_WORDS})\b.*\b(ngày|{_NOW_WORDS})\b',
+    r'\b(thời tiết|weather)\b.*\b(ở|tại|trong)\b.*\b(thành phố|tỉnh|khu vực)\b',
+    rf'^(hôm nay|ngày hôm nay)\b.*\b(thời tiết|weather|trời)\b.*\b({_HOW_WORDS})\b',
+    rf'^(trời|thời tiết)\b.*\b({_HOW_WORDS})\b',
+    rf'\b(nhiệt độ|độ ẩm|{_SKY_WORDS})\b.*\b({_NOW_WORDS})\b',
+    r'^(có mưa|có nắng|có gió)\b',
+    r'\b(dự báo thời tiết|weather forecast)\b',
+))
+
+# Weather + Agriculture patterns - Tư vấn nông nghiệp dựa trên thời tiết
+_WEATHER_AGRICULTURE_PATTERN = _compile_any((
+    rf'\b({_WEATHER_WORDS})\b.*\b(trồng|{_CROPS}|nông nghiệp)\b',
+    rf'\b(trồng|{_CROPS})\b.*\b({_WEATHER_WORDS}|{_SKY_WORDS})\b',
+    r'\b(nên trồng|có nên)\b.*\b(thời tiết|mưa|nắng)\b',
+    r'\b(thời tiết.*có.*phù hợp|phù hợp.*thời tiết)\b',
+    r'\b(dự báo.*tác động|ảnh hưởng.*thời tiết)\b',
+    r'\b(nhiệt độ|độ ẩm|lượng mưa)\b.*\b(cà phê|lúa|trồng trọt)\b',
+    rf'\b({_SKY_WORDS})\b.*\b(có nên|nên)\b.*\b(trồng|phun thuốc|bón phân|thu hoạch)\b',
+))
+
+# Agricultural consultation patterns - Tư vấn nông nghiệp
+_AGRICULTURE_PATTERN = _compile_counting((
+    r'\b(cà phê|cafe|coffee)\b',
+    r'\b(trồng|gieo|trồng trọt|canh tác)\b',
+    r'\b(sâu bệnh|côn trùng|bệnh|sâu|mọt)\b',
+    r'\b(phân bón|thuốc|thuốc trừ sâu|dinh dưỡng)\b',
+    r'\b(nông nghiệp|nông dân|làm ruộng)\b',
+    r'\b(cây trồng|lúa|ngô|khoai)\b',
+    r'\b(tưới|tưới nước|chăm sóc)\b',
+    r'\b(thu hoạch|mùa màng|năng suất)\b',
+    r'\b(đất|đất trồng|thổ nhưỡng)\b',
+))
+
+# Search document patterns - General
+_SEARCH_PATTERN = _compile_counting((
+    r'\b(tìm|search|tra cứu|tìm kiếm|cho tôi biết|hỏi về)\b',
+    r'\b(thông tin|tài liệu|document|file|pdf)\b',
+    r'\b(là gì|như thế nào|tại sao|khi nào|ở đâu|làm sao)\b',
+    r'\?$',  # Ends with question mark
+))
+
+_AGRICULTURE_TERMS = ('trồng', 'cà phê', 'lúa', 'khoai', 'hồ tiêu', 'nông nghiệp', 'cây trồng', 'thu hoạch', 'gieo', 'phun thuốc', 'bón phân')
+# Enhanced domain-specific keywords for agriculture
+_DOMAIN_TERMS = (
+    'cà phê', 'nông nghiệp', 'trồng trọt', 'sản xuất', 'quy trình',
+    'sâu bệnh', 'côn trùng', 'phân bón', 'thuốc', 'tưới', 'chăm sóc',
+    'thu hoạch', 'năng suất', 'đất', 'khí hậu', 'cây trồng'
+)
+_WEATHER_TERMS = ('thời tiết', 'weather', 'dự báo', 'nhiệt độ', 'độ ẩm', 'mưa', 'nắng', 'gió', 'trời')
+
+_AGRICULTURE_KEYWORDS = _compile_keywords(_AGRICULTURE_TERMS)
+_QUESTION_WORDS = _compile_keywords(('gì', 'sao', 'như thế nào', 'tại sao', 'khi nào', 'ở đâu', 'ai', 'làm sao', 'bao nhiêu', 'ra sao'))
+_DOMAIN_KEYWORDS = _compile_keywords(_DOMAIN_TERMS)
+
+# Unmatched queries only go to the LLM if they touch the agriculture or weather domain at all
+_BROAD_DOMAIN_KEYWORDS = _compile_keywords(_AGRICULTURE_TERMS + _DOMAIN_TERMS + _WEATHER_TERMS)
+_MIN_LLM_QUERY_LENGTH = 8
+_MAX_PATTERN_QUERY_LENGTH = 512
+
+# Intent categories and priorities, shared by the single and batched prompts
+_INTENT_GUIDE = """
+        Các loại ý định có thể:
+        1. "search_document" - Tìm kiếm thông tin về nông nghiệp, cà phê, sâu bệnh, phương pháp trồng trọt, chăm sóc cây trồng
+        2. "general_question" - Câu hỏi chung về nông nghiệp không cần tìm tài liệu cụ thể
+        3. "weather_agriculture" - Tư vấn nông nghiệp dựa trên thời tiết, điều kiện khí hậu cho cây trồng
+        4. "unknown" - Không liên quan đến nông nghiệp hoặc không rõ ý định
+
+        Ưu tiên phân loại "search_document" cho các câu hỏi về:
+        - Cà phê và quy trình sản xuất
+        - Sâu bệnh và cách phòng trị
+        - Phân bón và dinh dưỡng cây trồng
+        - Kỹ thuật trồng trọt
+        - Chăm sóc và thu hoạch
+"""
+
+# LLM intent classification prompt, filled with .format(query=...)
+_INTENT_PROMPT = """
+        Bạn là một trợ lý AI chuyên về nông nghiệp và tư vấn sâu bệnh. 
+        Hãy phân tích ý định của người dùng từ câu hỏi sau và trả lời theo format JSON:
+
+        Câu hỏi: "{query}"
+""" + _INTENT_GUIDE + """
+        Trả về JSON với format:
+        {{
+            "intent": "<intent_type>",
+            "confidence": <float từ 0.0 đến 1.0>,
+            "reasoning": "<lý do phân tích>"
+        }}
+        """
+
+# Batched variant, filled with .format(questions=...) holding numbered, JSON-quoted questions
+_INTENT_BATCH_PROMPT = """
+        Bạn là một trợ lý AI chuyên về nông nghiệp và tư vấn sâu bệnh. 
+        Hãy phân tích ý định của người dùng cho từng câu hỏi được đánh số sau và trả lời theo format JSON:
+
+{questions}
+""" + _INTENT_GUIDE + """
+        Trả về một mảng JSON, mỗi phần tử ứng với một câu hỏi và ghi rõ số thứ tự của câu hỏi đó:
+        [
+            {{
+                "index": <số thứ tự câu hỏi>,
+                "intent": "<intent_type>",
+                "confidence": <float từ 0.0 đến 1.0>,
+                "reasoning": "<lý do phân tích>"
+            }}
+        ]
+        """
+
+# Confidence level by threshold: below medium, below high, at or above high
+_CONFIDENCE_THRESHOLDS = (MEDIUM_CONFIDENCE_THRESHOLD, HIGH_CONFIDENCE_THRESHOLD)
+_CONFIDENCE_LEVELS = ("low", "medium", "high")
+
+# Outermost JSON object / array in an LLM reply, which Gemini often wraps in ```json fences or prose
+_JSON_OBJECT_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+_JSON_ARRAY_PATTERN = re.compile(r"\[.*\]", re.DOTALL)
+
+
+def _parse_intent_answer(answer: Any) -> Optional[Tuple[str, float, str]]:
+    """Validate one parsed LLM answer into (intent value, confidence, reasoning), or None."""
+    if not isinstance(answer, dict) or not all(key in answer for key in ['intent', 'confidence', 'reasoning']):
+        return None
+    if answer['intent'] not in INTENT_BY_VALUE:
+        return None
+    try:
+        confidence = float(answer['confidence'])
+    except (TypeError, ValueError):
+        return None
+    return answer['intent'], confidence, answer['reasoning']
 
 
 class IntentAnalyzer(LoggerMixin):
@@ -25,7 +204,15 @@ class IntentAnalyzer(LoggerMixin):
         )
         self.search_tools = SearchTools()
         
-    def analyze_intent(self, user_query: str) -> Dict[str, Any]:
+        # Parsed LLM intents keyed by normalized query, so recurring low-confidence queries skip the LLM
+        self._llm_intent_cache = ResponseCache(max_entries=INTENT_CACHE_MAX_ENTRIES)
+        
+        # LLM classifications requested within INTENT_BATCH_WINDOW share one prompt
+        self._pending_llm_queries: List[Tuple[str, asyncio.Future]] = []
+        self._llm_batch_timer: Optional[asyncio.TimerHandle] = None
+        self._llm_batch_tasks: Set[asyncio.Task] = set()
+        
+    async def analyze_intent(self, user_query: str) -> Dict[str, Any]:
         """
         Analyze user intent from query.
         
@@ -53,9 +240,13 @@ class IntentAnalyzer(LoggerMixin):
             
             # If confidence is low, use LLM for better analysis
             if intent_result["confidence"] < MEDIUM_CONFIDENCE_THRESHOLD:
-                llm_result = self._analyze_with_llm(user_query)
-                if llm_result["confidence"] > intent_result["confidence"]:
-                    intent_result = llm_result
+                llm_skipped_reason = self._llm_skip_reason(user_query, intent_result)
+                if llm_skipped_reason:
+                    self.logger.info("Skipping LLM intent analysis", llm_skipped_reason=llm_skipped_reason)
+                else:
+                    llm_result = await self._analyze_with_llm(user_query)
+                    if llm_result["confidence"] > intent_result["confidence"]:
+                        intent_result = llm_result
             
             # Add extracted keywords
             intent_result["keywords"] = self.search_tools.extract_keywords(user_query)
@@ -80,70 +271,39 @@ class IntentAnalyzer(LoggerMixin):
     
     def _extract_intent_patterns(self, query: str) -> Dict[str, Any]:
         """Extract intent using pattern matching."""
-        query_lower = query.lower().strip()
+        # Bound the scan on pathological inputs; the patterns contain unanchored ".*"
+        query_lower = query.lower().strip()[:_MAX_PATTERN_QUERY_LENGTH]
         
-        # Pure Weather Query patterns - Chỉ hỏi thời tiết đơn thuần
-        pure_weather_patterns = [
-            r'^(thời tiết|weather|dự báo)\b.*\b(hôm nay|ngày|hiện tại|bây giờ)\b',
-            r'\b(thời tiết|weather)\b.*\b(ở|tại|trong)\b.*\b(thành phố|tỉnh|khu vực)\b',
-            r'^(hôm nay|ngày hôm nay)\b.*\b(thời tiết|weather|trời)\b.*\b(ra sao|như thế nào|thế nào)\b',
-            r'^(trời|thời tiết)\b.*\b(ra sao|như thế nào|thế nào)\b',
-            r'\b(nhiệt độ|độ ẩm|mưa|nắng|gió)\b.*\b(hôm nay|hiện tại|bây giờ)\b',
-            r'^(có mưa|có nắng|có gió)\b',
-            r'\b(dự báo thời tiết|weather forecast)\b'
-        ]
-        
-        for pattern in pure_weather_patterns:
-            if re.search(pattern, query_lower, re.IGNORECASE):
-                # Kiểm tra xem có từ khóa nông nghiệp không
-                agriculture_keywords = ['trồng', 'cà phê', 'lúa', 'khoai', 'hồ tiêu', 'nông nghiệp', 'cây trồng', 'thu hoạch', 'gieo', 'phun thuốc', 'bón phân']
-                has_agriculture = any(keyword in query_lower for keyword in agriculture_keywords)
-                
-                if not has_agriculture:
-                    return self._create_intent_result(
-                        intent=IntentType.WEATHER_QUERY,
-                        confidence=0.9,
-                        query=query,
-                        reasoning="Detected pure weather query pattern"
-                    )
-        
-        # Weather + Agriculture patterns - Tư vấn nông nghiệp dựa trên thời tiết
-        weather_agriculture_patterns = [
-            r'\b(thời tiết|weather|dự báo)\b.*\b(trồng|cà phê|lúa|khoai|hồ tiêu|nông nghiệp)\b',
-            r'\b(trồng|cà phê|lúa|khoai|hồ tiêu)\b.*\b(thời tiết|weather|dự báo|mưa|nắng|gió)\b',
-            r'\b(nên trồng|có nên)\b.*\b(thời tiết|mưa|nắng)\b',
-            r'\b(thời tiết.*có.*phù hợp|phù hợp.*thời tiết)\b',
-            r'\b(dự báo.*tác động|ảnh hưởng.*thời tiết)\b',
-            r'\b(nhiệt độ|độ ẩm|lượng mưa)\b.*\b(cà phê|lúa|trồng trọt)\b',
-            r'\b(mưa|nắng|gió)\b.*\b(có nên|nên)\b.*\b(trồng|phun thuốc|bón phân|thu hoạch)\b'
-        ]
+        if len(query_lower) < 3 or not any(char.isalpha() for char in query_lower[:32]):
+            return self._create_intent_result(
+                intent=IntentType.UNKNOWN,
+                confidence=0.05,
+                query=query,
+                reasoning="Too short / no alphabetic content"
+            )
         
-        for pattern in weather_agriculture_patterns:
-            if re.search(pattern, query_lower, re.IGNORECASE):
+        if _PURE_WEATHER_PATTERN.search(query_lower):
+            # Kiểm tra xem có từ khóa nông nghiệp không
+            has_agriculture = _AGRICULTURE_KEYWORDS.search(query_lower) is not None
+            
+            if not has_agriculture:
                 return self._create_intent_result(
-                    intent=IntentType.WEATHER_AGRICULTURE,
+                    intent=IntentType.WEATHER_QUERY,
                     confidence=0.9,
                     query=query,
-                    reasoning="Detected weather-agriculture consultation pattern"
+                    reasoning="Detected pure weather query pattern"
                 )
         
-        # Agricultural consultation patterns - Tư vấn nông nghiệp
-        agriculture_patterns = [
-            r'\b(cà phê|cafe|coffee)\b',
-            r'\b(trồng|gieo|trồng trọt|canh tác)\b',
-            r'\b(sâu bệnh|côn trùng|bệnh|sâu|mọt)\b',
-            r'\b(phân bón|thuốc|thuốc trừ sâu|dinh dưỡng)\b',
-            r'\b(nông nghiệp|nông dân|làm ruộng)\b',
-            r'\b(cây trồng|lúa|ngô|khoai)\b',
-            r'\b(tưới|tưới nước|chăm sóc)\b',
-            r'\b(thu hoạch|mùa màng|năng suất)\b',
-            r'\b(đất|đất trồng|thổ nhưỡng)\b'
-        ]
+        if _WEATHER_AGRICULTURE_PATTERN.search(query_lower):
+            return self._create_intent_result(
+                intent=IntentType.WEATHER_AGRICULTURE,
+                confidence=0.9,
+                query=query,
+                reasoning="Detected weather-agriculture consultation pattern"
+            )
         
-        agriculture_score = 0
-        for pattern in agriculture_patterns:
-            if re.search(pattern, query_lower, re.IGNORECASE):
-                agriculture_score += 0.3
+        # Four matches already exceed the 0.95 confidence cap
+        agriculture_score = 0.3 * _count_matched(_AGRICULTURE_PATTERN, query_lower, limit=4)
         
         if agriculture_score >= 0.3:
             return self._create_intent_result(
@@ -153,34 +313,16 @@ class IntentAnalyzer(LoggerMixin):
                 reasoning="Detected agricultural consultation pattern"
             )
         
-        # Search document patterns - General
-        search_patterns = [
-            r'\b(tìm|search|tra cứu|tìm kiếm|cho tôi biết|hỏi về)\b',
-            r'\b(thông tin|tài liệu|document|file|pdf)\b',
-            r'\b(là gì|như thế nào|tại sao|khi nào|ở đâu|làm sao)\b',
-            r'\?$'  # Ends with question mark
-        ]
-        
-        search_score = 0
-        matched_patterns = []
-        
-        for pattern in search_patterns:
-            if re.search(pattern, query_lower, re.IGNORECASE):
-                search_score += 0.3
-                matched_patterns.append(pattern)
+        matched_count = _count_matched(_SEARCH_PATTERN, query_lower)
+        search_score = 0.3 * matched_count
         
+        # Keyword scans only run while they can still raise the capped confidence
         # Check for question words
-        question_words = ['gì', 'sao', 'như thế nào', 'tại sao', 'khi nào', 'ở đâu', 'ai', 'làm sao', 'bao nhiêu', 'ra sao']
-        if any(word in query_lower for word in question_words):
+        if search_score < 0.95 and _QUESTION_WORDS.search(query_lower):
             search_score += 0.5
         
         # Enhanced domain-specific keywords for agriculture
-        domain_keywords = [
-            'cà phê', 'nông nghiệp', 'trồng trọt', 'sản xuất', 'quy trình',
-            'sâu bệnh', 'côn trùng', 'phân bón', 'thuốc', 'tưới', 'chăm sóc',
-            'thu hoạch', 'năng suất', 'đất', 'khí hậu', 'cây trồng'
-        ]
-        if any(keyword in query_lower for keyword in domain_keywords):
+        if search_score < 0.95 and _DOMAIN_KEYWORDS.search(query_lower):
             search_score += 0.4
         
         if search_score >= 0.3:
@@ -188,13 +330,12 @@ class IntentAnalyzer(LoggerMixin):
                 intent=IntentType.SEARCH_DOCUMENT,
                 confidence=min(search_score, 0.95),
                 query=query,
-                reasoning=f"Matched {len(matched_patterns)} search patterns"
+                reasoning=f"Matched {matched_count} search patterns"
             )
         
-        # General question patterns
-        if len(query.strip()) > 10 and ('?' in query or any(
-            word in query_lower for word in ['như thế nào', 'là gì', 'tại sao']
-        )):
+        # General question patterns ("như thế nào", "là gì" and "tại sao" contain
+        # question words, which already returned above, so only "?" is left to check)
+        if len(query.strip()) > 10 and '?' in query:
             return self._create_intent_result(
                 intent=IntentType.GENERAL_QUESTION,
                 confidence=0.6,
@@ -210,66 +351,154 @@ class IntentAnalyzer(LoggerMixin):
             reasoning="No clear patterns detected"
         )
     
-    def _analyze_with_llm(self, query: str) -> Dict[str, Any]:
+    def _llm_skip_reason(self, query: str, pattern_result: Dict[str, Any]) -> Optional[str]:
+        """Return why the LLM fallback is not worth calling for an unmatched query, or None."""
+        if pattern_result["intent"] != IntentType.UNKNOWN:
+            return None
+        
+        query_lower = query.lower().strip()
+        if len(query_lower) < _MIN_LLM_QUERY_LENGTH:
+            return "query_too_short"
+        if not _BROAD_DOMAIN_KEYWORDS.search(query_lower):
+            return "no_domain_keywords"
+        return None
+    
+    async def _analyze_with_llm(self, query: str) -> Dict[str, Any]:
         """Use LLM for advanced intent analysis."""
-        prompt = f"""
-        Bạn là một trợ lý AI chuyên về nông nghiệp và tư vấn sâu bệnh. 
-        Hãy phân tích ý định của người dùng từ câu hỏi sau và trả lời theo format JSON:
-
-        Câu hỏi: "{query}"
-
-        Các loại ý định có thể:
-        1. "search_document" - Tìm kiếm thông tin về nông nghiệp, cà phê, sâu bệnh, phương pháp trồng trọt, chăm sóc cây trồng
-        2. "general_question" - Câu hỏi chung về nông nghiệp không cần tìm tài liệu cụ thể
-        3. "weather_agriculture" - Tư vấn nông nghiệp dựa trên thời tiết, điều kiện khí hậu cho cây trồng
-        4. "unknown" - Không liên quan đến nông nghiệp hoặc không rõ ý định
-
-        Ưu tiên phân loại "search_document" cho các câu hỏi về:
-        - Cà phê và quy trình sản xuất
-        - Sâu bệnh và cách phòng trị
-        - Phân bón và dinh dưỡng cây trồng
-        - Kỹ thuật trồng trọt
-        - Chăm sóc và thu hoạch
-
-        Trả về JSON với format:
-        {{
-            "intent": "<intent_type>",
-            "confidence": <float từ 0.0 đến 1.0>,
-            "reasoning": "<lý do phân tích>"
-        }}
-        """
+        cached = self._llm_intent_cache.get("intent", query)
+        if cached is not None:
+            intent, confidence, reasoning = cached
+            return self._create_intent_result(
+                intent=INTENT_BY_VALUE[intent],
+                confidence=confidence,
+                query=query,
+                reasoning=f"LLM: {reasoning}"
+            )
         
-        try:
-            response = self.llm.invoke(prompt)
-            content = response.content.strip()
-            
-            # Try to extract JSON from response
-            import json
-            if content.startswith('{') and content.endswith('}'):
-                result = json.loads(content)
-                
-                # Validate result
-                if all(key in result for key in ['intent', 'confidence', 'reasoning']):
-                    intent = result['intent']
-                    confidence = float(result['confidence'])
-                    reasoning = result['reasoning']
-                    
-                    # Validate intent type
-                    if intent in [e.value for e in IntentType]:
-                        return self._create_intent_result(
-                            intent=IntentType(intent),
-                            confidence=confidence,
-                            query=query,
-                            reasoning=f"LLM: {reasoning}"
-                        )
-            
-            # If parsing fails, fall back to pattern-based result
-            self.logger.warning("Failed to parse LLM response", response=content)
+        answer = await self._classify_with_llm(query)
+        if answer is None:
+            # If the LLM call or parsing fails, fall back to pattern-based result
             return self._extract_intent_patterns(query)
-            
+        
+        intent, confidence, reasoning = answer
+        # Only parsed LLM answers are cached; fallbacks are retried next time
+        self._llm_intent_cache.set(
+            "intent", query, (intent, confidence, reasoning), ttl=INTENT_CACHE_TTL
+        )
+        return self._create_intent_result(
+            intent=INTENT_BY_VALUE[intent],
+            confidence=confidence,
+            query=query,
+            reasoning=f"LLM: {reasoning}"
+        )
+    
+    async def _classify_with_llm(self, query: str) -> Optional[Tuple[str, float, str]]:
+        """Queue a query for the next batched LLM classification and wait for its answer."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending_llm_queries.append((query, future))
+        
+        if len(self._pending_llm_queries) >= INTENT_BATCH_MAX_SIZE:
+            self._flush_llm_batch()
+        elif self._llm_batch_timer is None:
+            self._llm_batch_timer = loop.call_later(INTENT_BATCH_WINDOW, self._flush_llm_batch)
+        
+        return await future
+    
+    def _flush_llm_batch(self) -> None:
+        """Send all queued queries to the LLM as one batch."""
+        if self._llm_batch_timer is not None:
+            self._llm_batch_timer.cancel()
+            self._llm_batch_timer = None
+        
+        batch, self._pending_llm_queries = self._pending_llm_queries, []
+        if not batch:
+            return
+        
+        task = asyncio.create_task(self._run_llm_batch(batch))
+        self._llm_batch_tasks.add(task)
+        task.add_done_callback(self._llm_batch_tasks.discard)
+    
+    async def _run_llm_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Classify a batch of queries and resolve their futures (None on failure)."""
+        queries = [query for query, _ in batch]
+        try:
+            if len(queries) == 1:
+                answers = [await self._classify_one(queries[0])]
+            else:
+                answers = await self._classify_many(queries)
         except Exception as e:
-            self.logger.error("LLM intent analysis failed", error=str(e))
-            return self._extract_intent_patterns(query)
+            self.logger.error("LLM intent analysis failed", error=str(e), batch_size=len(queries))
+            answers = [None] * len(queries)
+        
+        for (_, future), answer in zip(batch, answers):
+            if not future.done():
+                future.set_result(answer)
+    
+    async def _classify_one(self, query: str) -> Optional[Tuple[str, float, str]]:
+        """Classify a single query with the LLM."""
+        response = await self.llm.ainvoke(_INTENT_PROMPT.format(query=query))
+        content = response.content.strip()
+        
+        # Try to extract JSON from response
+        json_match = _JSON_OBJECT_PATTERN.search(content)
+        answer = None
+        if json_match:
+            try:
+                answer = _parse_intent_answer(json.loads(json_match.group()))
+            except ValueError:
+                answer = None
+        
+        if answer is None:
+            self.logger.warning("Failed to parse LLM response", response=content)
+        return answer
+    
+    async def _classify_many(self, queries: List[str]) -> List[Optional[Tuple[str, float, str]]]:
+        """Classify several queries with one LLM call returning a JSON array."""
+        # JSON-quoted so quotes or newlines in a query cannot break the numbering
+        questions = "\n".join(
+            f"        {number}. {json.dumps(query, ensure_ascii=False)}"
+            for number, query in enumerate(queries, 1)
+        )
+        response = await self.llm.ainvoke(_INTENT_BATCH_PROMPT.format(questions=questions))
+        content = response.content.strip()
+        
+        answers: List[Any] = []
+        json_match = _JSON_ARRAY_PATTERN.search(content)
+        if json_match:
+            try:
+                parsed = json.loads(json_match.group())
+                if isinstance(parsed, list):
+                    answers = parsed
+            except ValueError:
+                pass
+        
+        # Answers are matched on their index, never on position; a query whose
+        # answer is missing, duplicated or malformed falls back to patterns
+        answers_by_index: Dict[int, Any] = {}
+        duplicates: Set[int] = set()
+        for answer in answers:
+            index = answer.get("index") if isinstance(answer, dict) else None
+            if type(index) is not int or not 1 <= index <= len(queries):
+                continue
+            if index in answers_by_index:
+                duplicates.add(index)
+            answers_by_index[index] = answer
+        
+        results = [
+            None if number in duplicates else _parse_intent_answer(answers_by_index.get(number))
+            for number in range(1, len(queries) + 1)
+        ]
+        
+        if len(answers_by_index) != len(queries) or duplicates:
+            self.logger.warning(
+                "Batched LLM response does not match the queries",
+                expected=len(queries),
+                received=len(answers),
+                matched=sum(result is not None for result in results)
+            )
+        
+        return results
     
     def _create_intent_result(
         self,
@@ -292,14 +521,8 @@ class IntentAnalyzer(LoggerMixin):
     
     def _get_confidence_level(self, confidence: float) -> str:
         """Get confidence level as string."""
-        if confidence >= HIGH_CONFIDENCE_THRESHOLD:
-            return "high"
-        elif confidence >= MEDIUM_CONFIDENCE_THRESHOLD:
-            return "medium"
-        else:
-            return "low"
+        return _CONFIDENCE_LEVELS[bisect_right(_CONFIDENCE_THRESHOLDS, confidence)]
     
     def _get_timestamp(self) -> str:
         """Get current timestamp."""
-        from datetime import datetime
         return datetime.utcnow().isoformat()
\ No newline at end of file
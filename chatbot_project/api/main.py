@@ -1,11 +1,14 @@
 """FastAPI main application."""
 
+import asyncio
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from config import configure_logging, get_logger, settings, ensure_directories
-from .routes import router
+from .routes import router, get_chatbot
 
 # Configure logging
 configure_logging()
@@ -22,16 +25,18 @@ app = FastAPI(
     description="A professional chatbot API built with LangGraph, ChromaDB, and FastAPI",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=settings.cors_max_age,
 )
 
 # Include routes
@@ -43,6 +48,9 @@ async def startup_event():
     """Application startup event."""
     logger.info("Starting LangGraph Chatbot API")
     logger.info("API documentation available at http://localhost:8000/docs")
+    
+    # Warm up the chatbot pipeline in the background so startup is not blocked
+    app.state.warmup_task = asyncio.create_task(asyncio.to_thread(get_chatbot))
 
 
 @app.on_event("shutdown")
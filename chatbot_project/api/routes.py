@@ -1,23 +1,69 @@
 """FastAPI routes for the chatbot API."""
 
+import asyncio
+import json
+import threading
+import weakref
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from config import get_logger
+from config import get_logger, settings, CHAT_RESPONSE_CACHE_MAX_ENTRIES, DOCUMENT_RESPONSE_CACHE_TTL
 from graph import ChatbotGraphBuilder
 from ingest import DataIngester
+from utils import ResponseCache
 
 # Initialize logger
 logger = get_logger(__name__)
 
-# Initialize chatbot
-chatbot = ChatbotGraphBuilder()
+# Chatbot pipeline and data ingester are built on first use, so /health and /docs
+# do not pay for model and LLM initialization
+_chatbot: Optional[ChatbotGraphBuilder] = None
+_data_ingester: Optional[DataIngester] = None
+_init_lock = threading.Lock()
 
-# Initialize data ingester
-data_ingester = DataIngester()
+
+def get_chatbot() -> ChatbotGraphBuilder:
+    """Get the shared chatbot pipeline, building it on first use."""
+    global _chatbot
+    if _chatbot is None:
+        with _init_lock:
+            if _chatbot is None:
+                _chatbot = ChatbotGraphBuilder()
+    return _chatbot
+
+
+def get_data_ingester() -> DataIngester:
+    """Get the shared data ingester, building it on first use."""
+    global _data_ingester
+    if _data_ingester is None:
+        with _init_lock:
+            if _data_ingester is None:
+                _data_ingester = DataIngester()
+    return _data_ingester
+
+# /chat answers keyed by message (the route is session-independent). Exact tier only:
+# a semantic hit here would skip intent analysis and could cross intents or locations.
+chat_cache = ResponseCache(max_entries=CHAT_RESPONSE_CACHE_MAX_ENTRIES)
+_CHAT_CACHE_NAMESPACE = "chat"
+
+# Only knowledge-based answers are reused; weather answers go stale and errors are retried
+_CACHEABLE_RESPONSE_TYPES = frozenset({
+    "document_search", "general_with_context", "general_without_context"
+})
+
+# Pipeline runs in flight, keyed by normalized message, shared by concurrent identical requests
+_inflight_queries: Dict[str, asyncio.Task] = {}
+
+# At most max_chat_concurrency runs execute at once; up to as many again wait, the rest are shed
+_chat_slots = asyncio.Semaphore(settings.max_chat_concurrency)
+_MAX_INFLIGHT_QUERIES = 2 * settings.max_chat_concurrency
+
+# Streaming runs admitted and not yet finished (they are not shared, so not in _inflight_queries)
+_active_streams = 0
 
 # Create router
 router = APIRouter()
@@ -36,7 +82,7 @@ class ChatResponse(BaseModel):
     intent: str = Field(..., description="Detected intent")
     confidence: float = Field(..., description="Confidence score")
     response_type: str = Field(..., description="Type of response")
-    sources: List[Dict[str, str]] = Field(default=[], description="Source documents")
+    sources: List[Dict[str, Any]] = Field(default=[], description="Source documents")
     timestamp: str = Field(..., description="Response timestamp")
     session_id: Optional[str] = Field(None, description="Session identifier")
 
@@ -60,6 +106,40 @@ class HealthResponse(BaseModel):
     version: str = Field(..., description="API version")
 
 
+async def _run_query(message: str, session_id: Optional[str]) -> Dict[str, Any]:
+    """Run the chatbot pipeline once a concurrency slot is free."""
+    chatbot = await asyncio.to_thread(get_chatbot)
+    async with _chat_slots:
+        return await chatbot.process_query(user_query=message, session_id=session_id)
+
+
+def _check_admission() -> None:
+    """Shed the request with 503 once the in-flight pipeline runs reach the limit."""
+    if len(_inflight_queries) + _active_streams >= _MAX_INFLIGHT_QUERIES:
+        raise HTTPException(
+            status_code=503,
+            detail="Hệ thống đang quá tải, vui lòng thử lại sau."
+        )
+
+
+def _release_stream() -> None:
+    """Return an admitted streaming run's place under the in-flight limit."""
+    global _active_streams
+    _active_streams -= 1
+
+
+def _process_query_once(message: str, session_id: Optional[str]) -> asyncio.Task:
+    """Return the in-flight pipeline run for a message, starting one if there is none."""
+    key = ResponseCache.normalize(message)
+    task = _inflight_queries.get(key)
+    if task is None:
+        _check_admission()
+        task = asyncio.ensure_future(_run_query(message, session_id))
+        _inflight_queries[key] = task
+        task.add_done_callback(lambda _: _inflight_queries.pop(key, None))
+    return task
+
+
 # API Routes
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest) -> ChatResponse:
@@ -73,13 +153,15 @@ async def chat(request: ChatRequest) -> ChatResponse:
         Chat response with bot reply and metadata
     """
     try:
-        logger.info("Processing chat request", message=request.message[:100])
+        logger.debug("Processing chat request", message=request.message[:100])
         
-        # Process query through chatbot pipeline
-        result = chatbot.process_query(
-            user_query=request.message,
-            session_id=request.session_id
-        )
+        cached = chat_cache.get(_CHAT_CACHE_NAMESPACE, request.message)
+        if cached is not None:
+            return ChatResponse(**cached, session_id=request.session_id)
+        
+        # Process query through chatbot pipeline; shielded so a disconnecting
+        # client does not cancel the run other identical requests are awaiting
+        result = await asyncio.shield(_process_query_once(request.message, request.session_id))
         
         # Create response
         response = ChatResponse(
@@ -92,14 +174,24 @@ async def chat(request: ChatRequest) -> ChatResponse:
             session_id=request.session_id
         )
         
-        logger.info(
+        logger.debug(
             "Chat request processed successfully",
             intent=response.intent,
             confidence=response.confidence
         )
         
+        if response.response_type in _CACHEABLE_RESPONSE_TYPES:
+            chat_cache.set(
+                _CHAT_CACHE_NAMESPACE,
+                request.message,
+                response.model_dump(exclude={"session_id"}),
+                ttl=DOCUMENT_RESPONSE_CACHE_TTL
+            )
+        
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Chat request failed", error=str(e))
         raise HTTPException(
@@ -108,6 +200,88 @@ async def chat(request: ChatRequest) -> ChatResponse:
         )
 
 
+def _sse_event(payload: Any) -> str:
+    """Format one server-sent event data line."""
+    data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+    return f"data: {data}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest) -> StreamingResponse:
+    """
+    Process a chat message and stream the reply as server-sent events.
+    
+    Args:
+        request: Chat request containing user message
+        
+    Returns:
+        Event stream of {"type": "token"} chunks, a final {"type": "result"}
+        event with the response metadata, then "[DONE]"
+    """
+    global _active_streams
+    logger.debug("Processing streaming chat request", message=request.message[:100])
+    
+    cached = chat_cache.get(_CHAT_CACHE_NAMESPACE, request.message)
+    if cached is not None:
+        async def cached_stream():
+            yield _sse_event({"type": "token", "content": cached["response"]})
+            yield _sse_event({"type": "result", **cached, "session_id": request.session_id})
+            yield _sse_event("[DONE]")
+        
+        return StreamingResponse(cached_stream(), media_type="text/event-stream")
+    
+    # Same load shedding as /chat, checked before the stream is opened
+    _check_admission()
+    _active_streams += 1
+    
+    async def event_stream():
+        try:
+            result_event = None
+            try:
+                chatbot = await asyncio.to_thread(get_chatbot)
+                # The slot covers the pipeline run only; the final writes happen after release
+                async with _chat_slots:
+                    async for event in chatbot.stream_query(request.message, request.session_id):
+                        if event["type"] == "result":
+                            result_event = event
+                        else:
+                            yield _sse_event(event)
+            except Exception as e:
+                logger.error("Streaming chat request failed", error=str(e))
+                yield _sse_event({
+                    "type": "error",
+                    "detail": f"Đã xảy ra lỗi khi xử lý tin nhắn: {str(e)}"
+                })
+            
+            if result_event is not None:
+                response = ChatResponse(
+                    response=result_event["response"] or "Xin lỗi, tôi không thể xử lý yêu cầu của bạn.",
+                    intent=result_event["intent"],
+                    confidence=result_event["confidence"],
+                    response_type=result_event["response_type"],
+                    sources=result_event["sources"],
+                    timestamp=result_event["timestamp"] or datetime.utcnow().isoformat(),
+                    session_id=request.session_id
+                )
+                if response.response_type in _CACHEABLE_RESPONSE_TYPES:
+                    chat_cache.set(
+                        _CHAT_CACHE_NAMESPACE,
+                        request.message,
+                        response.model_dump(exclude={"session_id"}),
+                        ttl=DOCUMENT_RESPONSE_CACHE_TTL
+                    )
+                yield _sse_event({"type": "result", **response.model_dump()})
+            
+            yield _sse_event("[DONE]")
+        finally:
+            release()
+    
+    stream = event_stream()
+    # Runs once: when the stream ends, or when it is dropped without ever being started
+    release = weakref.finalize(stream, _release_stream)
+    return StreamingResponse(stream, media_type="text/event-stream")
+
+
 @router.post("/ingest", response_model=IngestionResponse)
 async def ingest_data(
     request: IngestionRequest,
@@ -129,10 +303,12 @@ async def ingest_data(
         # Run ingestion in background
         def run_ingestion():
             try:
-                documents_count = data_ingester.ingest_from_directory(
+                documents_count = get_data_ingester().ingest_from_directory(
                     clear_existing=request.clear_existing
                 )
                 logger.info("Data ingestion completed", documents_count=documents_count)
+                # Cached answers may cite the replaced documents
+                chat_cache.clear()
             except Exception as e:
                 logger.error("Background ingestion failed", error=str(e))
         
@@ -161,6 +337,7 @@ async def get_ingestion_status() -> Dict[str, Any]:
         Ingestion status information
     """
     try:
+        data_ingester = await asyncio.to_thread(get_data_ingester)
         status = data_ingester.get_ingestion_status()
         logger.info("Retrieved ingestion status", status=status)
         return {
@@ -177,6 +354,20 @@ async def get_ingestion_status() -> Dict[str, Any]:
         )
 
 
+@router.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, Any]:
+    """
+    Get /chat response cache statistics.
+    
+    Returns:
+        Cache size and hit/miss counters
+    """
+    return {
+        "chat_cache": chat_cache.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check() -> HealthResponse:
     """
@@ -201,6 +392,7 @@ async def get_graph_visualization() -> Dict[str, str]:
         Graph structure visualization
     """
     try:
+        chatbot = await asyncio.to_thread(get_chatbot)
         visualization = chatbot.get_graph_visualization()
         return {
             "visualization": visualization,
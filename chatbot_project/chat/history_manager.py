@@ -1,24 +1,82 @@
 """Chat history management for persistent conversations."""
 
-import json
+import atexit
+import itertools
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
 from pathlib import Path
 import uuid
+import weakref
 
-from config import get_logger, LoggerMixin
+import orjson
+
+from config import get_logger, LoggerMixin, CHAT_HISTORY_POOL_SIZE, CHAT_HISTORY_FLUSH_INTERVAL
+from utils import now_iso
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize to a JSON string for a TEXT column."""
+    return orjson.dumps(obj).decode("utf-8")
+
+# Message ids: a random per-process prefix plus a counter, unique without a uuid4() per message
+_MESSAGE_ID_PREFIX = uuid.uuid4().hex[:12]
+_MESSAGE_ID_COUNTER = itertools.count(1)
+
+
+def _next_message_id() -> str:
+    """Return a new process-unique message id."""
+    return f"{_MESSAGE_ID_PREFIX}-{next(_MESSAGE_ID_COUNTER)}"
+
+
+# Live managers whose deferred saves are flushed at interpreter exit
+_MANAGERS: "weakref.WeakSet[ChatHistoryManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all_managers() -> None:
+    """Flush deferred saves of every live manager (one hook for all instances)."""
+    for manager in list(_MANAGERS):
+        manager.flush()
+
+
+# Applied once to every pooled connection
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # ~20 MB page cache
+)
 
 
 class ChatMessage:
     """Represents a single chat message."""
     
+    __slots__ = ('id', 'content', 'is_user', 'metadata', '_created_at', '_timestamp')
+    
     def __init__(self, content: str, is_user: bool, metadata: Optional[Dict] = None):
-        self.id = str(uuid.uuid4())
+        self.id = _next_message_id()
         self.content = content
         self.is_user = is_user
-        self.timestamp = datetime.now().isoformat()
         self.metadata = metadata or {}
+        # ISO string is only built when the message is serialized
+        self._created_at = time.time()
+        self._timestamp: Optional[str] = None
+    
+    @property
+    def timestamp(self) -> str:
+        """ISO timestamp of the message, formatted on first access."""
+        if self._timestamp is None:
+            self._timestamp = datetime.fromtimestamp(self._created_at).isoformat()
+        return self._timestamp
+    
+    @timestamp.setter
+    def timestamp(self, value: str) -> None:
+        self._timestamp = value
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert message to dictionary."""
@@ -33,27 +91,53 @@ class ChatMessage:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ChatMessage':
         """Create message from dictionary."""
-        msg = cls(data['content'], data['is_user'], data.get('metadata', {}))
-        msg.id = data['id']
-        msg.timestamp = data['timestamp']
+        return cls.from_fields(
+            data['id'], data['content'], data['is_user'], data['timestamp'], data.get('metadata')
+        )
+    
+    @classmethod
+    def from_fields(
+        cls,
+        message_id: str,
+        content: str,
+        is_user: bool,
+        timestamp: str,
+        metadata: Optional[Dict] = None
+    ) -> 'ChatMessage':
+        """Create message from stored fields without an intermediate dictionary."""
+        # Bypass __init__: id and timestamp come from the stored data
+        msg = object.__new__(cls)
+        msg.id = message_id
+        msg.content = content
+        msg.is_user = is_user
+        msg.metadata = metadata or {}
+        msg._created_at = None
+        msg._timestamp = timestamp
         return msg
 
 
 class ChatSession:
     """Represents a chat session with message history."""
     
+    __slots__ = (
+        'session_id', 'title', 'created_at', 'updated_at', 'messages',
+        'last_weather_data', 'last_location'
+    )
+    
     def __init__(self, session_id: Optional[str] = None, title: Optional[str] = None):
         self.session_id = session_id or str(uuid.uuid4())
         self.title = title or f"Chat {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        self.created_at = datetime.now().isoformat()
-        self.updated_at = datetime.now().isoformat()
+        self.created_at = self.updated_at = now_iso()
         self.messages: List[ChatMessage] = []
+        # In-memory snapshot of the last weather turn, for follow-up questions (not persisted)
+        self.last_weather_data: Optional[Dict[str, Any]] = None
+        self.last_location: Optional[str] = None
     
     def add_message(self, content: str, is_user: bool, metadata: Optional[Dict] = None) -> ChatMessage:
         """Add a message to the session."""
         message = ChatMessage(content, is_user, metadata)
         self.messages.append(message)
-        self.updated_at = datetime.now().isoformat()
+        self.updated_at = now_iso()
         
         # Auto-generate title from first user message
         if is_user and len(self.messages) == 1 and self.title.startswith("Chat "):
@@ -88,26 +172,123 @@ class ChatSession:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ChatSession':
         """Create session from dictionary."""
-        session = cls(data['session_id'], data['title'])
-        session.created_at = data['created_at']
-        session.updated_at = data['updated_at']
-        session.messages = [ChatMessage.from_dict(msg_data) for msg_data in data['messages']]
+        return cls.from_fields(
+            data['session_id'],
+            data['title'],
+            data['created_at'],
+            data['updated_at'],
+            [ChatMessage.from_dict(msg_data) for msg_data in data['messages']]
+        )
+    
+    @classmethod
+    def from_fields(
+        cls,
+        session_id: str,
+        title: str,
+        created_at: str,
+        updated_at: str,
+        messages: List[ChatMessage]
+    ) -> 'ChatSession':
+        """Create session from stored fields without generating defaults."""
+        # Bypass __init__: every field comes from the stored data
+        session = object.__new__(cls)
+        session.session_id = session_id
+        session.title = title
+        session.created_at = created_at
+        session.updated_at = updated_at
+        session.messages = messages
+        session.last_weather_data = None
+        session.last_location = None
         return session
 
 
 class ChatHistoryManager(LoggerMixin):
     """Manages chat history with SQLite persistence."""
     
-    def __init__(self, db_path: str = "chat_history.db"):
-        """Initialize chat history manager."""
+    def __init__(
+        self,
+        db_path: str = "chat_history.db",
+        pool_size: int = CHAT_HISTORY_POOL_SIZE,
+        flush_interval: float = CHAT_HISTORY_FLUSH_INTERVAL
+    ):
+        """
+        Initialize chat history manager.
+        
+        Args:
+            db_path: SQLite database file
+            pool_size: Maximum number of pooled connections
+            flush_interval: Seconds saves are held to be written in one batch (0 writes immediately)
+        """
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Long-lived connections reused across calls, so the page cache stays warm
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._pool_size = pool_size
+        self._pool_created = 0
+        self._pool_lock = threading.Lock()
+        
+        # Write-behind: sessions saved within flush_interval share one transaction
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, ChatSession] = {}
+        self._pending_lock = threading.Lock()
+        # Held for a whole flush, so a read-path flush waits for an in-flight batch
+        self._flush_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        _MANAGERS.add(self)
+        
         self._init_database()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection for the pool."""
+        # Pooled connections move between worker threads, never used by two at once
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    @contextmanager
+    def _acquire(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection; commits on success and rolls back on error."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                can_create = self._pool_created < self._pool_size
+                if can_create:
+                    self._pool_created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._pool_lock:
+                        self._pool_created -= 1
+                    raise
+            else:
+                conn = self._pool.get()
+        
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+    
+    def close(self) -> None:
+        """Flush pending saves and close all idle pooled connections."""
+        self.flush()
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._pool_lock:
+                self._pool_created -= 1
         
     def _init_database(self):
         """Initialize SQLite database."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._acquire() as conn:
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS chat_sessions (
                         session_id TEXT PRIMARY KEY,
@@ -123,6 +304,22 @@ class ChatHistoryManager(LoggerMixin):
                     ON chat_sessions(updated_at DESC)
                 """)
                 
+                # One row per message, so saving a session only appends new turns
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_messages (
+                        session_id TEXT NOT NULL,
+                        seq INTEGER NOT NULL,
+                        message_id TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        is_user INTEGER NOT NULL,
+                        timestamp TEXT NOT NULL,
+                        metadata_json TEXT NOT NULL,
+                        PRIMARY KEY (session_id, seq)
+                    )
+                """)
+                
+                self._migrate_messages_json(conn)
+                
                 conn.commit()
                 
             self.logger.info("Chat history database initialized", db_path=str(self.db_path))
@@ -131,6 +328,56 @@ class ChatHistoryManager(LoggerMixin):
             self.logger.error("Failed to initialize database", error=str(e))
             raise
     
+    def _migrate_messages_json(self, conn: sqlite3.Connection) -> None:
+        """Move messages stored in the legacy messages_json column into chat_messages."""
+        rows = conn.execute("""
+            SELECT session_id, messages_json FROM chat_sessions
+            WHERE messages_json != '[]'
+        """).fetchall()
+        
+        for session_id, messages_json in rows:
+            messages = [ChatMessage.from_dict(msg_data) for msg_data in orjson.loads(messages_json)]
+            self._insert_messages(conn, session_id, 0, messages)
+            conn.execute("""
+                UPDATE chat_sessions SET messages_json = '[]' WHERE session_id = ?
+            """, (session_id,))
+        
+        if rows:
+            self.logger.info("Migrated sessions to chat_messages", count=len(rows))
+    
+    @staticmethod
+    def _insert_messages(
+        conn: sqlite3.Connection,
+        session_id: str,
+        start_seq: int,
+        messages: List[ChatMessage]
+    ) -> None:
+        """Insert messages numbered from start_seq (caller owns the transaction)."""
+        conn.executemany("""
+            INSERT INTO chat_messages
+            (session_id, seq, message_id, content, is_user, timestamp, metadata_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (
+                session_id,
+                seq,
+                msg.id,
+                msg.content,
+                int(msg.is_user),
+                msg.timestamp,
+                _dumps(msg.metadata)
+            )
+            for seq, msg in enumerate(messages, start_seq)
+        ])
+    
+    @staticmethod
+    def _count_messages(conn: sqlite3.Connection, session_id: str) -> int:
+        """Number of messages stored for a session."""
+        # seq is contiguous from 0, so MAX is a single primary key probe where COUNT scans
+        return conn.execute("""
+            SELECT COALESCE(MAX(seq) + 1, 0) FROM chat_messages WHERE session_id = ?
+        """, (session_id,)).fetchone()[0]
+    
     def create_session(self, title: Optional[str] = None) -> ChatSession:
         """Create a new chat session."""
         session = ChatSession(title=title)
@@ -138,51 +385,156 @@ class ChatHistoryManager(LoggerMixin):
         self.logger.info("Created new chat session", session_id=session.session_id)
         return session
     
-    def save_session(self, session: ChatSession) -> None:
-        """Save session to database."""
+    def _upsert_session_header(self, conn: sqlite3.Connection, session: ChatSession) -> None:
+        """Insert or update the session row (messages live in chat_messages)."""
+        conn.execute("""
+            INSERT INTO chat_sessions
+            (session_id, title, created_at, updated_at, messages_json)
+            VALUES (?, ?, ?, ?, '[]')
+            ON CONFLICT(session_id) DO UPDATE SET
+                title = excluded.title,
+                updated_at = excluded.updated_at
+        """, (
+            session.session_id,
+            session.title,
+            session.created_at,
+            session.updated_at
+        ))
+    
+    def _write_sessions(self, conn: sqlite3.Connection, sessions: List[ChatSession]) -> None:
+        """Write session headers and their unsaved messages (caller owns the transaction)."""
+        for session in sessions:
+            self._upsert_session_header(conn, session)
+            
+            stored_count = self._count_messages(conn, session.session_id)
+            self._insert_messages(
+                conn, session.session_id, stored_count, session.messages[stored_count:]
+            )
+    
+    def save_session(self, session: ChatSession, sync: bool = False) -> None:
+        """
+        Save session to database, appending messages not stored yet.
+        
+        Unless sync is set (or flush_interval is 0), the write is deferred and
+        batched with other saves made within flush_interval.
+        """
+        session.updated_at = now_iso()
+        
+        if not sync and self.flush_interval > 0:
+            with self._pending_lock:
+                self._pending[session.session_id] = session
+                self._schedule_flush()
+            return
+        
+        try:
+            with self._acquire() as conn:
+                self._write_sessions(conn, [session])
+                conn.commit()
+                
+            self.logger.info("Session saved", session_id=session.session_id)
+            
+        except Exception as e:
+            self.logger.error("Failed to save session", session_id=session.session_id, error=str(e))
+            raise
+    
+    def _schedule_flush(self) -> None:
+        """Start the flush timer if none is running (caller holds _pending_lock)."""
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def flush(self) -> None:
+        """Write all deferred saves in a single transaction."""
+        with self._flush_lock:
+            with self._pending_lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                sessions = list(self._pending.values())
+                self._pending.clear()
+            
+            if not sessions:
+                return
+            
+            try:
+                with self._acquire() as conn:
+                    self._write_sessions(conn, sessions)
+                    conn.commit()
+                    
+                self.logger.info("Sessions flushed", count=len(sessions))
+                
+            except Exception as e:
+                self.logger.error("Failed to flush sessions", count=len(sessions), error=str(e))
+                # Retry on the next timer unless a newer save already replaced them
+                with self._pending_lock:
+                    for session in sessions:
+                        self._pending.setdefault(session.session_id, session)
+                    self._schedule_flush()
+    
+    def append_message(self, session: ChatSession, message: ChatMessage) -> None:
+        """Append a single message to a stored session."""
+        self.append_messages(session, [message])
+    
+    def append_messages(self, session: ChatSession, messages: List[ChatMessage]) -> None:
+        """Append messages to a stored session in one transaction."""
         try:
-            session.updated_at = datetime.now().isoformat()
+            session.updated_at = now_iso()
             
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO chat_sessions 
-                    (session_id, title, created_at, updated_at, messages_json)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
+            with self._acquire() as conn:
+                self._upsert_session_header(conn, session)
+                self._insert_messages(
+                    conn,
                     session.session_id,
-                    session.title,
-                    session.created_at,
-                    session.updated_at,
-                    json.dumps([msg.to_dict() for msg in session.messages])
-                ))
+                    self._count_messages(conn, session.session_id),
+                    messages
+                )
                 
                 conn.commit()
                 
-            self.logger.info("Session saved", session_id=session.session_id)
+            self.logger.info("Messages appended", session_id=session.session_id, count=len(messages))
             
         except Exception as e:
-            self.logger.error("Failed to save session", session_id=session.session_id, error=str(e))
+            self.logger.error("Failed to append messages", session_id=session.session_id, error=str(e))
             raise
     
     def load_session(self, session_id: str) -> Optional[ChatSession]:
         """Load session from database."""
+        self.flush()
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._acquire() as conn:
                 cursor = conn.execute("""
-                    SELECT session_id, title, created_at, updated_at, messages_json
+                    SELECT session_id, title, created_at, updated_at
                     FROM chat_sessions WHERE session_id = ?
                 """, (session_id,))
                 
                 row = cursor.fetchone()
                 
                 if row:
-                    session_id, title, created_at, updated_at, messages_json = row
-                    messages_data = json.loads(messages_json)
+                    session_id, title, created_at, updated_at = row
+                    message_rows = conn.execute("""
+                        SELECT message_id, content, is_user, timestamp, metadata_json
+                        FROM chat_messages WHERE session_id = ?
+                        ORDER BY seq
+                    """, (session_id,)).fetchall()
                     
-                    session = ChatSession(session_id, title)
-                    session.created_at = created_at
-                    session.updated_at = updated_at
-                    session.messages = [ChatMessage.from_dict(msg_data) for msg_data in messages_data]
+                    # Decode every message's metadata with one parse of a JSON array
+                    metadatas = orjson.loads(
+                        "[" + ",".join(message_row[4] for message_row in message_rows) + "]"
+                    )
+                    
+                    session = ChatSession.from_fields(
+                        session_id,
+                        title,
+                        created_at,
+                        updated_at,
+                        [
+                            ChatMessage.from_fields(message_id, content, bool(is_user), timestamp, metadata)
+                            for (message_id, content, is_user, timestamp, _), metadata
+                            in zip(message_rows, metadatas)
+                        ]
+                    )
                     
                     self.logger.info("Session loaded", session_id=session_id)
                     return session
@@ -193,10 +545,48 @@ class ChatHistoryManager(LoggerMixin):
             self.logger.error("Failed to load session", session_id=session_id, error=str(e))
             return None
     
+    def get_context(self, session_id: str, max_messages: int = 10) -> List[Dict[str, str]]:
+        """
+        Get a session's most recent messages as LLM context.
+        
+        Same output as ChatSession.get_context, but only the tail is read
+        from the database instead of materializing the whole session.
+        """
+        self.flush()
+        
+        try:
+            with self._acquire() as conn:
+                if max_messages > 0:
+                    cursor = conn.execute("""
+                        SELECT content, is_user FROM chat_messages
+                        WHERE session_id = ?
+                        ORDER BY seq DESC
+                        LIMIT ?
+                    """, (session_id, max_messages))
+                    rows = cursor.fetchall()[::-1]
+                else:
+                    cursor = conn.execute("""
+                        SELECT content, is_user FROM chat_messages
+                        WHERE session_id = ?
+                        ORDER BY seq
+                    """, (session_id,))
+                    rows = cursor.fetchall()
+                
+                return [
+                    {"role": "user" if is_user else "assistant", "content": content}
+                    for content, is_user in rows
+                ]
+                
+        except Exception as e:
+            self.logger.error("Failed to get session context", session_id=session_id, error=str(e))
+            return []
+    
     def list_sessions(self, limit: int = 50) -> List[Dict[str, str]]:
         """List recent chat sessions."""
+        self.flush()
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._acquire() as conn:
                 cursor = conn.execute("""
                     SELECT session_id, title, created_at, updated_at
                     FROM chat_sessions 
@@ -223,8 +613,15 @@ class ChatHistoryManager(LoggerMixin):
     
     def delete_session(self, session_id: str) -> bool:
         """Delete a chat session."""
+        # Wait for an in-flight flush so it cannot write the session back afterwards
+        with self._flush_lock, self._pending_lock:
+            self._pending.pop(session_id, None)
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._acquire() as conn:
+                conn.execute("""
+                    DELETE FROM chat_messages WHERE session_id = ?
+                """, (session_id,))
                 cursor = conn.execute("""
                     DELETE FROM chat_sessions WHERE session_id = ?
                 """, (session_id,))
@@ -244,15 +641,23 @@ class ChatHistoryManager(LoggerMixin):
     
     def clear_old_sessions(self, days: int = 30) -> int:
         """Clear sessions older than specified days."""
+        self.flush()
+        
         try:
-            cutoff_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            cutoff_date = cutoff_date.replace(day=cutoff_date.day - days)
-            cutoff_str = cutoff_date.isoformat()
+            # Local midnight `days` ago as 'YYYY-MM-DD'; ISO updated_at values sort after
+            # it from that day on, so the comparison matches a midnight cutoff
+            day_offset = f"-{days} days"
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._acquire() as conn:
+                conn.execute("""
+                    DELETE FROM chat_messages WHERE session_id IN (
+                        SELECT session_id FROM chat_sessions
+                        WHERE updated_at < date('now', 'localtime', ?)
+                    )
+                """, (day_offset,))
                 cursor = conn.execute("""
-                    DELETE FROM chat_sessions WHERE updated_at < ?
-                """, (cutoff_str,))
+                    DELETE FROM chat_sessions WHERE updated_at < date('now', 'localtime', ?)
+                """, (day_offset,))
                 
                 conn.commit()
                 deleted_count = cursor.rowcount
@@ -266,19 +671,17 @@ class ChatHistoryManager(LoggerMixin):
     
     def get_stats(self) -> Dict[str, Any]:
         """Get database statistics."""
+        self.flush()
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("SELECT COUNT(*) FROM chat_sessions")
-                total_sessions = cursor.fetchone()[0]
-                
+            with self._acquire() as conn:
+                # Both counts in one round-trip, computed inside SQLite
                 cursor = conn.execute("""
-                    SELECT session_id, messages_json FROM chat_sessions
+                    SELECT
+                        (SELECT COUNT(*) FROM chat_sessions),
+                        (SELECT COUNT(*) FROM chat_messages)
                 """)
-                
-                total_messages = 0
-                for _, messages_json in cursor.fetchall():
-                    messages = json.loads(messages_json)
-                    total_messages += len(messages)
+                total_sessions, total_messages = cursor.fetchone()
                 
                 return {
                     'total_sessions': total_sessions,
@@ -16,6 +16,7 @@ __all__ = [
     "ACTION_EXECUTOR_AGENT", 
     "INTENT_ANALYSIS_NODE",
     "ACTION_EXECUTION_NODE",
+    "TURN_NODE",
     "END_NODE",
     "IntentType",
     "HIGH_CONFIDENCE_THRESHOLD",
@@ -1,7 +1,8 @@
 """Application constants."""
 
 from enum import Enum
-from typing import Final
+from types import MappingProxyType
+from typing import Final, Mapping
 
 # Agent types
 INTENT_ANALYZER_AGENT: Final[str] = "intent_analyzer"
@@ -10,6 +11,7 @@ ACTION_EXECUTOR_AGENT: Final[str] = "action_executor"
 # Node names in the graph
 INTENT_ANALYSIS_NODE: Final[str] = "intent_analysis"
 ACTION_EXECUTION_NODE: Final[str] = "action_execution"
+TURN_NODE: Final[str] = "turn"  # Intent analysis and action execution fused into one graph step
 END_NODE: Final[str] = "end"
 
 # State keys
@@ -29,6 +31,11 @@ class IntentType(str, Enum):
     WEATHER_AGRICULTURE = "weather_agriculture"
     UNKNOWN = "unknown"
 
+# Intent types by their string value, a dict lookup instead of IntentType(value)
+INTENT_BY_VALUE: Final[Mapping[str, IntentType]] = MappingProxyType(
+    {intent.value: intent for intent in IntentType}
+)
+
 # Confidence thresholds
 HIGH_CONFIDENCE_THRESHOLD: Final[float] = 0.8
 MEDIUM_CONFIDENCE_THRESHOLD: Final[float] = 0.5
@@ -39,9 +46,44 @@ DEFAULT_SEARCH_LIMIT: Final[int] = 5
 MAX_SEARCH_LIMIT: Final[int] = 20
 SIMILARITY_THRESHOLD: Final[float] = 0.7
 
+# Conversation history kept in state (older entries are dropped): session history arrives
+# as one role/content message per entry, the previous-state path adds one entry per turn
+CONVERSATION_HISTORY_MAX_TURNS: Final[int] = 5
+CONVERSATION_HISTORY_MAX_MESSAGES: Final[int] = 2 * CONVERSATION_HISTORY_MAX_TURNS
+
+# Response cache parameters
+RESPONSE_CACHE_MAX_ENTRIES: Final[int] = 1024
+RESPONSE_CACHE_SIMILARITY_THRESHOLD: Final[float] = 0.92
+DOCUMENT_RESPONSE_CACHE_TTL: Final[int] = 3600  # seconds
+WEATHER_RESPONSE_CACHE_TTL: Final[int] = 600  # seconds
+CHAT_RESPONSE_CACHE_MAX_ENTRIES: Final[int] = 10000
+
+# Weather data cache parameters
+WEATHER_CACHE_MAX_ENTRIES: Final[int] = 512
+WEATHER_CACHE_TTL: Final[int] = 1800  # seconds
+
+# LLM intent analysis cache parameters
+INTENT_CACHE_MAX_ENTRIES: Final[int] = 4096
+INTENT_CACHE_TTL: Final[int] = 3600  # seconds
+INTENT_BATCH_WINDOW: Final[float] = 0.02  # seconds concurrent LLM classifications are coalesced
+INTENT_BATCH_MAX_SIZE: Final[int] = 16
+
+# Location extraction cache parameters
+LOCATION_CACHE_MAX_ENTRIES: Final[int] = 1024
+LOCATION_CACHE_TTL: Final[int] = 3600  # seconds
+
+# Knowledge base search cache parameters
+KNOWLEDGE_BASE_CACHE_MAX_ENTRIES: Final[int] = 256
+KNOWLEDGE_BASE_CACHE_TTL: Final[int] = 1800  # seconds
+
+# Chat history database connection pool
+CHAT_HISTORY_POOL_SIZE: Final[int] = 4
+CHAT_HISTORY_FLUSH_INTERVAL: Final[float] = 0.2  # seconds saves are batched before writing
+
 # File processing
-SUPPORTED_FILE_EXTENSIONS: Final[tuple] = (".pdf", ".txt", ".md")
+SUPPORTED_FILE_EXTENSIONS: Final[frozenset] = frozenset({".pdf", ".txt", ".md"})
 MAX_FILE_SIZE_MB: Final[int] = 10
+INGEST_BATCH_SIZE: Final[int] = 1024  # Documents handed to the vector store per add
 
 # HTTP status codes
 HTTP_OK: Final[int] = 200
@@ -49,9 +91,9 @@ HTTP_BAD_REQUEST: Final[int] = 400
 HTTP_INTERNAL_SERVER_ERROR: Final[int] = 500
 
 # Response templates
-ERROR_RESPONSES: Final[dict] = {
+ERROR_RESPONSES: Final[Mapping[str, str]] = MappingProxyType({
     "no_results": "Xin lỗi, tôi không tìm thấy thông tin liên quan đến câu hỏi của bạn.",
     "low_confidence": "Tôi không chắc chắn về câu trả lời. Bạn có thể hỏi cụ thể hơn không?",
     "processing_error": "Đã xảy ra lỗi khi xử lý yêu cầu của bạn. Vui lòng thử lại.",
     "unknown_intent": "Tôi không hiểu câu hỏi của bạn. Bạn có thể diễn đạt lại không?"
-}
\ No newline at end of file
+})
@@ -12,8 +12,29 @@ from rich.logging import RichHandler
 from .settings import settings
 
 
+# Built once at import; every log call runs this chain
+_PROCESSORS = [
+    structlog.stdlib.filter_by_level,
+    structlog.stdlib.add_logger_name,
+    structlog.stdlib.add_log_level,
+    structlog.stdlib.PositionalArgumentsFormatter(),
+    structlog.processors.TimeStamper(fmt="iso"),
+    # No stack_info=True call sites, so StackInfoRenderer is left out;
+    # format_exc_info stays for logger.exception()
+    structlog.processors.format_exc_info,
+    structlog.processors.JSONRenderer() if settings.log_format == "json"
+    else structlog.dev.ConsoleRenderer(),
+]
+
+_configured = False
+
+
 def configure_logging() -> None:
-    """Configure application logging."""
+    """Configure application logging (only the first call has an effect)."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
     
     # Create logs directory
     log_dir = Path("logs")
@@ -31,17 +52,7 @@ def configure_logging() -> None:
     
     # Configure structlog
     structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.JSONRenderer() if settings.log_format == "json" 
-            else structlog.dev.ConsoleRenderer(),
-        ],
+        processors=_PROCESSORS,
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
         wrapper_class=structlog.stdlib.BoundLogger,
@@ -57,10 +68,12 @@ def get_logger(name: str) -> structlog.BoundLogger:
 class LoggerMixin:
     """Mixin class to add logging capabilities to other classes."""
     
-    @property
-    def logger(self) -> structlog.BoundLogger:
-        """Get logger for this class."""
-        return get_logger(self.__class__.__name__)
+    logger: structlog.BoundLogger
+    
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Attach one logger per class, named after it, instead of resolving it per access."""
+        super().__init_subclass__(**kwargs)
+        cls.logger = get_logger(cls.__name__)
 
 
 # Module-level logger
@@ -2,7 +2,7 @@
 
 import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from dotenv import load_dotenv
 from pydantic import Field
@@ -26,6 +26,8 @@ class Settings(BaseSettings):
     gemini_model: str = Field(default="gemini-1.5-flash", env="GEMINI_MODEL")  # Use flash for lower quota
     max_output_tokens: int = Field(default=8192, env="MAX_OUTPUT_TOKENS")  # Increased for longer responses
     temperature: float = Field(default=0.1, env="TEMPERATURE")  # Low temperature for factual responses
+    max_llm_concurrency: int = Field(default=8, env="MAX_LLM_CONCURRENCY")  # Concurrent Gemini calls per worker
+    max_chat_concurrency: int = Field(default=8, env="MAX_CHAT_CONCURRENCY")  # Concurrent /chat pipeline runs per worker
     
     # Database configuration
     chroma_db_path: str = Field(default="./vectordb", env="CHROMA_DB_PATH")
@@ -36,10 +38,13 @@ class Settings(BaseSettings):
     chunk_size: int = Field(default=600, env="CHUNK_SIZE")  # Further increased for more comprehensive content
     chunk_overlap: int = Field(default=150, env="CHUNK_OVERLAP")  # Reduced overlap
     max_file_size_mb: int = Field(default=50, env="MAX_FILE_SIZE_MB")  # Increased limit
+    ingest_workers: int = Field(default=0, env="INGEST_WORKERS")  # PDF parsing processes, 0 = one per CPU
     
     # API configuration
     api_host: str = Field(default="127.0.0.1", env="API_HOST")
     api_port: int = Field(default=8000, env="API_PORT")
+    cors_origins: List[str] = Field(default=["*"], env="CORS_ORIGINS")  # JSON list, e.g. ["https://app.example.com"]
+    cors_max_age: int = Field(default=86400, env="CORS_MAX_AGE")  # Seconds browsers may cache preflight responses
     
     # Streamlit configuration
     streamlit_port: int = Field(default=8501, env="STREAMLIT_PORT")
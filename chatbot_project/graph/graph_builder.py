@@ -1,17 +1,22 @@
 """LangGraph pipeline builder for the chatbot with conversation support."""
 
-from typing import Dict, Any, Literal, Optional, List
+import re
+from typing import Dict, Any, AsyncIterator, Optional, List
 
 from langgraph.graph import StateGraph, END
-from langgraph.graph.message import add_messages
 
 from config import (
-    get_logger, LoggerMixin, 
-    INTENT_ANALYSIS_NODE, ACTION_EXECUTION_NODE, END_NODE
+    LoggerMixin,
+    INTENT_ANALYSIS_NODE, ACTION_EXECUTION_NODE, TURN_NODE,
+    INTENT_CACHE_MAX_ENTRIES, INTENT_CACHE_TTL, CONVERSATION_HISTORY_MAX_MESSAGES
 )
 from agents import IntentAnalyzer, ActionExecutor
 from .state_manager import StateManager, ChatbotState
 from chat.history_manager import ChatHistoryManager, ChatSession
+from utils import ResponseCache
+
+# Errors that end the turn instead of running the action
+_CRITICAL_ERROR_PATTERN = re.compile(r"validation|critical", re.IGNORECASE)
 
 
 class ChatbotGraphBuilder(LoggerMixin):
@@ -23,9 +28,15 @@ class ChatbotGraphBuilder(LoggerMixin):
         self.action_executor = ActionExecutor()
         self.state_manager = StateManager()
         self.history_manager = ChatHistoryManager()
-        self._graph = None
         self.current_session: Optional[ChatSession] = None
         
+        # Intent node outputs keyed by normalized query; repeated queries skip the node's work
+        self._intent_node_cache = ResponseCache(max_entries=INTENT_CACHE_MAX_ENTRIES)
+        
+        # Compile once up front, so the startup warmup pays for it rather than the first query
+        self._graph = None
+        self.build_graph()
+        
     def build_graph(self) -> StateGraph:
         """
         Build the LangGraph pipeline.
@@ -38,24 +49,15 @@ class ChatbotGraphBuilder(LoggerMixin):
         # Create state graph
         workflow = StateGraph(ChatbotState)
         
-        # Add nodes
-        workflow.add_node(INTENT_ANALYSIS_NODE, self._intent_analysis_node)
-        workflow.add_node(ACTION_EXECUTION_NODE, self._action_execution_node)
+        # Intent analysis, routing and action execution run as one node, so a
+        # turn is a single superstep instead of two plus a conditional edge
+        workflow.add_node(TURN_NODE, self._turn_node)
         
         # Set entry point
-        workflow.set_entry_point(INTENT_ANALYSIS_NODE)
+        workflow.set_entry_point(TURN_NODE)
         
         # Add edges
-        workflow.add_conditional_edges(
-            INTENT_ANALYSIS_NODE,
-            self._route_after_intent_analysis,
-            {
-                ACTION_EXECUTION_NODE: ACTION_EXECUTION_NODE,
-                END: END
-            }
-        )
-        
-        workflow.add_edge(ACTION_EXECUTION_NODE, END)
+        workflow.add_edge(TURN_NODE, END)
         
         # Compile graph
         self._graph = workflow.compile()
@@ -63,7 +65,7 @@ class ChatbotGraphBuilder(LoggerMixin):
         self.logger.info("Chatbot graph built successfully")
         return self._graph
     
-    def _intent_analysis_node(self, state: ChatbotState) -> Dict[str, Any]:
+    async def _intent_analysis_node(self, state: ChatbotState) -> Dict[str, Any]:
         """
         Intent analysis node function.
         
@@ -71,27 +73,40 @@ class ChatbotGraphBuilder(LoggerMixin):
             state: Current state
             
         Returns:
-            Updated state with intent analysis results
+            State updates with intent analysis results
         """
         self.logger.info("Executing intent analysis node")
         
         try:
             user_query = state["user_query"]
             
-            # Perform intent analysis
-            analysis_result = self.intent_analyzer.analyze_intent(user_query)
-            
-            # Update state
-            updates = {
-                "intent": analysis_result["intent"].value,
-                "confidence": analysis_result["confidence"],
-                "keywords": analysis_result.get("keywords", []),
-                "reasoning": analysis_result.get("reasoning", "")
-            }
-            
-            # Add any errors from analysis
-            if analysis_result.get("errors"):
-                updates["errors"] = state.get("errors", []) + analysis_result["errors"]
+            cached_updates = self._intent_node_cache.get("intent_node", user_query)
+            if cached_updates is not None:
+                updates = {**cached_updates, "keywords": list(cached_updates["keywords"])}
+            else:
+                # Start retrieval speculatively so it overlaps the intent LLM call
+                self.action_executor.prefetch_document_search(user_query)
+                
+                # Perform intent analysis
+                analysis_result = await self.intent_analyzer.analyze_intent(user_query)
+                
+                # Update state
+                updates = {
+                    "intent": analysis_result["intent"].value,
+                    "confidence": analysis_result["confidence"],
+                    "keywords": analysis_result.get("keywords", []),
+                    "reasoning": analysis_result.get("reasoning", "")
+                }
+                
+                # Add any errors from analysis; failed analyses are not cached
+                if analysis_result.get("errors"):
+                    updates["errors"] = analysis_result["errors"]
+                else:
+                    self._intent_node_cache.set(
+                        "intent_node", user_query,
+                        {**updates, "keywords": tuple(updates["keywords"])},
+                        ttl=INTENT_CACHE_TTL
+                    )
             
             updated_state = self.state_manager.update_state(
                 state, updates, INTENT_ANALYSIS_NODE
@@ -99,8 +114,9 @@ class ChatbotGraphBuilder(LoggerMixin):
             
             self.logger.info(
                 "Intent analysis completed",
-                intent=analysis_result["intent"].value,
-                confidence=analysis_result["confidence"]
+                intent=updates["intent"],
+                confidence=updates["confidence"],
+                cached=cached_updates is not None
             )
             
             return updated_state
@@ -112,7 +128,7 @@ class ChatbotGraphBuilder(LoggerMixin):
             error_updates = {
                 "intent": "unknown",
                 "confidence": 0.0,
-                "errors": state.get("errors", []) + [f"Intent analysis error: {str(e)}"]
+                "errors": [f"Intent analysis error: {str(e)}"]
             }
             
             return self.state_manager.update_state(
@@ -127,7 +143,7 @@ class ChatbotGraphBuilder(LoggerMixin):
             state: Current state
             
         Returns:
-            Updated state with action execution results
+            State updates with action execution results
         """
         self.logger.info("Executing action execution node")
         
@@ -156,13 +172,31 @@ class ChatbotGraphBuilder(LoggerMixin):
                 "response": "Đã xảy ra lỗi khi xử lý yêu cầu của bạn. Vui lòng thử lại.",
                 "response_type": "error",
                 "action_completed": False,
-                "errors": state.get("errors", []) + [f"Action execution error: {str(e)}"]
+                "errors": [f"Action execution error: {str(e)}"]
             }
             
             return self.state_manager.update_state(
                 state, error_updates, ACTION_EXECUTION_NODE
             )
     
+    async def _turn_node(self, state: ChatbotState) -> Dict[str, Any]:
+        """
+        Fused node running intent analysis and, when routed, action execution.
+        
+        Args:
+            state: Current state
+            
+        Returns:
+            Combined state updates of the steps that ran
+        """
+        updates = await self._intent_analysis_node(state)
+        state = self.state_manager.merge_updates(state, updates)
+        
+        if self._route_after_intent_analysis(state) == END:
+            return updates
+        
+        return self.state_manager.merge_updates(updates, await self._action_execution_node(state))
+    
     def _route_after_intent_analysis(
         self, state: ChatbotState
     ) -> str:
@@ -179,13 +213,9 @@ class ChatbotGraphBuilder(LoggerMixin):
         intent = state.get("intent")
         confidence = state.get("confidence", 0.0)
         
-        # If there are critical errors, end the conversation
-        critical_errors = [
-            error for error in errors 
-            if "validation" in error.lower() or "critical" in error.lower()
-        ]
-        
-        if critical_errors:
+        # If there are critical errors, end the conversation (the list is only built for the log)
+        if any(map(_CRITICAL_ERROR_PATTERN.search, errors)):
+            critical_errors = [error for error in errors if _CRITICAL_ERROR_PATTERN.search(error)]
             self.logger.warning("Critical errors detected, ending conversation", errors=critical_errors)
             return END
         
@@ -202,7 +232,9 @@ class ChatbotGraphBuilder(LoggerMixin):
         self, 
         user_query: str, 
         session_id: str = None,
-        conversation_context: Optional[List[Dict[str, str]]] = None
+        conversation_context: Optional[List[Dict[str, str]]] = None,
+        last_weather_data: Optional[Dict[str, Any]] = None,
+        last_location: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Process a user query through the complete pipeline.
@@ -211,6 +243,8 @@ class ChatbotGraphBuilder(LoggerMixin):
             user_query: User's input query
             session_id: Optional session ID for context
             conversation_context: Optional conversation history
+            last_weather_data: Weather snapshot from the session's last weather turn
+            last_location: Location of the session's last weather turn
             
         Returns:
             Processing result
@@ -221,27 +255,14 @@ class ChatbotGraphBuilder(LoggerMixin):
             self.build_graph()
         
         try:
-            # Extract previous state from conversation context if available
+            # Previous state from the conversation context and the session's weather snapshot
             previous_state = None
-            if conversation_context:
-                # Parse conversation context to extract previous state
+            if conversation_context or last_weather_data:
                 previous_state = {
-                    "conversation_history": conversation_context,
-                    "last_weather_data": None,  # Will be extracted from history
-                    "last_location": None  # Will be extracted from history
+                    "conversation_history": conversation_context or [],
+                    "last_weather_data": last_weather_data,
+                    "last_location": last_location
                 }
-                
-                # Extract last weather data and location from conversation history
-                for msg in reversed(conversation_context):
-                    if msg.get("intent") in ["weather_query", "weather_agriculture"]:
-                        # Extract location and weather data from previous weather responses
-                        response = msg.get("response", "")
-                        if "°C" in response:  # Basic check for weather data
-                            previous_state["last_weather_data"] = {
-                                "timestamp": msg.get("timestamp", 0),
-                                "location": "detected_location"  # Could be improved
-                            }
-                        break
             
             # Create initial state
             initial_state = self.state_manager.create_initial_state(
@@ -274,6 +295,69 @@ class ChatbotGraphBuilder(LoggerMixin):
                 "timestamp": self.state_manager._get_timestamp()
             }
     
+    async def stream_query(
+        self,
+        user_query: str,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a user query and yield the response as it is generated.
+        
+        Runs the same nodes and routing as the graph, but asks the action executor
+        for a token stream where the intent supports it.
+        
+        Args:
+            user_query: User's input query
+            session_id: Optional session ID for context
+            
+        Yields:
+            {"type": "token", "content": str} events, then one {"type": "result", ...}
+            event with the final response metadata
+        """
+        self.logger.info("Streaming user query", query=user_query[:100])
+        
+        state = self.state_manager.create_initial_state(
+            user_query=user_query,
+            session_id=session_id
+        )
+        state = self.state_manager.merge_updates(state, await self._intent_analysis_node(state))
+        
+        if self._route_after_intent_analysis(state) == ACTION_EXECUTION_NODE:
+            try:
+                result = await self.action_executor.execute_action(state, stream=True)
+                response_stream = result.pop("response_stream", None)
+                if response_stream is not None:
+                    chunks = []
+                    async for chunk in response_stream:
+                        chunks.append(chunk)
+                        yield {"type": "token", "content": chunk}
+                    result["response"] = "".join(chunks)
+                elif result.get("response"):
+                    yield {"type": "token", "content": result["response"]}
+            except Exception as e:
+                self.logger.error("Streaming action execution failed", error=str(e))
+                result = {
+                    "response": "Đã xảy ra lỗi khi xử lý yêu cầu của bạn. Vui lòng thử lại.",
+                    "response_type": "error",
+                    "action_completed": False,
+                    "errors": [f"Action execution error: {str(e)}"]
+                }
+                yield {"type": "token", "content": result["response"]}
+            
+            state = self.state_manager.merge_updates(
+                state, self.state_manager.update_state(state, result, ACTION_EXECUTION_NODE)
+            )
+        
+        yield {
+            "type": "result",
+            "response": state.get("response", ""),
+            "intent": state.get("intent") or "unknown",
+            "confidence": state.get("confidence", 0.0),
+            "response_type": state.get("response_type") or "unknown",
+            "sources": state.get("sources", []),
+            "timestamp": state.get("timestamp")
+        }
+    
     def start_new_session(self, title: Optional[str] = None) -> str:
         """
         Start a new chat session.
@@ -329,12 +413,22 @@ class ChatbotGraphBuilder(LoggerMixin):
         # Add user message to history
         user_message = self.current_session.add_message(user_query, is_user=True)
         
-        # Get conversation context for intent analysis
-        conversation_context = self.current_session.get_context(max_messages=10)
+        # Get conversation context, as many messages as the state keeps
+        conversation_context = self.current_session.get_context(max_messages=CONVERSATION_HISTORY_MAX_MESSAGES)
         
         # Process with context
         try:
-            result = await self.process_query(user_query, conversation_context=conversation_context)
+            result = await self.process_query(
+                user_query,
+                conversation_context=conversation_context,
+                last_weather_data=self.current_session.last_weather_data,
+                last_location=self.current_session.last_location
+            )
+            
+            # Remember the latest weather so follow-up questions can reuse it
+            if result.get("last_weather_data"):
+                self.current_session.last_weather_data = result["last_weather_data"]
+                self.current_session.last_location = result.get("last_location")
             
             # Add bot response to history
             bot_message = self.current_session.add_message(
@@ -405,15 +499,12 @@ class ChatbotGraphBuilder(LoggerMixin):
         
         START
           ↓
-        {INTENT_ANALYSIS_NODE}
-          ↓
-        Route Decision
-          ↓
-        {ACTION_EXECUTION_NODE}
+        {TURN_NODE}
+          ({INTENT_ANALYSIS_NODE} → Route Decision → {ACTION_EXECUTION_NODE})
           ↓
         END
         
-        Nodes:
+        Steps:
         - {INTENT_ANALYSIS_NODE}: Analyzes user intent and extracts information
         - {ACTION_EXECUTION_NODE}: Executes appropriate action based on intent
         
@@ -1,8 +1,21 @@
 """State management for the LangGraph chatbot pipeline."""
 
-from typing import Dict, Any, List, Optional, TypedDict
+import operator
+from collections import ChainMap
+from typing import Annotated, Dict, Any, List, Optional, TypedDict
 
-from config import get_logger, LoggerMixin
+from config import (
+    get_logger, LoggerMixin, IntentType,
+    CONVERSATION_HISTORY_MAX_TURNS, CONVERSATION_HISTORY_MAX_MESSAGES
+)
+from utils import utc_now_iso
+
+# Checked on every state update
+_REQUIRED_FIELDS = ("user_query", "timestamp")
+_VALID_INTENTS = frozenset(intent.value for intent in IntentType)
+
+# State keys whose updates are appended rather than replaced (see ChatbotState)
+_APPEND_KEYS = ("execution_path", "errors")
 
 
 class ChatbotState(TypedDict):
@@ -34,11 +47,47 @@ class ChatbotState(TypedDict):
     
     # Metadata
     timestamp: str
-    execution_path: List[str]
-    errors: List[str]
+    # Append channels: nodes return only new entries and LangGraph concatenates them
+    execution_path: Annotated[List[str], operator.add]
+    errors: Annotated[List[str], operator.add]
     action_completed: bool
 
 
+# Default values for a new turn's state, copied by create_initial_state
+_EMPTY_STATE_TEMPLATE: Dict[str, Any] = {
+    # Input
+    "user_query": "",
+    "session_id": None,
+    
+    # Conversation History & Context
+    "conversation_history": None,
+    "previous_context": "",
+    "last_weather_data": None,
+    "last_location": None,
+    
+    # Intent analysis results
+    "intent": None,
+    "confidence": 0.0,
+    "keywords": None,
+    "reasoning": "",
+    
+    # Search results
+    "search_results": None,
+    "context_used": "",
+    "sources": None,
+    
+    # Response
+    "response": "",
+    "response_type": "",
+    
+    # Metadata
+    "timestamp": "",
+    "execution_path": None,
+    "errors": None,
+    "action_completed": False
+}
+
+
 class StateManager(LoggerMixin):
     """Manages state transitions and validation for the chatbot pipeline."""
     
@@ -72,55 +121,38 @@ class StateManager(LoggerMixin):
         last_location = None
         
         if previous_state:
-            conversation_history = previous_state.get("conversation_history", [])
+            # Session history is one entry per message, so it is windowed in messages
+            history = previous_state.get("conversation_history", [])[-CONVERSATION_HISTORY_MAX_MESSAGES:]
             previous_context = previous_state.get("context_used", "")
             last_weather_data = previous_state.get("last_weather_data")
             last_location = previous_state.get("last_location")
             
             # Add previous turn to history
             if previous_state.get("user_query") and previous_state.get("response"):
-                conversation_history.append({
+                history.append({
                     "user_query": previous_state["user_query"],
                     "response": previous_state["response"],
                     "intent": previous_state.get("intent"),
                     "timestamp": previous_state.get("timestamp")
                 })
-                
-                # Keep only last 5 turns to avoid context overload
-                conversation_history = conversation_history[-5:]
-        
-        state = ChatbotState(
-            # Input
-            user_query=user_query.strip(),
-            session_id=session_id,
+                # Turn entries: keep only the last CONVERSATION_HISTORY_MAX_TURNS
+                history = history[-CONVERSATION_HISTORY_MAX_TURNS:]
             
-            # Conversation History & Context
-            conversation_history=conversation_history,
-            previous_context=previous_context,
-            last_weather_data=last_weather_data,
-            last_location=last_location,
-            
-            # Intent analysis results
-            intent=None,
-            confidence=0.0,
-            keywords=[],
-            reasoning="",
-            
-            # Search results
-            search_results=None,
-            context_used="",
-            sources=[],
-            
-            # Response
-            response="",
-            response_type="",
-            
-            # Metadata
-            timestamp=self._get_timestamp(),
-            execution_path=[],
-            errors=[],
-            action_completed=False
-        )
+            conversation_history = history
+        
+        state = _EMPTY_STATE_TEMPLATE.copy()
+        state["user_query"] = user_query.strip()
+        state["session_id"] = session_id
+        state["conversation_history"] = conversation_history
+        state["previous_context"] = previous_context
+        state["last_weather_data"] = last_weather_data
+        state["last_location"] = last_location
+        state["timestamp"] = self._get_timestamp()
+        # List fields get fresh objects so turns never share them
+        state["keywords"] = []
+        state["sources"] = []
+        state["execution_path"] = []
+        state["errors"] = []
         
         return state
     
@@ -129,9 +161,13 @@ class StateManager(LoggerMixin):
         current_state: ChatbotState,
         updates: Dict[str, Any],
         step_name: str
-    ) -> ChatbotState:
+    ) -> Dict[str, Any]:
         """
-        Update state with new information.
+        Build the partial state update for a processing step.
+        
+        Only the changed keys are returned; LangGraph merges them into its
+        state channels, so the full state is never copied per node. Entries
+        for execution_path and errors are new items to append.
         
         Args:
             current_state: Current state
@@ -139,27 +175,39 @@ class StateManager(LoggerMixin):
             step_name: Name of the processing step
             
         Returns:
-            Updated state
+            Updates plus the step's execution path entry (and any validation errors)
         """
         self.logger.info("Updating state", step=step_name, updates=list(updates.keys()))
         
-        # Create new state with updates
-        new_state = {**current_state, **updates}
+        partial_state = dict(updates)
         
         # Add step to execution path
-        execution_path = new_state.get("execution_path", [])
-        execution_path.append(step_name)
-        new_state["execution_path"] = execution_path
+        partial_state["execution_path"] = [step_name]
         
-        # Validate updated state
-        validation_errors = self.validate_state(new_state)
+        # Validate the merged view without materializing it
+        validation_errors = self.validate_state(ChainMap(partial_state, current_state))
         if validation_errors:
             self.logger.warning("State validation errors", errors=validation_errors)
-            errors = new_state.get("errors", [])
-            errors.extend(validation_errors)
-            new_state["errors"] = errors
+            partial_state["errors"] = partial_state.get("errors", []) + validation_errors
         
-        return new_state
+        return partial_state
+    
+    def merge_updates(self, current_state: ChatbotState, updates: Dict[str, Any]) -> ChatbotState:
+        """
+        Apply a node's partial update outside the graph, as LangGraph's channels would.
+        
+        Args:
+            current_state: Current state
+            updates: Partial update returned by a node
+            
+        Returns:
+            Merged state
+        """
+        merged_state = {**current_state, **updates}
+        for key in _APPEND_KEYS:
+            if key in updates:
+                merged_state[key] = current_state.get(key, []) + updates[key]
+        return merged_state
     
     def validate_state(self, state: Dict[str, Any]) -> List[str]:
         """
@@ -174,8 +222,7 @@ class StateManager(LoggerMixin):
         errors = []
         
         # Check required fields
-        required_fields = ["user_query", "timestamp"]
-        for field in required_fields:
+        for field in _REQUIRED_FIELDS:
             if not state.get(field):
                 errors.append(f"Missing required field: {field}")
         
@@ -186,10 +233,8 @@ class StateManager(LoggerMixin):
         
         # Validate intent if present
         intent = state.get("intent")
-        if intent is not None:
-            valid_intents = ["search_document", "general_question", "weather_query", "weather_agriculture", "unknown"]
-            if intent not in valid_intents:
-                errors.append(f"Invalid intent: {intent}")
+        if intent is not None and intent not in _VALID_INTENTS:
+            errors.append(f"Invalid intent: {intent}")
         
         # Check search results consistency
         search_results = state.get("search_results")
@@ -256,7 +301,7 @@ class StateManager(LoggerMixin):
             "is_complete": self.is_complete(state)
         }
     
-    def _get_timestamp(self) -> str:
-        """Get current timestamp as ISO string."""
-        from datetime import datetime
-        return datetime.utcnow().isoformat()
\ No newline at end of file
+    @staticmethod
+    def _get_timestamp() -> str:
+        """Get current UTC timestamp as ISO string."""
+        return utc_now_iso()
\ No newline at end of file
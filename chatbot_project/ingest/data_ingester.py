@@ -1,11 +1,12 @@
 """Data ingestion orchestrator."""
 
+from itertools import islice
 from pathlib import Path
 from typing import List, Optional
 
 from langchain.schema import Document
 
-from config import get_logger, settings, LoggerMixin
+from config import get_logger, settings, LoggerMixin, INGEST_BATCH_SIZE
 from .pdf_processor import PDFProcessor
 from .vector_store import VectorStore
 
@@ -54,22 +55,26 @@ class DataIngester(LoggerMixin):
             self.logger.info("Clearing existing vector store data")
             self.vector_store.clear_collection()
         
-        # Process PDFs
-        documents = self.pdf_processor.process_directory(directory_path)
+        # Stream PDFs into the vector store a batch at a time, so memory is bounded
+        # by one batch rather than the whole corpus
+        documents = self.pdf_processor.iter_directory(directory_path)
+        total_documents = 0
+        while batch := list(islice(documents, INGEST_BATCH_SIZE)):
+            self.vector_store.add_documents(batch, save=False)
+            total_documents += len(batch)
         
-        if not documents:
+        if not total_documents:
             self.logger.warning("No documents processed from directory")
             return 0
         
-        # Add to vector store
-        self.vector_store.add_documents(documents)
+        self.vector_store.save_index()
         
         self.logger.info(
             "Data ingestion completed successfully",
-            total_documents=len(documents)
+            total_documents=total_documents
         )
         
-        return len(documents)
+        return total_documents
     
     def ingest_single_file(self, file_path: Path) -> int:
         """
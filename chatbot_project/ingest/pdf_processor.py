@@ -1,8 +1,14 @@
 """PDF document processing utilities."""
 
 import hashlib
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional
 
 from langchain.document_loaders import PyPDFLoader
 from langchain.schema import Document
@@ -11,6 +17,18 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from config import get_logger, settings, LoggerMixin
 
 
+# One processor per pool worker process, built on first use
+_worker_processor: Optional["PDFProcessor"] = None
+
+
+def _process_pdf_in_worker(file_path: Path) -> List[Document]:
+    """Process one PDF in a pool worker (module-level so it can be pickled)."""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = PDFProcessor()
+    return _worker_processor.process_pdf(file_path)
+
+
 class PDFProcessor(LoggerMixin):
     """Processes PDF documents for vector storage."""
     
@@ -107,34 +125,82 @@ class PDFProcessor(LoggerMixin):
         Returns:
             List of all processed documents
         """
-        all_documents = []
+        return list(self.iter_directory(directory_path))
+    
+    def iter_directory(self, directory_path: Path) -> Iterator[Document]:
+        """
+        Process all PDF files in a directory, yielding documents file by file.
+        
+        Args:
+            directory_path: Path to directory containing PDFs
+            
+        Yields:
+            Processed documents, in file order
+        """
         pdf_files = list(directory_path.glob("*.pdf"))
         
+        workers = min(len(pdf_files), settings.ingest_workers or os.cpu_count() or 1)
+        
         self.logger.info(
             "Processing PDF directory",
             directory=str(directory_path),
-            pdf_count=len(pdf_files)
+            pdf_count=len(pdf_files),
+            workers=workers
         )
         
-        for pdf_file in pdf_files:
-            try:
-                documents = self.process_pdf(pdf_file)
-                all_documents.extend(documents)
-            except Exception as e:
-                self.logger.warning(
-                    "Failed to process PDF file",
-                    file_path=str(pdf_file),
-                    error=str(e)
-                )
-                continue
+        total_documents = 0
+        if workers > 1:
+            # Parsing and splitting are CPU-bound, so files fan out across processes.
+            # Spawned (not forked) workers, as the parent may hold model threads.
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                # At most two files in flight per worker, so finished results do not
+                # pile up ahead of the consumer; yielded in file order
+                pending_files = iter(pdf_files)
+                in_flight = deque()
+                for pdf_file in islice(pending_files, workers * 2):
+                    in_flight.append((pdf_file, executor.submit(_process_pdf_in_worker, pdf_file)))
+                
+                while in_flight:
+                    pdf_file, future = in_flight.popleft()
+                    documents = self._collect_file_documents(pdf_file, future.result)
+                    del future
+                    
+                    next_file = next(pending_files, None)
+                    if next_file is not None:
+                        in_flight.append((next_file, executor.submit(_process_pdf_in_worker, next_file)))
+                    
+                    total_documents += len(documents)
+                    yield from documents
+        else:
+            for pdf_file in pdf_files:
+                documents = self._collect_file_documents(pdf_file, partial(self.process_pdf, pdf_file))
+                total_documents += len(documents)
+                yield from documents
         
         self.logger.info(
             "Directory processing completed",
-            total_documents=len(all_documents),
-            processed_files=len([f for f in pdf_files])
+            total_documents=total_documents,
+            processed_files=len(pdf_files)
         )
-        
-        return all_documents
+    
+    def _collect_file_documents(
+        self,
+        pdf_file: Path,
+        get_documents: Callable[[], List[Document]]
+    ) -> List[Document]:
+        """Return one file's documents, logging and skipping the file if it failed."""
+        try:
+            return get_documents()
+        except Exception as e:
+            self.logger.warning(
+                "Failed to process PDF file",
+                file_path=str(pdf_file),
+                error=str(e)
+            )
+            return []
     
     def _get_file_hash(self, file_path: Path) -> str:
         """Get SHA-256 hash of file content."""
@@ -10,6 +10,9 @@ from langchain_community.embeddings import HuggingFaceEmbeddings
 
 from config import get_logger, settings, LoggerMixin
 
+# Documents embedded and added per FAISS call; each call embeds its batch in one pass
+_ADD_BATCH_SIZE = 256
+
 
 class VectorStore(LoggerMixin):
     """Manages vector storage operations with FAISS."""
@@ -112,12 +115,13 @@ class VectorStore(LoggerMixin):
             self.logger.error(f"Full traceback: {traceback.format_exc()}")
             return None
     
-    def add_documents(self, documents: List[Document]) -> List[str]:
+    def add_documents(self, documents: List[Document], save: bool = True) -> List[str]:
         """
         Add documents to the vector store.
         
         Args:
             documents: List of documents to add
+            save: Save the index afterwards; callers adding in chunks save once at the end
             
         Returns:
             List of document IDs
@@ -143,8 +147,8 @@ class VectorStore(LoggerMixin):
                 self.logger.warning("No valid documents to add")
                 return []
             
-            # Process in smaller batches to avoid memory issues
-            batch_size = 50
+            # Process in batches to bound memory; the index is saved once at the end
+            batch_size = _ADD_BATCH_SIZE
             all_ids = []
             
             for i in range(0, len(valid_docs), batch_size):
@@ -169,10 +173,6 @@ class VectorStore(LoggerMixin):
                     batch_ids = [f"doc_{start_idx + j}" for j in range(len(batch))]
                     all_ids.extend(batch_ids)
                     
-                    # Save after each batch
-                    self._save_index()
-                    self.logger.info(f"Batch {batch_num} saved successfully")
-                    
                 except Exception as batch_error:
                     self.logger.error(f"Error in batch {batch_num}: {batch_error}")
                     # If Vietnamese model fails with token length, try fallback
@@ -199,6 +199,10 @@ class VectorStore(LoggerMixin):
                     else:
                         continue
             
+            # Rewriting the whole index after every batch made ingestion quadratic in I/O
+            if save and all_ids:
+                self.save_index()
+            
             self.logger.info(
                 "Documents added successfully",
                 document_count=len(valid_docs),
@@ -211,10 +215,11 @@ class VectorStore(LoggerMixin):
             self.logger.error("Failed to add documents", error=str(e))
             raise
     
-    def _save_index(self):
+    def save_index(self) -> None:
         """Save FAISS index to disk."""
         if self._vector_store is not None:
             self._vector_store.save_local(str(self.db_path), index_name="faiss_index")
+            self.logger.info("FAISS index saved")
             
     def similarity_search(
         self,
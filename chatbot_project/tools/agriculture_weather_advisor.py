@@ -9,6 +9,32 @@ from dataclasses import dataclass
 from config import get_logger, LoggerMixin, settings
 
 
+# Weekday names as rendered by strftime("%A") in the C locale, without the locale lookup
+_WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# Horizontal rules used in the formatted responses
+_DISPLAY_RULE = "-" * 40
+_SECTION_RULE = "=" * 60
+
+# Current weather display shared by the weather and weather-agriculture responses
+_WEATHER_DISPLAY_TEMPLATE = f"""📍 **{{location_name}}**
+🕐 {{current_time}}
+{_DISPLAY_RULE}
+
+🌡️ **Nhiệt độ hiện tại**
+     {{temperature}}°C
+     Cảm giác như {{feels_like}}°C
+     {{description}}
+
+💧 **Độ ẩm**: {{humidity}}%
+💨 **Gió**: {{wind_speed}} km/h {{wind_direction_text}}
+🔆 **Áp suất**: {{pressure}} hPa
+👁️ **Tầm nhìn**: {{visibility}} km
+☀️ **Chỉ số UV**: {{uv_index}} ({{uv_description}})
+☁️ **Mây**: {{clouds}}%
+💧 **Điểm sương**: {{dew_point}}°C"""
+
+
 @dataclass
 class WeatherCondition:
     """Weather condition data."""
@@ -31,6 +57,7 @@ class WeatherCondition:
     sunset: Optional[datetime] = None
     rain_probability: float = 0
     location_name: str = ""
+    is_demo: bool = False
 
 
 @dataclass
@@ -535,37 +562,34 @@ class AgricultureWeatherAdvisor(LoggerMixin):
             sunrise=datetime.now().replace(hour=6, minute=12, second=0, microsecond=0),
             sunset=datetime.now().replace(hour=18, minute=8, second=0, microsecond=0),
             rain_probability=15,
-            location_name=f"{location}, VN"
+            location_name=f"{location}, VN",
+            is_demo=True
         )
     
-    def format_detailed_weather_response(
-        self, 
-        weather: WeatherCondition, 
-        agriculture_advice: AgricultureAdvice
-    ) -> str:
-        """Format comprehensive weather and agriculture advice response like weather apps."""
-        
-        from datetime import datetime
+    def _format_weather_fields(self, weather: WeatherCondition) -> Dict[str, Any]:
+        """Pre-format weather fields once for the display templates."""
+        now = datetime.now()
+        return {
+            "location_name": weather.location_name,
+            "current_time": f"{now.hour:02d}:{now.minute:02d}, {_WEEKDAYS[now.weekday()]}",
+            "temperature": weather.temperature,
+            "feels_like": weather.feels_like,
+            "description": weather.description,
+            "humidity": weather.humidity,
+            "wind_speed": f"{weather.wind_speed:.1f}",
+            "wind_direction_text": weather.wind_direction_text,
+            "pressure": weather.pressure,
+            "visibility": weather.visibility,
+            "uv_index": weather.uv_index,
+            "uv_description": self._get_uv_description(weather.uv_index),
+            "clouds": weather.clouds,
+            "dew_point": f"{weather.dew_point:.1f}",
+        }
+    
+    def format_weather_display(self, weather: WeatherCondition) -> str:
+        """Format current weather like weather apps, without agriculture advice."""
+        response = _WEATHER_DISPLAY_TEMPLATE.format_map(self._format_weather_fields(weather))
         
-        # Header with location and time
-        current_time = datetime.now().strftime("%H:%M, %A")
-        response = f"""📍 **{weather.location_name}**
-🕐 {current_time}
-{"-" * 40}
-
-🌡️ **Nhiệt độ hiện tại**
-     {weather.temperature}°C
-     Cảm giác như {weather.feels_like}°C
-     {weather.description}
-
-💧 **Độ ẩm**: {weather.humidity}%
-💨 **Gió**: {weather.wind_speed:.1f} km/h {weather.wind_direction_text}
-🔆 **Áp suất**: {weather.pressure} hPa
-👁️ **Tầm nhìn**: {weather.visibility} km
-☀️ **Chỉ số UV**: {weather.uv_index} ({self._get_uv_description(weather.uv_index)})
-☁️ **Mây**: {weather.clouds}%
-💧 **Điểm sương**: {weather.dew_point:.1f}°C"""
-
         if weather.sunrise and weather.sunset:
             response += f"""
 🌅 **Bình minh**: {weather.sunrise.strftime('%H:%M')}
@@ -575,12 +599,23 @@ class AgricultureWeatherAdvisor(LoggerMixin):
             response += f"""
 🌧️ **Xác suất mưa**: {weather.rain_probability}%"""
         
+        return response
+    
+    def format_detailed_weather_response(
+        self, 
+        weather: WeatherCondition, 
+        agriculture_advice: AgricultureAdvice
+    ) -> str:
+        """Format comprehensive weather and agriculture advice response like weather apps."""
+        
+        response = self.format_weather_display(weather)
+        
         # Agriculture recommendations section
         response += f"""
 
-{"=" * 60}
+{_SECTION_RULE}
 🌾 **TƯ VẤN NÔNG NGHIỆP CHO {agriculture_advice.crop_type.upper()}**
-{"=" * 60}
+{_SECTION_RULE}
 
 📊 **Đánh giá**: {agriculture_advice.weather_summary}
 🎯 **Độ tin cậy**: {agriculture_advice.confidence:.1%}
@@ -690,12 +725,14 @@ class AgricultureWeatherAdvisor(LoggerMixin):
         self,
         location: str,
         crop_type: str = "cây trồng tổng quát",
-        include_forecast: bool = False
+        include_forecast: bool = False,
+        weather: Optional[WeatherCondition] = None
     ) -> Optional[AgricultureAdvice]:
-        """Generate agriculture advice based on weather conditions."""
+        """Generate agriculture advice based on weather conditions (reuses ``weather`` if given)."""
         try:
-            # Get current weather
-            weather = await self.get_current_weather(location)
+            # Get current weather unless the caller already fetched it
+            if weather is None:
+                weather = await self.get_current_weather(location)
             if not weather:
                 # Use demo data if API fails
                 weather = self._get_demo_weather_data(location)
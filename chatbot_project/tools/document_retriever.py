@@ -1,6 +1,6 @@
 """Document retrieval tools with hybrid search and domain filtering."""
 
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from langchain.schema import Document
 
@@ -238,41 +238,57 @@ class DocumentRetriever(LoggerMixin):
         
         try:
             results_with_scores = self.search_with_scores(query, limit)
-            
-            # Filter by minimum score
-            filtered_results = [
-                (doc, score) for doc, score in results_with_scores
-                if score >= min_score
-            ]
-            
-            if not filtered_results:
-                self.logger.warning("No relevant context found")
-                return ""
-            
-            # Format context
-            context_parts = []
-            for i, (doc, score) in enumerate(filtered_results, 1):
-                source = doc.metadata.get('filename', 'Unknown')
-                content = doc.page_content.strip()
-                
-                context_parts.append(
-                    f"[Nguồn {i}: {source} (Độ tương đồng: {score:.2f})]\n{content}\n"
-                )
-            
-            context = "\n".join(context_parts)
-            
-            self.logger.info(
-                "Relevant context retrieved",
-                context_length=len(context),
-                sources_count=len(filtered_results)
-            )
-            
-            return context
+            return self.format_context(results_with_scores, min_score)
             
         except Exception as e:
             self.logger.error("Failed to get relevant context", error=str(e))
             return ""
     
+    def format_context(
+        self,
+        results_with_scores: List[Tuple[Document, float]],
+        min_score: float = SIMILARITY_THRESHOLD
+    ) -> str:
+        """
+        Format already-scored search results as a context string.
+        
+        Args:
+            results_with_scores: (document, score) tuples from search_with_scores
+            min_score: Minimum similarity score
+            
+        Returns:
+            Formatted context string
+        """
+        # Filter by minimum score
+        filtered_results = [
+            (doc, score) for doc, score in results_with_scores
+            if score >= min_score
+        ]
+        
+        if not filtered_results:
+            self.logger.warning("No relevant context found")
+            return ""
+        
+        # Format context
+        context_parts = []
+        for i, (doc, score) in enumerate(filtered_results, 1):
+            source = doc.metadata.get('filename', 'Unknown')
+            content = doc.page_content.strip()
+            
+            context_parts.append(
+                f"[Nguồn {i}: {source} (Độ tương đồng: {score:.2f})]\n{content}\n"
+            )
+        
+        context = "\n".join(context_parts)
+        
+        self.logger.info(
+            "Relevant context retrieved",
+            context_length=len(context),
+            sources_count=len(filtered_results)
+        )
+        
+        return context
+    
     def get_document_sources(
         self,
         query: str,
@@ -289,25 +305,7 @@ class DocumentRetriever(LoggerMixin):
             List of source information dictionaries
         """
         try:
-            results = self.search_documents(query, limit)
-            
-            sources = []
-            seen_sources = set()
-            
-            for doc in results:
-                filename = doc.metadata.get('filename', 'Unknown')
-                source_path = doc.metadata.get('source', 'Unknown')
-                
-                if filename not in seen_sources:
-                    sources.append({
-                        'filename': filename,
-                        'source_path': source_path,
-                        'chunk_count': sum(
-                            1 for d in results 
-                            if d.metadata.get('filename') == filename
-                        )
-                    })
-                    seen_sources.add(filename)
+            sources = self.sources_from_documents(self.search_documents(query, limit))
             
             self.logger.info(
                 "Retrieved document sources",
@@ -321,6 +319,31 @@ class DocumentRetriever(LoggerMixin):
             self.logger.error("Failed to get document sources", error=str(e))
             return []
     
+    @staticmethod
+    def sources_from_documents(documents: List[Document]) -> List[Dict[str, str]]:
+        """
+        Summarize retrieved documents as one source entry per file.
+        
+        Args:
+            documents: Retrieved documents
+            
+        Returns:
+            List of source information dictionaries, in first-seen order
+        """
+        sources: Dict[str, Dict[str, Any]] = {}
+        for doc in documents:
+            filename = doc.metadata.get('filename', 'Unknown')
+            source = sources.get(filename)
+            if source is None:
+                sources[filename] = {
+                    'filename': filename,
+                    'source_path': doc.metadata.get('source', 'Unknown'),
+                    'chunk_count': 1
+                }
+            else:
+                source['chunk_count'] += 1
+        return list(sources.values())
+    
     def rebuild_hybrid_index(self):
         """Rebuild BM25 index for hybrid search."""
         # Temporarily disabled due to BM25 package issues
@@ -3,7 +3,11 @@
 import re
 from typing import Dict, List, Optional, Any
 
-from config import get_logger, LoggerMixin, IntentType
+from config import (
+    get_logger, LoggerMixin, IntentType,
+    KNOWLEDGE_BASE_CACHE_MAX_ENTRIES, KNOWLEDGE_BASE_CACHE_TTL
+)
+from utils import ResponseCache
 from .document_retriever import DocumentRetriever
 
 
@@ -13,6 +17,8 @@ class SearchTools(LoggerMixin):
     def __init__(self):
         """Initialize search tools."""
         self.document_retriever = DocumentRetriever()
+        # Exact-match only: recent (query, limit) -> (results with scores, sources)
+        self._search_cache = ResponseCache(max_entries=KNOWLEDGE_BASE_CACHE_MAX_ENTRIES)
         
     def search_knowledge_base(
         self,
@@ -38,24 +44,31 @@ class SearchTools(LoggerMixin):
             min_score=min_score
         )
         
+        # Retrieval does not depend on min_score, so one cached search serves
+        # every threshold; only the (cheap) context formatting is redone
+        cache_namespace = f"kb|{limit}"
+        
         try:
-            # Get relevant context
-            context = self.document_retriever.get_relevant_context(
-                query=query,
-                limit=limit,
-                min_score=min_score
-            )
-            
-            # Get document sources
-            sources = self.document_retriever.get_document_sources(
-                query=query,
-                limit=limit
-            )
+            cached_retrieval = self._search_cache.get(cache_namespace, query)
+            if cached_retrieval is not None:
+                results_with_scores, sources = cached_retrieval
+            else:
+                results_with_scores = self.document_retriever.search_with_scores(
+                    query=query,
+                    limit=limit
+                )
+                # Sources come from the documents already retrieved, not a second search
+                sources = self.document_retriever.sources_from_documents(
+                    [doc for doc, _ in results_with_scores]
+                )
+                self._search_cache.set(
+                    cache_namespace, query, (results_with_scores, sources),
+                    ttl=KNOWLEDGE_BASE_CACHE_TTL
+                )
             
-            # Get results with scores for confidence calculation
-            results_with_scores = self.document_retriever.search_with_scores(
-                query=query,
-                limit=limit
+            context = self.document_retriever.format_context(
+                results_with_scores,
+                min_score=min_score
             )
             
             # Calculate average confidence
@@ -69,7 +82,7 @@ class SearchTools(LoggerMixin):
             
             search_result = {
                 "context": context,
-                "sources": sources,
+                "sources": list(sources),
                 "results_count": len(results_with_scores),
                 "avg_confidence": avg_confidence,
                 "max_confidence": max_confidence,
@@ -1,9 +1,14 @@
 """Utils package initialization."""
 
 from .file_utils import FileUtils, ValidationUtils, TextUtils
+from .response_cache import ResponseCache
+from .time_utils import now_iso, utc_now_iso
 
 __all__ = [
     "FileUtils",
     "ValidationUtils", 
     "TextUtils",
+    "ResponseCache",
+    "now_iso",
+    "utc_now_iso",
 ]
\ No newline at end of file
@@ -1,13 +1,30 @@
 """Utility functions for the chatbot project."""
 
 import os
+import re
 import shutil
+import unicodedata
 from pathlib import Path
 from typing import List, Dict, Any
 
 from config import get_logger, LoggerMixin
 
 
+def _build_diacritic_table() -> Dict[int, str]:
+    """Build a str.translate table folding accented Latin letters to their ASCII base."""
+    table = {ord("đ"): "d", ord("Đ"): "D"}
+    for code_point in list(range(0x00C0, 0x0250)) + list(range(0x1E00, 0x1F00)):
+        char = chr(code_point)
+        base = "".join(c for c in unicodedata.normalize("NFD", char) if not unicodedata.combining(c))
+        if len(base) == 1 and base.isascii() and base != char:
+            table[code_point] = base
+    return table
+
+
+# One-to-one table, so folded NFC text keeps the same character offsets
+_DIACRITIC_TABLE = _build_diacritic_table()
+
+
 class FileUtils(LoggerMixin):
     """File utility functions."""
     
@@ -134,11 +151,15 @@ class TextUtils:
         cleaned = " ".join(text.split())
         
         # Remove special characters but keep Vietnamese characters
-        import re
         cleaned = re.sub(r'[^\w\s\u00C0-\u024F\u1EA0-\u1EF9]', ' ', cleaned)
         
         return cleaned.strip()
     
+    @staticmethod
+    def remove_diacritics(text: str) -> str:
+        """Fold Vietnamese diacritics to ASCII (NFC input keeps character offsets)."""
+        return unicodedata.normalize("NFC", text).translate(_DIACRITIC_TABLE)
+    
     @staticmethod
     def truncate_text(text: str, max_length: int = 100) -> str:
         """Truncate text to specified length."""
@@ -150,8 +171,6 @@ class TextUtils:
     @staticmethod
     def extract_vietnamese_words(text: str) -> List[str]:
         """Extract Vietnamese words from text."""
-        import re
-        
         # Pattern for Vietnamese words
         vietnamese_pattern = r'[a-zA-ZÀ-ỹĂăÂâÊêÔôƠơƯưĐđ]+'
         
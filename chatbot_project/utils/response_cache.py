@@ -0,0 +1,272 @@
+"""Two-tier (exact + semantic) response cache for LLM-backed answers."""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import LoggerMixin
+
+
+class _VectorIndex:
+    """Unit query vectors of one namespace, kept as matrix rows and scored with one product."""
+
+    __slots__ = ("keys", "rows", "matrix")
+
+    def __init__(self, dim: int):
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.matrix = np.empty((16, dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, vector: np.ndarray) -> None:
+        """Insert or replace the vector for key."""
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+            self.keys.append(key)
+            self.rows[key] = row
+        self.matrix[row] = vector
+
+    def remove(self, key: str) -> None:
+        """Remove key, moving the last row into its slot."""
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        last_key = self.keys.pop()
+        if last_key != key:
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last_key
+            self.rows[last_key] = row
+
+    def candidates(self, vector: np.ndarray, threshold: float) -> List[Tuple[str, float]]:
+        """Keys scoring at least threshold against vector, best first."""
+        scores = self.matrix[:len(self.keys)] @ vector
+        rows = np.flatnonzero(scores >= threshold)
+        rows = rows[np.argsort(scores[rows])[::-1]]
+        return [(self.keys[row], float(scores[row])) for row in rows]
+
+
+class ResponseCache(LoggerMixin):
+    """
+    In-process response cache with an exact-match tier and a semantic tier.
+
+    Lookups first try an exact hash of ``namespace | normalized query``. On a
+    miss, the query is embedded and compared (cosine similarity) against the
+    embeddings of cached queries in the same namespace; a hit above
+    ``similarity_threshold`` is reused.
+
+    The cache is thread-safe. Async callers should use ``aget``, which embeds
+    off the event loop, and pass the returned vector to ``set`` on a miss so
+    the query is embedded only once.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        max_entries: int = 1024,
+        similarity_threshold: float = 0.92
+    ):
+        """
+        Initialize response cache.
+
+        Args:
+            embed_fn: Function returning an embedding for a query, enables the semantic tier
+            max_entries: Maximum number of cached entries (LRU eviction)
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        # key -> (expires_at, namespace, value)
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        # namespace -> embeddings of its cached queries
+        self._vectors: Dict[str, _VectorIndex] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize query text for exact matching."""
+        return " ".join(query.casefold().split())
+
+    def _make_key(self, namespace: str, query: str) -> str:
+        """Build exact-match key."""
+        return hashlib.sha1(f"{namespace}|{self.normalize(query)}".encode("utf-8")).hexdigest()
+
+    def embed(self, query: str) -> Optional[np.ndarray]:
+        """Embed a query as a unit vector, or None if unavailable."""
+        if self.embed_fn is None:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn(self.normalize(query)), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else None
+        except Exception as e:
+            self.logger.warning("Failed to embed query for semantic cache", error=str(e))
+            return None
+
+    def _remove(self, key: str) -> None:
+        """Drop an entry and its vector (caller holds the lock)."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._remove_vector(entry[1], key)
+
+    def _remove_vector(self, namespace: str, key: str) -> None:
+        """Drop a key's vector from its namespace index (caller holds the lock)."""
+        index = self._vectors.get(namespace)
+        if index is not None:
+            index.remove(key)
+            if not index:
+                del self._vectors[namespace]
+
+    def _get_exact(self, key: str, now: float) -> Tuple[bool, Any]:
+        """Exact-tier lookup as (found, value) (caller holds the lock)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return True, entry[2]
+            self._remove(key)
+        return False, None
+
+    def _get_semantic(self, namespace: str, query_vector: np.ndarray, now: float) -> Tuple[Optional[str], float]:
+        """Semantic-tier lookup as (key, similarity), key None on miss (caller holds the lock)."""
+        index = self._vectors.get(namespace)
+        if index is None:
+            return None, 0.0
+
+        best_key, best_score, expired = None, 0.0, []
+        for cached_key, score in index.candidates(query_vector, self.similarity_threshold):
+            if self._entries[cached_key][0] > now:
+                best_key, best_score = cached_key, score
+                break
+            expired.append(cached_key)
+
+        for cached_key in expired:
+            self._remove(cached_key)
+
+        if best_key is not None:
+            self._entries.move_to_end(best_key)
+            self._hits += 1
+        return best_key, best_score
+
+    def get(self, namespace: str, query: str, query_vector: Optional[np.ndarray] = None) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            namespace: Cache namespace (e.g. intent and location)
+            query: User query
+            query_vector: Query embedding from ``embed``, computed here on an exact miss if omitted
+
+        Returns:
+            Cached value or None on miss
+        """
+        key = self._make_key(namespace, query)
+        with self._lock:
+            found, value = self._get_exact(key, time.monotonic())
+        if found:
+            self.logger.info("Response cache hit", tier="exact", namespace=namespace)
+            return value
+
+        if query_vector is None:
+            query_vector = self.embed(query)
+        return self._lookup_semantic(namespace, query_vector)
+
+    async def aget(self, namespace: str, query: str) -> Tuple[Optional[Any], Optional[np.ndarray]]:
+        """
+        Look up a cached value, embedding the query in a worker thread on an exact miss.
+
+        Args:
+            namespace: Cache namespace (e.g. intent and location)
+            query: User query
+
+        Returns:
+            Cached value or None on miss, and the query embedding to pass to ``set``
+        """
+        key = self._make_key(namespace, query)
+        with self._lock:
+            found, value = self._get_exact(key, time.monotonic())
+        if found:
+            self.logger.info("Response cache hit", tier="exact", namespace=namespace)
+            return value, None
+
+        query_vector = await asyncio.to_thread(self.embed, query) if self.embed_fn is not None else None
+        return self._lookup_semantic(namespace, query_vector), query_vector
+
+    def _lookup_semantic(self, namespace: str, query_vector: Optional[np.ndarray]) -> Optional[Any]:
+        """Semantic-tier lookup after an exact miss, counting the miss if it fails."""
+        with self._lock:
+            best_key = None
+            if query_vector is not None:
+                best_key, best_score = self._get_semantic(namespace, query_vector, time.monotonic())
+            if best_key is None:
+                self._misses += 1
+                return None
+            value = self._entries[best_key][2]
+
+        self.logger.info("Response cache hit", tier="semantic", namespace=namespace, similarity=best_score)
+        return value
+
+    def set(
+        self,
+        namespace: str,
+        query: str,
+        value: Any,
+        ttl: float,
+        query_vector: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Store a value in the cache.
+
+        Args:
+            namespace: Cache namespace (e.g. intent and location)
+            query: User query
+            value: Value to cache
+            ttl: Time-to-live in seconds
+            query_vector: Query embedding returned by ``aget``, computed here if omitted
+        """
+        if query_vector is None:
+            query_vector = self.embed(query)
+
+        key = self._make_key(namespace, query)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, namespace, value)
+            self._entries.move_to_end(key)
+            if query_vector is not None:
+                index = self._vectors.get(namespace)
+                if index is None:
+                    index = self._vectors[namespace] = _VectorIndex(len(query_vector))
+                index.add(key, query_vector)
+
+            while len(self._entries) > self.max_entries:
+                evicted_key, (_, evicted_namespace, _) = self._entries.popitem(last=False)
+                self._remove_vector(evicted_namespace, evicted_key)
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "similarity_threshold": self.similarity_threshold,
+                "hits": self._hits,
+                "misses": self._misses
+            }
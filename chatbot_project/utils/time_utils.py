@@ -0,0 +1,32 @@
+"""Time helpers shared across the chatbot project."""
+
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+
+def _cached_iso(to_datetime: Callable[[float], datetime]) -> Callable[[], str]:
+    """Build a "now as ISO string" function that reuses its string within the same millisecond."""
+    # (millisecond bucket, ISO string) of the last formatted "now"
+    last = [(-1, "")]
+    
+    def formatted_now() -> str:
+        now = time.time()
+        # Keyed on the bucket, not the elapsed time, so a clock stepping back is never masked
+        ms = int(now * 1000)
+        last_ms, last_iso = last[0]
+        if ms == last_ms:
+            return last_iso
+        iso = to_datetime(now).isoformat()
+        last[0] = (ms, iso)
+        return iso
+    
+    return formatted_now
+
+
+now_iso = _cached_iso(datetime.fromtimestamp)
+now_iso.__doc__ = "Current local time as ISO string (no offset), as stored in chat history."
+
+# Same naive-UTC format datetime.utcnow().isoformat() produced, without the deprecated call
+utc_now_iso = _cached_iso(lambda now: datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None))
+utc_now_iso.__doc__ = "Current UTC time as ISO string (no offset), as returned by the API."
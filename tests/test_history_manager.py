@@ -0,0 +1,170 @@
+"""Tests for the SQLite chat history manager and its write-behind saves."""
+
+import sqlite3
+import threading
+
+import orjson
+import pytest
+
+from chat.history_manager import ChatHistoryManager, ChatSession
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """Manager whose timer never fires during a test, so flushes are explicit."""
+    history_manager = ChatHistoryManager(str(tmp_path / "chat_history.db"), flush_interval=60)
+    yield history_manager
+    history_manager.close()
+
+
+def _stored_message_count(manager: ChatHistoryManager, session_id: str) -> int:
+    """Count the message rows on disk, bypassing the manager's flush."""
+    with sqlite3.connect(manager.db_path) as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+
+
+def test_save_session_is_visible_to_reads(manager):
+    session = manager.create_session()
+    session.add_message("Cách bón phân cho cà phê?", is_user=True)
+    session.add_message("Bón phân theo mùa.", is_user=False, metadata={"intent": "search_document"})
+
+    manager.save_session(session)
+    assert session.session_id in manager._pending
+
+    loaded = manager.load_session(session.session_id)
+    assert [message.content for message in loaded.messages] == [
+        "Cách bón phân cho cà phê?", "Bón phân theo mùa."
+    ]
+    assert loaded.messages[1].metadata == {"intent": "search_document"}
+    assert manager.get_context(session.session_id) == [
+        {"role": "user", "content": "Cách bón phân cho cà phê?"},
+        {"role": "assistant", "content": "Bón phân theo mùa."},
+    ]
+    assert [item["session_id"] for item in manager.list_sessions()] == [session.session_id]
+
+
+def test_save_session_appends_only_new_messages(manager):
+    session = manager.create_session()
+    session.add_message("first", is_user=True)
+    manager.save_session(session, sync=True)
+
+    session.add_message("second", is_user=False)
+    manager.save_session(session)
+    manager.save_session(session)
+    manager.flush()
+
+    assert _stored_message_count(manager, session.session_id) == 2
+    assert manager.get_stats()["total_messages"] == 2
+    assert manager.get_stats()["total_sessions"] == 1
+
+
+def test_failed_flush_requeues_sessions(manager, monkeypatch):
+    session = manager.create_session()
+    session.add_message("hello", is_user=True)
+    manager.save_session(session)
+
+    def failing_write(conn, sessions):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(manager, "_write_sessions", failing_write)
+    manager.flush()
+
+    assert manager._pending == {session.session_id: session}
+    assert manager._flush_timer is not None
+    assert _stored_message_count(manager, session.session_id) == 0
+
+    monkeypatch.undo()
+    manager.flush()
+
+    assert manager._pending == {}
+    assert _stored_message_count(manager, session.session_id) == 1
+
+
+def test_delete_session_drops_pending_save(manager):
+    session = manager.create_session()
+    session.add_message("hello", is_user=True)
+    manager.save_session(session)
+
+    manager.delete_session(session.session_id)
+    manager.flush()
+
+    assert manager.load_session(session.session_id) is None
+    assert _stored_message_count(manager, session.session_id) == 0
+
+
+def test_delete_session_during_inflight_flush_does_not_resurrect(manager, monkeypatch):
+    session = manager.create_session()
+    session.add_message("hello", is_user=True)
+    manager.save_session(session)
+
+    write_started = threading.Event()
+    release_write = threading.Event()
+    write_sessions = manager._write_sessions
+
+    def slow_write(conn, sessions):
+        write_started.set()
+        release_write.wait(5)
+        write_sessions(conn, sessions)
+
+    monkeypatch.setattr(manager, "_write_sessions", slow_write)
+    flusher = threading.Thread(target=manager.flush)
+    flusher.start()
+    assert write_started.wait(5)
+
+    deleter = threading.Thread(target=manager.delete_session, args=(session.session_id,))
+    deleter.start()
+    # Give the delete time to run against the half-written batch if it were not serialized
+    deleter.join(0.2)
+    release_write.set()
+    flusher.join(5)
+    deleter.join(5)
+
+    assert manager.load_session(session.session_id) is None
+    assert _stored_message_count(manager, session.session_id) == 0
+
+
+def test_legacy_messages_json_is_migrated(tmp_path):
+    db_path = tmp_path / "legacy.db"
+    legacy = ChatSession(title="Legacy")
+    legacy.add_message("Thời tiết Đà Lạt?", is_user=True)
+    legacy.add_message("Trời nắng.", is_user=False, metadata={"intent": "weather_query"})
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                messages_json TEXT NOT NULL
+            )
+        """)
+        conn.execute(
+            "INSERT INTO chat_sessions VALUES (?, ?, ?, ?, ?)",
+            (
+                legacy.session_id, legacy.title, legacy.created_at, legacy.updated_at,
+                orjson.dumps([message.to_dict() for message in legacy.messages]).decode("utf-8")
+            )
+        )
+
+    manager = ChatHistoryManager(str(db_path), flush_interval=0)
+    try:
+        loaded = manager.load_session(legacy.session_id)
+        assert [message.to_dict() for message in loaded.messages] == [
+            message.to_dict() for message in legacy.messages
+        ]
+        assert loaded.title == "Legacy"
+
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute(
+                "SELECT messages_json FROM chat_sessions WHERE session_id = ?", (legacy.session_id,)
+            ).fetchone()[0] == "[]"
+
+        # Appending after migration continues the sequence instead of overwriting it
+        loaded.add_message("Cảm ơn", is_user=True)
+        manager.save_session(loaded)
+        assert _stored_message_count(manager, legacy.session_id) == 3
+    finally:
+        manager.close()